@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+from datetime import timedelta
+
+from asgiref.local import Local
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.utils import timezone
+
+from .models import Update
+from .search import remove_objects
+
+# Pro Request gesammelte Einträge; außerhalb eines Requests wird sofort geschrieben
+_state = Local()
+
+
+def log_activity(project, user, event_type, **payload):
+    """
+    Merkt einen strukturierten Activity-Eintrag vor.
+
+    Innerhalb eines Requests werden alle Einträge gesammelt und erst nach dem
+    Senden der Antwort mit einem bulk_create geschrieben.
+    """
+    update = Update(
+        project_id=getattr(project, 'pk', project),
+        user=user if user is not None and user.is_authenticated else None,
+        event_type=event_type,
+        payload=payload,
+    )
+
+    pending = getattr(_state, 'pending', None)
+    if pending is None:
+        update.save()
+    else:
+        pending.append(update)
+    return update
+
+
+def log_task_activity(task, user, event_type, **payload):
+    return log_activity(task.project_id, user, event_type, task=task.id, title=task.title, **payload)
+
+
+def _start_collecting(**kwargs):
+    _state.pending = []
+
+
+def flush_activity(**kwargs):
+    pending = getattr(_state, 'pending', None)
+    _state.pending = None
+    if pending:
+        Update.objects.bulk_create(pending)
+
+
+request_started.connect(_start_collecting, dispatch_uid='projectmanager_activity_start')
+request_finished.connect(flush_activity, dispatch_uid='projectmanager_activity_flush')
+
+
+@dataclass
+class ActivityEntry:
+    user: object
+    event_type: str
+    text: str
+    count: int
+    created_at: object
+
+
+def compact_activity(updates):
+    """
+    Fasst aufeinanderfolgende Einträge desselben Users und Typs zusammen,
+    z.B. "changed 12 task statuses". Erwartet die neuesten Einträge zuerst.
+    """
+    runs = []
+    for update in updates:
+        last = runs[-1] if runs else None
+        if (
+            last is not None
+            and update.event_type != 'NOTE'
+            and last[0].event_type == update.event_type
+            and last[0].user_id == update.user_id
+        ):
+            last.append(update)
+        else:
+            runs.append([update])
+
+    return [
+        ActivityEntry(
+            user=run[0].user,
+            event_type=run[0].event_type,
+            text=run[0].describe(count=len(run)),
+            count=len(run),
+            created_at=run[0].created_at,
+        )
+        for run in runs
+    ]
+
+
+def recent_activity(project, limit=5, scan=100):
+    """Die letzten `limit` zusammengefassten Einträge aus höchstens `scan` Zeilen."""
+    updates = project.updates.select_related('user').order_by('-created_at', '-id')[:scan]
+    return compact_activity(updates)[:limit]
+
+
+def purge_updates(queryset, chunk_size=1000):
+    """Löscht in Blöcken, statt ein großes DELETE abzusetzen. Gibt die Anzahl zurück."""
+    deleted = 0
+    while True:
+        rows = list(queryset.values_list('id', 'text')[:chunk_size])
+        if rows:
+            deleted += Update.objects.filter(id__in=[pk for pk, _ in rows]).delete()[0]
+            # Nur Notizen mit Text stehen im Suchindex
+            noted = [pk for pk, text in rows if text]
+            if noted:
+                remove_objects('update', noted)
+        if len(rows) < chunk_size:
+            return deleted
+
+
+def purge_expired_updates(days=None, chunk_size=1000):
+    days = days if days is not None else getattr(settings, 'ACTIVITY_RETENTION_DAYS', 90)
+    cutoff = timezone.now() - timedelta(days=days)
+    return purge_updates(Update.objects.filter(created_at__lt=cutoff), chunk_size=chunk_size)
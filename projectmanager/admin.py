@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Project, TeamMember, Task, Update, Document, AISuggestion
+from .models import Project, TeamMember, Task, Update, Document, AISuggestion, Job
 
 # Register your models here.
 admin.site.register(Project)
@@ -8,3 +8,4 @@ admin.site.register(Task)
 admin.site.register(Update)
 admin.site.register(Document)
 admin.site.register(AISuggestion)
+admin.site.register(Job)
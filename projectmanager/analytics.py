@@ -0,0 +1,336 @@
+"""
+Tägliche Snapshots für Burndown und Velocity.
+
+- ProjectSnapshot: Tasks je Status am Ende eines Tages, dazu die Übergänge nach DONE
+- MilestoneSnapshot: erledigte und alle Tasks eines Milestones
+- Zeilen gibt es nur für Tage mit Änderungen, dazwischen gilt der letzte Stand
+- Views melden Task-Übergänge (record_task_changes), die Zeile des Tages wird
+  per UPDATE ... SET x = x + 1 fortgeschrieben statt neu gezählt
+- `manage.py backfill_snapshots` rekonstruiert die Historie aus dem Activity-Log
+- project_series() / milestone_series() liefern beliebige Zeiträume mit
+  zwei Queries, Aufwand O(Tage)
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import groupby
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.utils import timezone
+
+from .models import Milestone, MilestoneSnapshot, ProjectSnapshot, Task, Update
+
+STATUS_FIELDS = {'TODO': 'todo', 'IN_PROGRESS': 'in_progress', 'DONE': 'done'}
+PROJECT_COUNT_FIELDS = ['todo', 'in_progress', 'done']
+MILESTONE_COUNT_FIELDS = ['done', 'total']
+
+# Events, aus denen sich der Stand der Tasks zurückrechnen lässt.
+# Ältere TASK_BULK-Einträge ohne 'tasks' und TASK_MILESTONE ohne 'from_milestone'
+# werden so gut wie möglich (übergangen bzw. als "ohne Milestone") behandelt.
+REPLAY_EVENTS = ['TASK_CREATED', 'TASK_STATUS', 'TASK_DELETED', 'TASK_MILESTONE', 'TASK_BULK']
+
+
+# -------------------------
+# Fortschreiben
+# -------------------------
+
+def _live_project_counts(project_id):
+    counts = dict(Task.objects.filter(project_id=project_id).values_list('status').annotate(n=Count('id')))
+    return {field: counts.get(status, 0) for status, field in STATUS_FIELDS.items()}
+
+
+def _live_milestone_counts(milestone_ids):
+    rows = (
+        Task.objects.filter(milestone_id__in=milestone_ids)
+        .values('milestone_id')
+        .annotate(done=Count('id', filter=Q(status='DONE')), total=Count('id'))
+    )
+    counts = {row['milestone_id']: {'done': row['done'], 'total': row['total']} for row in rows}
+    return {milestone_id: counts.get(milestone_id, {'done': 0, 'total': 0}) for milestone_id in milestone_ids}
+
+
+def _apply(model, key, count_fields, deltas_by_key, day, live_counts):
+    """
+    Addiert die Deltas je Schlüssel (Projekt- bzw. Milestone-ID) auf die Zeilen
+    des Tages, vorhandene Zeilen mit einem einzigen UPDATE. Fehlende Zeilen
+    übernehmen den letzten Stand, ohne vorherige Zeile den aktuellen Stand aus
+    den Tasks (die Änderung ist dann schon enthalten).
+    """
+    deltas_by_key = {
+        key_id: {field: delta for field, delta in deltas.items() if delta}
+        for key_id, deltas in deltas_by_key.items()
+    }
+    deltas_by_key = {key_id: deltas for key_id, deltas in deltas_by_key.items() if deltas}
+    if not deltas_by_key:
+        return
+
+    rows = model.objects.filter(date=day)
+    existing = set(rows.filter(**{f'{key}__in': list(deltas_by_key)}).values_list(key, flat=True))
+    if existing:
+        fields = {field for key_id in existing for field in deltas_by_key[key_id]}
+        rows.filter(**{f'{key}__in': existing}).update(**{
+            field: F(field) + Case(
+                *[When(**{key: key_id}, then=Value(deltas_by_key[key_id].get(field, 0))) for key_id in existing],
+                default=Value(0),
+            )
+            for field in fields
+        })
+
+    missing = [key_id for key_id in deltas_by_key if key_id not in existing]
+    if not missing:
+        return
+
+    latest_date = model.objects.filter(**{key: OuterRef(key)}, date__lt=day).order_by('-date').values('date')[:1]
+    previous = {
+        row[key]: row
+        for row in model.objects.filter(**{f'{key}__in': missing}, date=Subquery(latest_date)).values(key, *count_fields)
+    }
+    live = live_counts([key_id for key_id in missing if key_id not in previous])
+
+    new_rows = []
+    for key_id in missing:
+        deltas = deltas_by_key[key_id]
+        if key_id in previous:
+            values = {field: previous[key_id][field] + deltas.get(field, 0) for field in count_fields}
+        else:
+            values = dict(live[key_id])
+        # Tageswerte (completed) werden nicht übernommen
+        values.update({field: delta for field, delta in deltas.items() if field not in count_fields})
+        new_rows.append(model(date=day, **{key: key_id}, **values))
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(new_rows)
+    except IntegrityError:
+        # Gleichzeitig angelegt: dann wie vorhandene Zeilen fortschreiben
+        _apply(model, key, count_fields, {key_id: deltas_by_key[key_id] for key_id in missing}, day, live_counts)
+
+
+def record_task_changes(project_id, changes, day=None):
+    """
+    Task-Übergänge nach dem Speichern melden.
+    changes: [(vorher, nachher)], je Seite (status, milestone_id) oder None,
+    wenn der Task nicht existiert(e).
+    """
+    day = day or timezone.localdate()
+    project_deltas = Counter()
+    milestone_deltas = defaultdict(Counter)
+    for before, after in changes:
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None:
+                continue
+            status, milestone_id = state
+            project_deltas[STATUS_FIELDS[status]] += sign
+            if milestone_id:
+                milestone_deltas[milestone_id]['total'] += sign
+                milestone_deltas[milestone_id]['done'] += sign * (status == 'DONE')
+        if after is not None and after[0] == 'DONE' and (before is None or before[0] != 'DONE'):
+            project_deltas['completed'] += 1
+
+    _apply(ProjectSnapshot, 'project_id', PROJECT_COUNT_FIELDS, {project_id: project_deltas}, day,
+           lambda ids: {project_id: _live_project_counts(project_id)} if ids else {})
+    _apply(MilestoneSnapshot, 'milestone_id', MILESTONE_COUNT_FIELDS, milestone_deltas, day, _live_milestone_counts)
+
+
+def record_status_change(task, old_status, new_status):
+    """Statuswechsel eines Tasks; ohne bekannten alten Status wird der Tag neu gezählt."""
+    if old_status:
+        record_task_changes(task.project_id, [((old_status, task.milestone_id), (new_status, task.milestone_id))])
+        return
+
+    day = timezone.localdate()
+    ProjectSnapshot.objects.update_or_create(
+        project_id=task.project_id, date=day, defaults=_live_project_counts(task.project_id),
+    )
+    if new_status == 'DONE':
+        ProjectSnapshot.objects.filter(project_id=task.project_id, date=day).update(completed=F('completed') + 1)
+    if task.milestone_id:
+        MilestoneSnapshot.objects.update_or_create(
+            milestone_id=task.milestone_id, date=day, defaults=_live_milestone_counts([task.milestone_id])[task.milestone_id],
+        )
+
+
+# -------------------------
+# Backfill
+# -------------------------
+
+def backfill_project(project_id):
+    """
+    Rechnet vom aktuellen Stand der Tasks rückwärts durch das Activity-Log und
+    ersetzt die Snapshots des Projekts ab dem Tag vor dem ersten Eintrag.
+    Gibt die Anzahl der Projekt-Zeilen zurück.
+    """
+    state = {
+        task_id: [status, milestone_id]
+        for task_id, status, milestone_id in Task.objects.filter(project_id=project_id).values_list('id', 'status', 'milestone_id')
+    }
+    milestone_ids = set(Milestone.objects.filter(project_id=project_id).values_list('id', flat=True))
+    events = list(
+        Update.objects.filter(project_id=project_id, event_type__in=REPLAY_EVENTS)
+        .order_by('created_at', 'id')
+        .values_list('event_type', 'payload', 'created_at')
+    )
+
+    # Vorwärts: Status vor jedem Wechsel bzw. beim Löschen (falls 'from' fehlt)
+    last_status = {}
+    previous_status = []
+    for event_type, payload, _ in events:
+        task_id = payload.get('task')
+        if event_type == 'TASK_STATUS':
+            previous_status.append(payload.get('from') or last_status.get(task_id, 'TODO'))
+            last_status[task_id] = payload.get('to')
+        elif event_type == 'TASK_DELETED':
+            previous_status.append(last_status.get(task_id, 'TODO'))
+        else:
+            if event_type == 'TASK_BULK' and 'status' in payload.get('changes', {}):
+                for bulk_task_id, _, _ in payload.get('tasks', []):
+                    last_status[bulk_task_id] = payload['changes']['status']
+            previous_status.append(None)
+
+    project_counts = Counter(STATUS_FIELDS[status] for status, _ in state.values())
+    milestone_counts = defaultdict(Counter)
+    for status, milestone_id in state.values():
+        if milestone_id:
+            milestone_counts[milestone_id]['total'] += 1
+            milestone_counts[milestone_id]['done'] += status == 'DONE'
+
+    project_rows = []
+    milestone_rows = []
+    # Milestones, deren Stand sich seit der letzten festgehaltenen Zeile geändert hat
+    dirty = set(milestone_ids)
+
+    def tally(task_state, sign):
+        status, milestone_id = task_state
+        if status not in STATUS_FIELDS:
+            return
+        project_counts[STATUS_FIELDS[status]] += sign
+        if milestone_id:
+            milestone_counts[milestone_id]['total'] += sign
+            milestone_counts[milestone_id]['done'] += sign * (status == 'DONE')
+            dirty.add(milestone_id)
+
+    def record(day, completed=0):
+        project_rows.append(ProjectSnapshot(
+            project_id=project_id, date=day, completed=completed,
+            **{field: project_counts[field] for field in PROJECT_COUNT_FIELDS},
+        ))
+        for milestone_id in dirty & milestone_ids:
+            counts = milestone_counts[milestone_id]
+            milestone_rows.append(MilestoneSnapshot(milestone_id=milestone_id, date=day, done=counts['done'], total=counts['total']))
+        dirty.clear()
+
+    # Rückwärts: Stand am Ende jedes Tages festhalten, dann dessen Ereignisse zurücknehmen
+    indexed = list(zip(events, previous_status))
+    day = None
+    for day, day_events in groupby(reversed(indexed), key=lambda item: timezone.localdate(item[0][2])):
+        day_events = list(day_events)
+        completed = sum(
+            1 for (event_type, payload, _), before in day_events
+            if event_type == 'TASK_STATUS' and payload.get('to') == 'DONE' and before != 'DONE'
+        ) + sum(
+            1 for (event_type, payload, _), _ in day_events
+            if event_type == 'TASK_BULK' and payload.get('changes', {}).get('status') == 'DONE'
+            for _, status, _ in payload.get('tasks', []) if status != 'DONE'
+        )
+        record(day, completed)
+
+        for (event_type, payload, _), before in day_events:
+            if event_type == 'TASK_BULK':
+                # Jeder betroffene Task bekommt seinen Stand vor dem Bulk-Edit zurück
+                for task_id, status, milestone_id in payload.get('tasks', []):
+                    task_state = state.get(task_id)
+                    if task_state is None:
+                        continue
+                    tally(task_state, -1)
+                    task_state[:] = [status, milestone_id]
+                    tally(task_state, 1)
+                continue
+
+            task_id = payload.get('task')
+            task_state = state.get(task_id)
+            if event_type == 'TASK_CREATED':
+                if task_state is not None:
+                    tally(state.pop(task_id), -1)
+            elif event_type == 'TASK_DELETED':
+                state[task_id] = [before, None]
+                tally(state[task_id], 1)
+            elif task_state is None:
+                continue
+            elif event_type == 'TASK_STATUS':
+                tally(task_state, -1)
+                task_state[0] = before
+                tally(task_state, 1)
+            elif event_type == 'TASK_MILESTONE':
+                tally(task_state, -1)
+                task_state[1] = payload.get('from_milestone')
+                tally(task_state, 1)
+
+    # Stand vor dem ersten Eintrag im Log (bzw. heute, wenn es keinen gibt)
+    first_day = day - timedelta(days=1) if day else timezone.localdate()
+    record(first_day)
+
+    # Ältere Zeilen bleiben: das Log wird nach ACTIVITY_RETENTION_DAYS gelöscht
+    with transaction.atomic():
+        ProjectSnapshot.objects.filter(project_id=project_id, date__gte=first_day).delete()
+        MilestoneSnapshot.objects.filter(milestone__project_id=project_id, date__gte=first_day).delete()
+        ProjectSnapshot.objects.bulk_create(project_rows, batch_size=1000)
+        MilestoneSnapshot.objects.bulk_create(milestone_rows, batch_size=1000)
+    return len(project_rows)
+
+
+# -------------------------
+# Auswertung
+# -------------------------
+
+def _carried_series(model, lookup, fields, daily_fields, start, end):
+    """Ein Eintrag pro Tag; fehlende Tage übernehmen den letzten Stand, Tageswerte sind 0."""
+    base = model.objects.filter(date__lt=start, **lookup).order_by('-date').values(*fields).first()
+    rows = {
+        row['date']: row
+        for row in model.objects.filter(date__range=(start, end), **lookup).values('date', *fields, *daily_fields)
+    }
+
+    current = base or {field: 0 for field in fields}
+    series = []
+    day = start
+    while day <= end:
+        row = rows.get(day)
+        if row is not None:
+            current = row
+        item = {'date': day, **{field: current[field] for field in fields}}
+        for field in daily_fields:
+            item[field] = row[field] if row is not None else 0
+        series.append(item)
+        day += timedelta(days=1)
+    return series
+
+
+def project_series(project_id, start, end):
+    """Burndown (offen/erledigt je Tag) und Velocity (erledigt je Tag und Woche)."""
+    days = _carried_series(ProjectSnapshot, {'project_id': project_id}, PROJECT_COUNT_FIELDS, ['completed'], start, end)
+    burndown = []
+    weekly = {}
+    for item in days:
+        burndown.append({
+            'date': item['date'],
+            'todo': item['todo'],
+            'in_progress': item['in_progress'],
+            'done': item['done'],
+            'remaining': item['todo'] + item['in_progress'],
+            'total': item['todo'] + item['in_progress'] + item['done'],
+        })
+        week = item['date'] - timedelta(days=item['date'].weekday())
+        weekly[week] = weekly.get(week, 0) + item['completed']
+    return {
+        'burndown': burndown,
+        'velocity': {
+            'daily': [{'date': item['date'], 'completed': item['completed']} for item in days],
+            'weekly': [{'week': week, 'completed': completed} for week, completed in weekly.items()],
+        },
+    }
+
+
+def milestone_series(milestone_id, start, end):
+    return [
+        {**item, 'remaining': item['total'] - item['done']}
+        for item in _carried_series(MilestoneSnapshot, {'milestone_id': milestone_id}, MILESTONE_COUNT_FIELDS, [], start, end)
+    ]
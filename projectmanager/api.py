@@ -0,0 +1,305 @@
+"""
+Lesende JSON-API (v1) für Projekte, Tasks, Milestones, Mitglieder, Activity
+und Auswertungen (Burndown/Velocity aus den Tages-Snapshots).
+
+- Sparse Fieldsets über ?fields=id,title,...
+- Serialisierung direkt aus values(), ohne Model-Instanzen
+- ETag aus dem Inhalt (erfasst auch SET_NULL, umbenannte User usw.) und
+  Last-Modified, bei unverändertem Stand 304 Not Modified
+- Nicht angemeldet: 401 als JSON statt Redirect auf die Login-Seite
+"""
+import hashlib
+from datetime import date, timedelta
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_GET
+
+from .analytics import milestone_series, project_series
+from .models import Milestone, Project, ProjectMembership, Task, Update
+from .roles import get_project_roles, is_project_member
+
+API_VERSION = 'v1'
+
+# Öffentlicher Feldname -> values()-Lookup
+PROJECT_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'goal': 'goal',
+    'start_date': 'start_date',
+    'end_date': 'end_date',
+}
+TASK_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'deadline': 'deadline',
+    'status': 'status',
+    'priority': 'priority',
+    'assigned_to': 'assigned_to_id',
+    'assigned_to_username': 'assigned_to__username',
+    'milestone': 'milestone_id',
+    'version': 'version',
+}
+MILESTONE_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'deadline': 'deadline',
+    'created_at': 'created_at',
+    'total': 'task_total',
+    'done': 'task_done',
+    # wird aus total/done berechnet
+    'progress': None,
+}
+MEMBER_FIELDS = {
+    'id': 'user_id',
+    'username': 'user__username',
+    'role': 'role',
+}
+ACTIVITY_FIELDS = {
+    'id': 'id',
+    'user': 'user_id',
+    'username': 'user__username',
+    'event_type': 'event_type',
+    'payload': 'payload',
+    'created_at': 'created_at',
+    # wird aus event_type/payload/text berechnet
+    'text': None,
+}
+
+ACTIVITY_PAGE_SIZE = 50
+ANALYTICS_DEFAULT_DAYS = 30
+ANALYTICS_MAX_DAYS = 3660
+
+
+class FieldError(ValueError):
+    pass
+
+
+def api_error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def project_member_required(view):
+    """Nur Mitglieder des Projekts (URL-Parameter project_id) dürfen lesen."""
+    @wraps(view)
+    def wrapper(request, project_id, *args, **kwargs):
+        if not is_project_member(request.user, project_id):
+            return api_error('Not found', 404)
+        return view(request, project_id, *args, **kwargs)
+    return wrapper
+
+
+def api_view(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return api_error('Authentication required', 401)
+        try:
+            return view(request, *args, **kwargs)
+        except FieldError as e:
+            return api_error(str(e), 400)
+    return require_GET(wrapper)
+
+
+def requested_fields(request, field_map):
+    """Felder aus ?fields=..., sonst alle."""
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(field_map)
+
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in field_map]
+    if unknown:
+        raise FieldError(f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def serialize(queryset, field_map, names, extra_lookups=(), compute=None):
+    """
+    values()-Zeilen auf die öffentlichen Feldnamen abbilden.
+    `compute(item, row)` ergänzt berechnete Felder aus der Rohzeile.
+    """
+    lookups = {field_map[name] for name in names if field_map[name]} | set(extra_lookups)
+    results = []
+    for row in queryset.values(*lookups):
+        item = {name: row[field_map[name]] for name in names if field_map[name]}
+        if compute:
+            compute(item, row)
+        results.append(item)
+    return results
+
+
+def conditional_json(request, build, last_modified=None):
+    """
+    Antwortet mit 304, wenn ETag/Last-Modified des Clients noch passen.
+    Der ETag wird aus dem Inhalt gebildet: Zähler wie Anzahl oder Summe der
+    Versionen übersehen Änderungen, die version nicht erhöhen (SET_NULL beim
+    Löschen eines Milestones, umbenannte User, bearbeitete Milestones).
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+
+    response = JsonResponse({'version': API_VERSION, **build()}, encoder=DjangoJSONEncoder)
+
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if not_modified is not None:
+        return not_modified
+
+    response.headers['ETag'] = etag
+    if timestamp is not None:
+        response.headers['Last-Modified'] = http_date(timestamp)
+    # Clients sollen immer revalidieren
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@api_view
+def project_list(request):
+    field_map = PROJECT_FIELDS | {'role': None}
+    names = requested_fields(request, field_map)
+    roles = get_project_roles(request.user)
+
+    def compute(item, row):
+        if 'role' in names:
+            item['role'] = roles[row['id']]
+
+    def build():
+        projects = Project.objects.filter(id__in=roles).order_by('id')
+        return {'results': serialize(projects, field_map, names, extra_lookups=['id'], compute=compute)}
+
+    return conditional_json(request, build)
+
+
+@api_view
+@project_member_required
+def project_detail(request, project_id):
+    names = requested_fields(request, PROJECT_FIELDS)
+
+    def build():
+        rows = serialize(Project.objects.filter(id=project_id), PROJECT_FIELDS, names, extra_lookups=['id'])
+        return {'data': rows[0] if rows else None}
+
+    return conditional_json(request, build)
+
+
+@api_view
+@project_member_required
+def task_list(request, project_id):
+    names = requested_fields(request, TASK_FIELDS)
+
+    tasks = Task.objects.filter(project_id=project_id)
+    status = request.GET.get('status')
+    if status:
+        tasks = tasks.filter(status=status)
+    priority = request.GET.get('priority')
+    if priority:
+        tasks = tasks.filter(priority=priority)
+    milestone = request.GET.get('milestone')
+    if milestone == 'none':
+        tasks = tasks.filter(milestone__isnull=True)
+    elif milestone:
+        if not milestone.isdigit():
+            raise FieldError("Invalid milestone")
+        tasks = tasks.filter(milestone_id=milestone)
+
+    def build():
+        return {'results': serialize(tasks.order_by('id'), TASK_FIELDS, names, extra_lookups=['id'])}
+
+    return conditional_json(request, build)
+
+
+@api_view
+@project_member_required
+def milestone_list(request, project_id):
+    names = requested_fields(request, MILESTONE_FIELDS)
+    milestones = Milestone.objects.filter(project_id=project_id).with_progress()
+
+    def compute(item, row):
+        if 'progress' in names:
+            total, done = row['task_total'], row['task_done']
+            item['progress'] = int((done / total) * 100) if total else 0
+
+    def build():
+        extra = ['task_total', 'task_done'] if 'progress' in names else []
+        return {'results': serialize(milestones.order_by('id'), MILESTONE_FIELDS, names, extra_lookups=extra, compute=compute)}
+
+    return conditional_json(request, build)
+
+
+@api_view
+@project_member_required
+def member_list(request, project_id):
+    names = requested_fields(request, MEMBER_FIELDS)
+
+    def build():
+        memberships = ProjectMembership.objects.filter(project_id=project_id).order_by('user_id')
+        return {'results': serialize(memberships, MEMBER_FIELDS, names, extra_lookups=['user_id'])}
+
+    return conditional_json(request, build)
+
+
+@api_view
+@project_member_required
+def activity_list(request, project_id):
+    names = requested_fields(request, ACTIVITY_FIELDS)
+    try:
+        limit = min(int(request.GET.get('limit', ACTIVITY_PAGE_SIZE)), 200)
+    except ValueError:
+        raise FieldError("Invalid limit")
+    if limit < 1:
+        raise FieldError("Invalid limit")
+
+    updates = Update.objects.filter(project_id=project_id)
+    last = updates.aggregate(last=Max('created_at'))['last']
+
+    def compute(item, row):
+        if 'text' in names:
+            item['text'] = Update.describe_event(row['event_type'], row['payload'], row['text'])
+
+    def build():
+        extra = ['event_type', 'payload', 'text'] if 'text' in names else []
+        rows = updates.order_by('-created_at', '-id')[:limit]
+        return {'results': serialize(rows, ACTIVITY_FIELDS, names, extra_lookups=['id', *extra], compute=compute)}
+
+    return conditional_json(request, build, last_modified=last)
+
+
+def date_param(request, name, default):
+    value = request.GET.get(name)
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise FieldError(f"Invalid {name}, expected YYYY-MM-DD")
+
+
+@api_view
+@project_member_required
+def project_analytics(request, project_id):
+    """Burndown und Velocity für ?start=...&end=... (Standard: die letzten 30 Tage), optional ?milestone=id."""
+    end = date_param(request, 'end', timezone.localdate())
+    start = date_param(request, 'start', end - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1))
+    if start > end or (end - start).days >= ANALYTICS_MAX_DAYS:
+        raise FieldError("Invalid date range")
+
+    milestone_id = request.GET.get('milestone')
+    if milestone_id is not None:
+        if not milestone_id.isdigit() or not Milestone.objects.filter(id=milestone_id, project_id=project_id).exists():
+            raise FieldError("Invalid milestone")
+        milestone_id = int(milestone_id)
+
+    def build():
+        data = {'start': start, 'end': end, **project_series(project_id, start, end)}
+        if milestone_id is not None:
+            data['milestone'] = {'id': milestone_id, 'burndown': milestone_series(milestone_id, start, end)}
+        return data
+
+    return conditional_json(request, build)
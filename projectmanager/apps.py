@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class ProjectmanagerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'projectmanager'
+
+    def ready(self):
+        # Signal-Handler für das gesammelte Schreiben des Activity-Logs
+        from . import activity  # noqa: F401
+
+        # Blob-Referenzen beim Löschen von Anhängen/Dokumenten freigeben
+        from .storage import connect_blob_signals
+        connect_blob_signals()
+
+        # Suchindex bei Änderungen aktualisieren
+        from .search import connect_search_signals
+        connect_search_signals()
@@ -0,0 +1,16 @@
+"""
+Lasttests für die Views und die WebSockets.
+
+- data.py:      synthetische Daten per bulk_create (`manage.py bench_seed`)
+- http_load.py: gewichtete HTTP-Szenarien (Dashboard, Projektliste, Task-Details, AJAX)
+- ws_load.py:   gleichzeitige Chat-Clients gegen den ChatConsumer
+- stats.py:     p50/p95/p99 und Durchsatz, Vergleich mit einem früheren Lauf
+
+Ohne --url laufen die Szenarien im Prozess (Django-Test-Client bzw.
+WebsocketCommunicator) und messen nur Django selbst; mit --url gegen einen
+laufenden Server (z.B. daphne) inklusive Netzwerk und Server.
+
+    python manage.py bench_seed --projects 10000 --tasks 100
+    python manage.py bench_run --concurrency 16 --requests 5000 --json run.json
+    python manage.py bench_run --url http://127.0.0.1:8000 --baseline run.json
+"""
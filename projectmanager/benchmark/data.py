@@ -0,0 +1,168 @@
+"""
+Synthetische Daten für Lasttests, alles per bulk_create.
+
+Projekte werden in Blöcken erzeugt, damit der Speicherbedarf auch bei
+10k Projekten / 1M Tasks begrenzt bleibt. IDs werden nach dem Einfügen über
+eindeutige Namen nachgeladen, da bulk_create sie nicht auf jeder DB liefert.
+Signale laufen dabei nicht: Suchindex und Snapshots bei Bedarf mit
+`rebuild_search_index` bzw. `backfill_snapshots` nachziehen.
+"""
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Message, Milestone, Project, ProjectMembership, Task, TaskComment, Update
+
+DEFAULT_PREFIX = 'bench'
+# Alle erzeugten User haben dieses Passwort (für Lasttests gegen einen laufenden Server)
+BENCH_PASSWORD = 'bench-password'
+
+STATUSES = [choice for choice, _ in Task.STATUS_CHOICES]
+PRIORITIES = [choice for choice, _ in Task.PRIORITY_CHOICES]
+
+
+@dataclass
+class Scale:
+    projects: int = 100
+    # Mitglieder, Milestones, Tasks, Nachrichten und Activity-Einträge je Projekt
+    members: int = 5
+    milestones: int = 5
+    tasks: int = 100
+    messages: int = 50
+    updates: int = 20
+    # Kommentare je Task (Durchschnitt)
+    comments: float = 1.0
+    # Größe des User-Pools; Standard: jeder User ist in etwa 10 Projekten
+    users: int = 0
+
+    def user_count(self):
+        return self.users or max(self.members + 1, self.projects * self.members // 10)
+
+
+def username(prefix, i):
+    return f'{prefix}_user_{i}'
+
+
+def project_title(prefix, i):
+    return f'{prefix} project {i}'
+
+
+def benchmark_users(prefix=DEFAULT_PREFIX):
+    return User.objects.filter(username__startswith=f'{prefix}_user_')
+
+
+def benchmark_projects(prefix=DEFAULT_PREFIX):
+    return Project.objects.filter(title__startswith=f'{prefix} project ')
+
+
+def clear(prefix=DEFAULT_PREFIX):
+    """Löscht alle Testdaten mit diesem Präfix (Projekte kaskadieren)."""
+    projects, _ = benchmark_projects(prefix).delete()
+    users, _ = benchmark_users(prefix).delete()
+    return projects + users
+
+
+def _create_users(prefix, count, batch_size):
+    password = make_password(BENCH_PASSWORD)
+    for start in range(0, count, batch_size):
+        User.objects.bulk_create([
+            User(username=username(prefix, i), email=f'{username(prefix, i)}@example.com', password=password)
+            for i in range(start, min(start + batch_size, count))
+        ])
+    return list(benchmark_users(prefix).order_by('id').values_list('id', flat=True))
+
+
+def _create_block(prefix, scale, first, count, user_ids, rng):
+    """Ein Block Projekte samt allem, was dazugehört."""
+    today = timezone.localdate()
+
+    titles = [project_title(prefix, i) for i in range(first, first + count)]
+    Project.objects.bulk_create([
+        Project(title=title, goal="Synthetic benchmark project", start_date=today - timedelta(days=90), end_date=today + timedelta(days=90))
+        for title in titles
+    ])
+    project_ids = list(Project.objects.filter(title__in=titles).values_list('id', flat=True))
+
+    members = {project_id: rng.sample(user_ids, min(scale.members, len(user_ids))) for project_id in project_ids}
+    ProjectMembership.objects.bulk_create([
+        ProjectMembership(project_id=project_id, user_id=user_id, role='ADMIN' if i == 0 else 'MEMBER')
+        for project_id, users in members.items()
+        for i, user_id in enumerate(users)
+    ])
+
+    Milestone.objects.bulk_create([
+        Milestone(project_id=project_id, title=f'Milestone {i}', deadline=today + timedelta(days=rng.randint(-30, 90)))
+        for project_id in project_ids
+        for i in range(scale.milestones)
+    ])
+    milestones = {}
+    for milestone_id, project_id in Milestone.objects.filter(project_id__in=project_ids).values_list('id', 'project_id'):
+        milestones.setdefault(project_id, []).append(milestone_id)
+
+    Task.objects.bulk_create([
+        Task(
+            project_id=project_id,
+            title=f'Task {i}',
+            description=f'Synthetic task {i} for load testing',
+            deadline=today + timedelta(days=rng.randint(-30, 90)),
+            status=rng.choice(STATUSES),
+            priority=rng.choice(PRIORITIES),
+            assigned_to_id=rng.choice(members[project_id]),
+            milestone_id=rng.choice(milestones[project_id]) if milestones.get(project_id) and rng.random() < 0.7 else None,
+        )
+        for project_id in project_ids
+        for i in range(scale.tasks)
+    ], batch_size=5000)
+
+    task_rows = list(Task.objects.filter(project_id__in=project_ids).values_list('id', 'project_id', 'title'))
+    comments = []
+    tasks_by_project = {}
+    for task_id, project_id, title in task_rows:
+        tasks_by_project.setdefault(project_id, []).append((task_id, title))
+        # Der Nachkommaanteil ist die Wahrscheinlichkeit für einen weiteren Kommentar
+        for _ in range(int(scale.comments) + (rng.random() < scale.comments % 1)):
+            comments.append(TaskComment(task_id=task_id, user_id=rng.choice(members[project_id]), text=f'Comment on {title}'))
+    updates = []
+    for project_id, project_tasks in tasks_by_project.items():
+        for _ in range(scale.updates):
+            task_id, title = rng.choice(project_tasks)
+            updates.append(Update(
+                project_id=project_id, user_id=rng.choice(members[project_id]), event_type='TASK_STATUS',
+                payload={'task': task_id, 'title': title, 'from': 'TODO', 'to': 'IN_PROGRESS'},
+            ))
+    TaskComment.objects.bulk_create(comments, batch_size=5000)
+    Update.objects.bulk_create(updates, batch_size=5000)
+
+    Message.objects.bulk_create([
+        Message(project_id=project_id, sender_id=rng.choice(members[project_id]), content=f'Message {i}')
+        for project_id in project_ids
+        for i in range(scale.messages)
+    ], batch_size=5000)
+    return len(task_rows), len(comments)
+
+
+def generate(scale, prefix=DEFAULT_PREFIX, seed=0, batch_size=50000, progress=None):
+    """
+    Erzeugt die Testdaten. `batch_size` begrenzt die Tasks pro Block.
+    Gibt {Modell: Anzahl} zurück.
+    """
+    rng = random.Random(seed)
+    user_ids = _create_users(prefix, scale.user_count(), batch_size)
+
+    projects_per_block = max(1, batch_size // max(scale.tasks, 1))
+    totals = {'users': len(user_ids), 'projects': 0, 'tasks': 0, 'comments': 0}
+    for first in range(0, scale.projects, projects_per_block):
+        count = min(projects_per_block, scale.projects - first)
+        with transaction.atomic():
+            tasks, comments = _create_block(prefix, scale, first, count, user_ids, rng)
+        totals['projects'] += count
+        totals['tasks'] += tasks
+        totals['comments'] += comments
+        if progress:
+            progress(totals)
+    return totals
@@ -0,0 +1,301 @@
+"""
+Gewichtete HTTP-Szenarien, ausgeführt von mehreren Threads.
+
+Jeder Thread spielt einen virtuellen User (einen der erzeugten bench_user_*)
+und ruft zufällig gewählte Szenarien auf, entweder im Prozess über den
+Django-Test-Client oder gegen einen laufenden Server (--url).
+"""
+import http.client
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+
+from ..models import Milestone, ProjectMembership, Task
+from .data import BENCH_PASSWORD, DEFAULT_PREFIX, benchmark_users
+from .stats import LatencyStats
+
+NEXT_STATUS = {'TODO': 'IN_PROGRESS', 'IN_PROGRESS': 'DONE', 'DONE': 'TODO'}
+AJAX = {'X-Requested-With': 'XMLHttpRequest'}
+
+
+@dataclass
+class VirtualUser:
+    user: object
+    project_ids: list
+    milestone_ids: list
+    # Eigene Tasks (nur diese darf der User verschieben) -> aktueller Status
+    task_status: dict
+    task_ids: list = field(default_factory=list)
+
+
+def load_virtual_users(count, prefix=DEFAULT_PREFIX, tasks_per_user=50):
+    """Die ersten `count` Testuser mit ihren Projekten, Milestones und eigenen Tasks."""
+    virtual_users = []
+    for user in benchmark_users(prefix).order_by('id')[:count]:
+        project_ids = list(ProjectMembership.objects.filter(user=user).values_list('project_id', flat=True))
+        if not project_ids:
+            continue
+        own_tasks = Task.objects.filter(project_id__in=project_ids, assigned_to=user).values_list('id', 'status')[:tasks_per_user]
+        virtual_users.append(VirtualUser(
+            user=user,
+            project_ids=project_ids,
+            milestone_ids=list(Milestone.objects.filter(project_id__in=project_ids).values_list('id', flat=True)[:20]),
+            task_status=dict(own_tasks),
+            task_ids=list(Task.objects.filter(project_id__in=project_ids[:5]).values_list('id', flat=True)[:tasks_per_user]),
+        ))
+    return virtual_users
+
+
+# -------------------------
+# Szenarien: (method, path, body, headers) für einen virtuellen User
+# -------------------------
+
+def project_list(vu, rng):
+    return 'GET', '/', None, {}
+
+
+def project_dashboard(vu, rng):
+    return 'GET', f'/projects/{rng.choice(vu.project_ids)}/', None, {}
+
+
+def task_detail(vu, rng):
+    task_id = rng.choice(vu.task_ids or list(vu.task_status) or [0])
+    return 'GET', f'/tasks/{task_id}/', None, AJAX
+
+
+def update_task_status(vu, rng):
+    if not vu.task_status:
+        return project_list(vu, rng)
+    task_id = rng.choice(list(vu.task_status))
+    current = vu.task_status[task_id]
+    new_status = NEXT_STATUS[current]
+    # Optimistisch annehmen; bei 409 korrigiert der Runner über on_response
+    vu.task_status[task_id] = new_status
+    body = json.dumps({'status': new_status, 'from': current})
+    return 'POST', f'/tasks/{task_id}/update_status/', body, {**AJAX, 'Content-Type': 'application/json'}
+
+
+def chat_history(vu, rng):
+    return 'GET', f'/projects/{rng.choice(vu.project_ids)}/messages/', None, AJAX
+
+
+def milestone_detail(vu, rng):
+    if not vu.milestone_ids:
+        return project_dashboard(vu, rng)
+    return 'GET', f'/milestone/{rng.choice(vu.milestone_ids)}/', None, AJAX
+
+
+def search(vu, rng):
+    return 'GET', '/search/?' + urlencode({'q': rng.choice(['task', 'synthetic', 'comment', 'milestone']), 'format': 'json'}), None, AJAX
+
+
+# Name -> (Szenario, Gewicht)
+SCENARIOS = {
+    'project_list': (project_list, 2),
+    'project_dashboard': (project_dashboard, 4),
+    'task_detail': (task_detail, 4),
+    'update_task_status': (update_task_status, 3),
+    'chat_history': (chat_history, 2),
+    'milestone_detail': (milestone_detail, 1),
+    'search': (search, 1),
+}
+
+
+def _on_response(vu, method, path, status, body):
+    # Konflikt: Status vom Server übernehmen
+    if status == 409 and path.endswith('/update_status/'):
+        task_id = int(path.split('/')[2])
+        try:
+            vu.task_status[task_id] = json.loads(body)['current_status']
+        except (ValueError, KeyError):
+            pass
+
+
+# -------------------------
+# Clients
+# -------------------------
+
+def _local_host():
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+class InProcessClient:
+    """Django-Test-Client: misst nur Middleware, Views und DB, ohne Server und Netzwerk."""
+
+    def __init__(self, user):
+        # Fehler als 500 zählen statt die Exception durchzureichen
+        self.client = Client(raise_request_exception=False, HTTP_HOST=_local_host())
+        self.client.force_login(user)
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        content_type = headers.pop('Content-Type', 'application/octet-stream')
+        if method == 'GET':
+            response = self.client.get(path, headers=headers)
+        else:
+            response = self.client.generic(method, path, data=body or '', content_type=content_type, headers=headers)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, content
+
+    def close(self):
+        pass
+
+
+class LiveClient:
+    """Keep-Alive-Verbindung zu einem laufenden Server, Login über das normale Formular."""
+
+    def __init__(self, base_url, username, password=BENCH_PASSWORD):
+        url = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(url.hostname, url.port, timeout=60)
+        self.origin = f'{url.scheme}://{url.netloc}'
+        self.cookies = SimpleCookie()
+        self.login(username, password)
+
+    def login(self, username, password):
+        self.request('GET', '/login/')
+        body = urlencode({
+            'username': username,
+            'password': password,
+            'csrfmiddlewaretoken': self.cookies['csrftoken'].value,
+        })
+        status, _ = self.request('POST', '/login/', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+        if 'sessionid' not in self.cookies:
+            raise RuntimeError(f"Login as {username} failed (HTTP {status})")
+
+    def request(self, method, path, body=None, headers=None):
+        headers = {
+            **(headers or {}),
+            'Cookie': '; '.join(f'{name}={morsel.value}' for name, morsel in self.cookies.items()),
+            'Referer': self.origin + '/',
+        }
+        if method != 'GET' and 'csrftoken' in self.cookies:
+            headers['X-CSRFToken'] = self.cookies['csrftoken'].value
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Server hat die Keep-Alive-Verbindung geschlossen: einmal neu verbinden
+            self.connection.close()
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        content = response.read()
+        for header in response.headers.get_all('Set-Cookie') or []:
+            self.cookies.load(header)
+        return response.status, content
+
+    def close(self):
+        self.connection.close()
+
+
+# -------------------------
+# Runner
+# -------------------------
+
+def _request(client, vu, scenarios, weights, rng):
+    name = rng.choices(scenarios, weights)[0]
+    method, path, body, headers = SCENARIOS[name][0](vu, rng)
+    started = time.perf_counter()
+    try:
+        status, content = client.request(method, path, body, headers)
+    except Exception:
+        status, content = 0, b''
+    elapsed = time.perf_counter() - started
+    _on_response(vu, method, path, status, content)
+    # 409 ist ein erwarteter Konflikt zwischen gleichzeitigen Usern
+    return name, elapsed, 200 <= status < 400 or status == 409
+
+
+def _worker(make_client, vu, scenarios, weights, seed, warmup, ready, take, stats):
+    rng = random.Random(seed)
+    client = None
+    try:
+        try:
+            client = make_client(vu.user)
+            for _ in range(warmup):
+                _request(client, vu, scenarios, weights, rng)
+        except Exception:
+            ready.abort()
+            raise
+        # Gemessen wird erst, wenn alle Threads eingeloggt und aufgewärmt sind
+        ready.wait()
+        while take():
+            name, elapsed, ok = _request(client, vu, scenarios, weights, rng)
+            stats.add(name, elapsed, ok)
+    finally:
+        if client is not None:
+            client.close()
+        connections.close_all()
+
+
+def run_http(virtual_users, concurrency=8, requests=1000, duration=None, scenarios=None,
+             base_url=None, warmup=5, seed=0):
+    """
+    Führt `requests` Anfragen (oder so viele wie in `duration` Sekunden möglich)
+    mit `concurrency` Threads aus. Gibt ein LatencyStats zurück.
+    """
+    if not virtual_users:
+        raise ValueError("No benchmark users with projects found, run bench_seed first")
+    scenarios = scenarios or list(SCENARIOS)
+    weights = [SCENARIOS[name][1] for name in scenarios]
+
+    if base_url:
+        def make_client(user):
+            return LiveClient(base_url, user.username)
+    else:
+        make_client = InProcessClient
+
+    lock = threading.Lock()
+    remaining = [requests]
+    deadline = [None]
+    stats = LatencyStats()
+
+    def take():
+        if duration:
+            return time.perf_counter() < deadline[0]
+        with lock:
+            remaining[0] -= 1
+            return remaining[0] >= 0
+
+    def start():
+        # Läuft genau einmal, bevor die Barriere irgendeinen Thread freigibt
+        stats.start()
+        if duration:
+            deadline[0] = time.perf_counter() + duration
+
+    ready = threading.Barrier(concurrency + 1, action=start)
+    per_thread = [LatencyStats() for _ in range(concurrency)]
+    threads = [
+        threading.Thread(
+            target=_worker,
+            args=(make_client, virtual_users[i % len(virtual_users)], scenarios, weights, seed + i, warmup, ready, take, per_thread[i]),
+            daemon=True,
+        )
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        ready.wait()
+    except threading.BrokenBarrierError:
+        for thread in threads:
+            thread.join()
+        raise RuntimeError("A benchmark client failed to start, see the traceback above")
+
+    for thread in threads:
+        thread.join()
+    stats.stop()
+    for thread_stats in per_thread:
+        stats.merge(thread_stats)
+    return stats
@@ -0,0 +1,101 @@
+"""Latenzen sammeln und als p50/p95/p99 plus Durchsatz auswerten."""
+import json
+import math
+import time
+from collections import Counter, defaultdict
+
+
+def percentile(sorted_values, q):
+    """Nearest-Rank-Perzentil (q in Prozent) einer sortierten Liste."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class LatencyStats:
+    """Messwerte je Szenario; ein Objekt pro Thread/Task, am Ende mit merge() zusammenführen."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = Counter()
+        self.started = None
+        self.finished = None
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    def add(self, name, seconds, ok=True):
+        self.samples[name].append(seconds)
+        if not ok:
+            self.errors[name] += 1
+
+    def merge(self, other):
+        for name, values in other.samples.items():
+            self.samples[name].extend(values)
+        self.errors.update(other.errors)
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def _summarize(self, values, errors):
+        values = sorted(values)
+        return {
+            'count': len(values),
+            'errors': errors,
+            'throughput': round(len(values) / self.elapsed, 1) if self.elapsed else 0.0,
+            'mean_ms': round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'max_ms': round(values[-1] * 1000, 2) if values else 0.0,
+        }
+
+    def summary(self):
+        result = {name: self._summarize(values, self.errors[name]) for name, values in sorted(self.samples.items())}
+        result['total'] = self._summarize(
+            [value for values in self.samples.values() for value in values], sum(self.errors.values())
+        )
+        return result
+
+
+COLUMNS = ['count', 'errors', 'throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+
+
+def format_table(summary, baseline=None):
+    """
+    Tabelle für die Konsole. Mit baseline (summary eines früheren Laufs)
+    wird die Änderung von p95 und Durchsatz in Prozent angehängt.
+    """
+    width = max([len(name) for name in summary] + [8])
+    header = f"{'scenario':<{width}}" + ''.join(f'{column:>12}' for column in COLUMNS)
+    if baseline:
+        header += f"{'p95 Δ':>10}{'req/s Δ':>10}"
+    lines = [header, '-' * len(header)]
+    for name, row in summary.items():
+        line = f'{name:<{width}}' + ''.join(f'{row[column]:>12}' for column in COLUMNS)
+        previous = (baseline or {}).get(name)
+        if previous:
+            line += f"{_change(row['p95_ms'], previous['p95_ms']):>10}{_change(row['throughput'], previous['throughput']):>10}"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def _change(current, previous):
+    if not previous:
+        return '-'
+    return f'{(current - previous) / previous * 100:+.1f}%'
+
+
+def save(path, results):
+    with open(path, 'w') as fh:
+        json.dump(results, fh, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as fh:
+        return json.load(fh)
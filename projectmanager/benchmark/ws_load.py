@@ -0,0 +1,241 @@
+"""
+Gleichzeitige Chat-Clients gegen den ChatConsumer.
+
+Jeder Client verbindet sich mit einem Projekt-Chat, schickt Nachrichten und
+empfängt alle Broadcasts seines Raums. Gemessen werden Verbindungsaufbau,
+Round-Trip der eigenen Nachricht und Fan-out-Latenz bei den anderen
+Empfängern; der Durchsatz sind zugestellte Nachrichten pro Sekunde.
+
+Im Prozess über channels' WebsocketCommunicator, mit --url über einen
+minimalen WebSocket-Client (RFC 6455, nur Text-Frames) gegen den Server.
+"""
+import asyncio
+import base64
+import json
+import os
+import struct
+import time
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+
+from ..routing import websocket_urlpatterns
+from .http_load import LiveClient
+from .stats import LatencyStats
+
+MESSAGE_PREFIX = 'bench'
+RECEIVE_TIMEOUT = 10
+
+
+class InProcessConnection:
+    application = None
+
+    def __init__(self, path, user):
+        if InProcessConnection.application is None:
+            InProcessConnection.application = URLRouter(websocket_urlpatterns)
+        self.communicator = WebsocketCommunicator(InProcessConnection.application, path)
+        # Entspricht dem, was AuthMiddlewareStack aus der Session liest
+        self.communicator.scope['user'] = user
+
+    async def connect(self):
+        connected, _ = await self.communicator.connect()
+        if not connected:
+            raise ConnectionError("WebSocket connection rejected")
+
+    async def send(self, text):
+        await self.communicator.send_to(text_data=text)
+
+    async def receive(self, timeout=RECEIVE_TIMEOUT):
+        return await self.communicator.receive_from(timeout=timeout)
+
+    async def close(self):
+        await self.communicator.disconnect()
+
+
+class LiveConnection:
+    """Minimaler WebSocket-Client über asyncio-Streams (maskierte Text-Frames, Ping/Pong, Close)."""
+
+    def __init__(self, base_url, path, cookie):
+        self.url = urlsplit(base_url)
+        self.path = path
+        self.cookie = cookie
+        self.reader = self.writer = None
+
+    async def connect(self):
+        secure = self.url.scheme in ('https', 'wss')
+        port = self.url.port or (443 if secure else 80)
+        self.reader, self.writer = await asyncio.open_connection(self.url.hostname, port, ssl=secure or None)
+        key = base64.b64encode(os.urandom(16)).decode()
+        origin = f"{'https' if secure else 'http'}://{self.url.netloc}"
+        self.writer.write((
+            f'GET {self.path} HTTP/1.1\r\n'
+            f'Host: {self.url.netloc}\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Key: {key}\r\n'
+            'Sec-WebSocket-Version: 13\r\n'
+            f'Origin: {origin}\r\n'
+            f'Cookie: {self.cookie}\r\n'
+            '\r\n'
+        ).encode())
+        await self.writer.drain()
+        response = await self.reader.readuntil(b'\r\n\r\n')
+        if not response.startswith(b'HTTP/1.1 101'):
+            raise ConnectionError(response.split(b'\r\n', 1)[0].decode(errors='replace'))
+
+    async def _send_frame(self, opcode, payload):
+        mask = os.urandom(4)
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, 0x80 | length)
+        elif length < 1 << 16:
+            header = struct.pack('!BBH', 0x80 | opcode, 0x80 | 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 0x80 | 127, length)
+        masked = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+        self.writer.write(header + mask + masked)
+        await self.writer.drain()
+
+    async def send(self, text):
+        await self._send_frame(0x1, text.encode())
+
+    async def _read_frame(self):
+        first, second = await self.reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', await self.reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', await self.reader.readexactly(8))[0]
+        mask = await self.reader.readexactly(4) if second & 0x80 else None
+        payload = await self.reader.readexactly(length)
+        if mask:
+            payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+        return bool(first & 0x80), first & 0x0F, payload
+
+    async def _receive(self):
+        message = b''
+        while True:
+            fin, opcode, payload = await self._read_frame()
+            if opcode == 0x8:
+                raise ConnectionError("WebSocket closed by server")
+            if opcode == 0x9:
+                await self._send_frame(0xA, payload)
+                continue
+            if opcode in (0x1, 0x0):
+                message += payload
+                if fin:
+                    return message.decode()
+
+    async def receive(self, timeout=RECEIVE_TIMEOUT):
+        return await asyncio.wait_for(self._receive(), timeout)
+
+    async def close(self):
+        try:
+            await self._send_frame(0x8, struct.pack('!H', 1000))
+        finally:
+            self.writer.close()
+
+
+def _encode(client_id, seq):
+    return f'{MESSAGE_PREFIX}:{client_id}:{seq}:{time.time()}'
+
+
+def _decode(text):
+    try:
+        prefix, client_id, seq, sent_at = text.split(':')
+    except ValueError:
+        return None
+    if prefix != MESSAGE_PREFIX:
+        return None
+    return int(client_id), int(seq), float(sent_at)
+
+
+async def _client(client_id, connection, messages, interval, expected, stats, start_gate):
+    started = time.perf_counter()
+    await connection.connect()
+    stats.add('ws_connect', time.perf_counter() - started)
+
+    # Erst senden, wenn alle Clients verbunden sind, sonst fehlen frühe Broadcasts
+    await start_gate.wait()
+    sent = {}
+
+    async def sender():
+        for seq in range(messages):
+            sent[seq] = time.perf_counter()
+            await connection.send(json.dumps({'message': _encode(client_id, seq)}))
+            await asyncio.sleep(interval)
+
+    async def receiver():
+        received = 0
+        while received < expected:
+            try:
+                data = json.loads(await connection.receive())
+            except (asyncio.TimeoutError, ConnectionError):
+                stats.errors['chat_delivery'] += expected - received
+                return
+            decoded = _decode(data.get('message') or '')
+            if decoded is None:
+                continue
+            received += 1
+            sender_id, seq, sent_at = decoded
+            if sender_id == client_id:
+                stats.add('chat_round_trip', time.perf_counter() - sent[seq])
+            else:
+                stats.add('chat_fanout', max(time.time() - sent_at, 0.0))
+
+    try:
+        await asyncio.gather(sender(), receiver())
+    finally:
+        await connection.close()
+
+
+async def run_chat_async(rooms, clients, messages, interval, make_connection):
+    """
+    rooms: [(project_id, [user, ...])], die Clients werden reihum verteilt.
+    make_connection(path, user) -> Verbindung mit connect/send/receive/close.
+    """
+    assignments = []
+    for i in range(clients):
+        project_id, users = rooms[i % len(rooms)]
+        assignments.append((i, project_id, users[(i // len(rooms)) % len(users)]))
+    per_room = {}
+    for _, project_id, _ in assignments:
+        per_room[project_id] = per_room.get(project_id, 0) + 1
+
+    stats = LatencyStats()
+    start_gate = asyncio.Event()
+    connections = [await make_connection(f'/ws/chat/{project_id}/', user) for _, project_id, user in assignments]
+    tasks = [
+        asyncio.create_task(_client(
+            client_id, connection, messages, interval, per_room[project_id] * messages, stats, start_gate,
+        ))
+        for (client_id, project_id, _), connection in zip(assignments, connections)
+    ]
+    # Warten, bis alle verbunden sind (ws_connect wurde für jeden Client erfasst)
+    while len(stats.samples['ws_connect']) < len(tasks) and not any(task.done() for task in tasks):
+        await asyncio.sleep(0.01)
+    stats.start()
+    start_gate.set()
+    await asyncio.gather(*tasks)
+    stats.stop()
+    return stats
+
+
+def run_chat(rooms, clients=50, messages=20, interval=0.05, base_url=None):
+    """Synchroner Einstieg für den Management-Command. Gibt ein LatencyStats zurück."""
+    if base_url:
+        sessions = {}
+
+        async def make_connection(path, user):
+            if user.id not in sessions:
+                client = await sync_to_async(LiveClient)(base_url, user.username)
+                sessions[user.id] = '; '.join(f'{name}={morsel.value}' for name, morsel in client.cookies.items())
+                client.close()
+            return LiveConnection(base_url, path, sessions[user.id])
+    else:
+        async def make_connection(path, user):
+            return InProcessConnection(path, user)
+
+    return asyncio.run(run_chat_async(rooms, clients, messages, interval, make_connection))
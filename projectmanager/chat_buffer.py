@@ -0,0 +1,160 @@
+import asyncio
+import atexit
+import logging
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection
+
+from .models import Message
+from .search import catch_up
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBuffer:
+    """
+    Write-behind Puffer für Chat-Nachrichten.
+
+    Nachrichten werden sofort gebroadcastet und hier nur eingereiht. Geschrieben
+    wird gesammelt per bulk_create, sobald `max_size` erreicht ist oder
+    `flush_interval` Sekunden vergangen sind. Nachrichten bleiben im Puffer, bis
+    ein Flush erfolgreich war (at-least-once); beim Beenden wird der Rest geschrieben.
+    Ist die DB länger weg, werden über `max_pending` hinaus neue Nachrichten verworfen.
+    """
+
+    def __init__(self, max_size=50, flush_interval=1.0, max_pending=5000):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = []  # (enqueued_at, Message)
+        self._flush_lock = None
+        self._timer = None
+        self.flushed_total = 0
+        self.flush_count = 0
+        self.failed_total = 0
+        self.dropped_total = 0
+        self.last_flush_lag = 0.0
+        self.max_flush_lag = 0.0
+
+    async def add(self, project_id, sender_id, content):
+        """Reiht eine Nachricht ein; False, wenn der Puffer voll ist und sie verworfen wurde."""
+        if len(self._pending) >= self.max_pending:
+            self.dropped_total += 1
+            logger.warning("chat buffer full (%d pending), dropping message for project %s", len(self._pending), project_id)
+            return False
+
+        self._pending.append((time.monotonic(), Message(
+            project_id=project_id,
+            sender_id=sender_id,
+            content=content
+        )))
+
+        if len(self._pending) >= self.max_size:
+            try:
+                await self.flush()
+            except Exception:
+                # Nicht bis in den Consumer durchreichen (würde den Socket schließen),
+                # der Batch bleibt im Puffer und der Timer versucht es erneut
+                logger.exception("flushing %d chat messages failed, will retry", len(self._pending))
+        if self._pending and (self._timer is None or self._timer.done()):
+            self._timer = asyncio.ensure_future(self._flush_later())
+        return True
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("flushing %d chat messages failed, will retry", len(self._pending))
+
+        # Neu eingereihte oder fehlgeschlagene Nachrichten erneut einplanen
+        if self._pending:
+            self._timer = asyncio.ensure_future(self._flush_later())
+
+    async def flush(self):
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch = self._pending[:]
+            written = await database_sync_to_async(self._write)(batch)
+            # Erst nach erfolgreichem Schreiben aus dem Puffer entfernen
+            del self._pending[:len(batch)]
+            return written
+
+    def flush_sync(self):
+        """Schreibt verbliebene Nachrichten synchron, z.B. beim Prozessende."""
+        if not self._pending:
+            return 0
+        batch = self._pending[:]
+        written = self._write(batch)
+        del self._pending[:len(batch)]
+        return written
+
+    def _write(self, batch):
+        # Nicht mitten in einer offenen Transaktion (z.B. flush_sync in einem TestCase), das würde sie abbrechen
+        if not connection.in_atomic_block:
+            close_old_connections()
+        messages = [message for _, message in batch]
+        try:
+            Message.objects.bulk_create(messages)
+            written = len(messages)
+        except IntegrityError:
+            # Einzelne fehlerhafte Nachricht (z.B. gelöschtes Projekt) soll nicht den Batch blockieren.
+            # Andere DB-Fehler werden weitergereicht, der Batch bleibt dann im Puffer.
+            logger.exception("bulk_create of %d chat messages failed, retrying one by one", len(messages))
+            written = 0
+            for message in messages:
+                try:
+                    message.save()
+                    written += 1
+                except IntegrityError:
+                    self.failed_total += 1
+                    logger.exception("dropping chat message for project %s", message.project_id)
+
+        try:
+            # Läuft im Chat-Pfad: nur ein Batch, ein Rückstand wird über die nächsten Flushes abgebaut
+            catch_up('message', max_batches=1)
+        except Exception:
+            # Die Nachrichten sind gespeichert, der nächste Flush holt den Index nach
+            logger.exception("indexing chat messages failed")
+
+        now = time.monotonic()
+        lag = now - batch[0][0]
+        self.flushed_total += written
+        self.flush_count += 1
+        self.last_flush_lag = lag
+        self.max_flush_lag = max(self.max_flush_lag, lag)
+        # Pro Flush nur DEBUG, die Kennzahlen stehen in stats()
+        logger.debug("flushed %d chat messages, lag %.1f ms", written, lag * 1000)
+        return written
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "flushed_total": self.flushed_total,
+            "flush_count": self.flush_count,
+            "failed_total": self.failed_total,
+            "dropped_total": self.dropped_total,
+            "last_flush_lag_ms": round(self.last_flush_lag * 1000, 1),
+            "max_flush_lag_ms": round(self.max_flush_lag * 1000, 1),
+        }
+
+
+message_buffer = MessageBuffer(
+    max_size=getattr(settings, 'CHAT_BUFFER_MAX_SIZE', 50),
+    flush_interval=getattr(settings, 'CHAT_BUFFER_FLUSH_INTERVAL', 1.0),
+    max_pending=getattr(settings, 'CHAT_BUFFER_MAX_PENDING', 5000),
+)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        message_buffer.flush_sync()
+    except Exception:
+        logger.exception("could not flush chat messages on shutdown")
@@ -1,7 +1,13 @@
 import json
+import logging
+import time
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async # WICHTIG
-from .models import Message, Project # Importiere deine Models
+from .chat_buffer import message_buffer
+from .events import project_group_name
+from .roles import is_project_member
+
+logger = logging.getLogger(__name__)
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -19,25 +25,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        # Beim Schließen (auch beim Herunterfahren des Servers) Puffer leeren
+        await message_buffer.flush()
 
     async def receive(self, text_data):
-        print("--- RECEIVE START ---")
         data = json.loads(text_data)
         message_text = data.get('message')
         user = self.scope["user"]
-
-        print(f"Empfange: '{message_text}' von User: {user} (ID: {user.id if user.id else 'Keine'})")
-
-        if user.is_authenticated:
-            print(f"Versuche Speichern für Projekt ID: {self.project_id}")
-            try:
-                # Wir warten hier explizit auf das Ergebnis
-                saved_msg = await self.save_message(user, self.project_id, message_text)
-                print(f"ERFOLG: Nachricht gespeichert mit ID: {saved_msg.id}")
-            except Exception as e:
-                print(f"FEHLER beim Speichern: {str(e)}")
-        else:
-            print("WARNUNG: User ist nicht authentifiziert, Speichern übersprungen.")
+        logger.debug("chat message from user %s in %s", user.id, self.room_group_name)
 
         # Senden an die Gruppe
         await self.channel_layer.group_send(
@@ -45,30 +40,46 @@ class ChatConsumer(AsyncWebsocketConsumer):
             {
                 'type': 'chat_message',
                 'message': message_text,
-                'username': user.username
+                'username': user.username,
+                # Zeitpunkt zum Messen der Fan-out-Latenz beim Empfänger
+                'sent_at': time.time()
             }
         )
 
+        # Persistieren erst nach dem Broadcast, gesammelt per bulk_create
+        if user.is_authenticated:
+            await message_buffer.add(self.project_id, user.id, message_text)
+        else:
+            logger.warning("unauthenticated chat message in %s not saved", self.room_group_name)
+
     async def chat_message(self, event):
+        if 'sent_at' in event:
+            latency_ms = (time.time() - event['sent_at']) * 1000
+            logger.debug("chat fan-out latency %.1f ms (%s)", latency_ms, self.room_group_name)
+
         await self.send(text_data=json.dumps({
             'message': event['message'],
             'username': event['username']
         }))
 
-    # Diese Methode speichert die Nachricht in der DB
-    @database_sync_to_async
-    def save_message(self, user, project_id, message):
-        # Wir importieren hier zur Sicherheit lokal, falls es ein Zirkel-Import Problem gibt
-        from .models import Message, Project
-        
-        # Prüfen, ob das Projekt existiert
-        try:
-            project = Project.objects.get(id=project_id)
-            return Message.objects.create(
-                project=project,
-                sender=user,
-                content=message
-            )
-        except Project.DoesNotExist:
-            print(f"KRITISCH: Projekt mit ID {project_id} nicht gefunden!")
-            raise
\ No newline at end of file
+
+class ProjectEventConsumer(AsyncWebsocketConsumer):
+    """Pusht Task-Änderungen (Deltas) an alle offenen Boards eines Projekts."""
+
+    async def connect(self):
+        self.project_id = int(self.scope['url_route']['kwargs']['project_id'])
+        self.group_name = project_group_name(self.project_id)
+        user = self.scope["user"]
+
+        if not user.is_authenticated or not await database_sync_to_async(is_project_member)(user, self.project_id):
+            await self.close()
+            return
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def project_event(self, event):
+        await self.send(text_data=json.dumps(event['payload']))
@@ -1,26 +1,17 @@
-from .models import ProjectMembership, ProjectInvitation
+from .invitations import PendingInvitations
+from .roles import get_project_role
 
 def invitations_processor(request):
     if request.user.is_authenticated:
+        # Lädt erst, wenn ein Template die Einladungen wirklich anzeigt
         return {
-            "pending_invitations": ProjectInvitation.objects.filter(
-                email=request.user.email,
-                accepted__isnull=True
-            )
+            "pending_invitations": PendingInvitations(request.user.email)
         }
     return {}
 
 def project_role_processor(request):
     def get_role(project):
-        if not request.user.is_authenticated:
-            return None
-        try:
-            return ProjectMembership.objects.get(
-                user=request.user,
-                project=project
-            ).role
-        except ProjectMembership.DoesNotExist:
-            return None
+        return get_project_role(request.user, project)
 
     return {
         "get_project_role": get_role
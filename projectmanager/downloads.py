@@ -0,0 +1,168 @@
+"""
+Auslieferung von Anhängen und Dokumenten nach der Rechteprüfung.
+
+FILE_DOWNLOAD_MODE:
+- 'django':     FileResponse mit Range- und Conditional-Requests; der WSGI-Server
+                kann die Datei über wsgi.file_wrapper per sendfile schicken
+- 'x-accel':    nginx übernimmt (X-Accel-Redirect auf eine internal-Location)
+- 'x-sendfile': Apache/lighttpd übernimmt (X-Sendfile mit absolutem Pfad)
+"""
+import logging
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .storage import blob_digest
+
+logger = logging.getLogger(__name__)
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class FileRange:
+    """
+    Liest nur [start, start + length) aus einer offenen Datei.
+
+    fileno() bleibt erreichbar, damit Server wie gunicorn per sendfile genau
+    Content-Length Bytes ab der aktuellen Position schicken können.
+    """
+
+    def __init__(self, fh, start, length):
+        self.fh = fh
+        self.remaining = length
+        fh.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.fh.fileno()
+
+    def close(self):
+        self.fh.close()
+
+
+def parse_range(header, size):
+    """
+    Einzelner Byte-Range als (start, end) inklusive, None für die ganze Datei.
+    Mehrere Ranges werden nicht unterstützt und wie kein Range behandelt.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size:
+            raise RangeNotSatisfiable()
+        if end < start:
+            return None
+    else:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        start, end = max(size - suffix, 0), size - 1
+    return start, end
+
+
+def file_etag(name, stat):
+    # Blobs sind unveränderlich, der Hash ist der perfekte ETag
+    digest = blob_digest(name)
+    return quote_etag(digest if digest else f'{int(stat.st_mtime)}-{stat.st_size}')
+
+
+def if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def serve_file(request, field_file, filename, inline=False):
+    """Antwort für eine bereits autorisierte Datei (FieldFile)."""
+    name = field_file.name
+    path = field_file.storage.path(name)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        # Zeile ohne Datei (z.B. nach einem Restore ohne Medien): für den Client einfach nicht vorhanden
+        logger.warning("file %s is missing from storage", name)
+        raise Http404("File not found")
+
+    etag = file_etag(name, stat)
+    last_modified = int(stat.st_mtime)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    mode = getattr(settings, 'FILE_DOWNLOAD_MODE', 'django')
+
+    if mode in ('x-accel', 'x-sendfile'):
+        # Range/Conditional übernimmt der Frontserver
+        response = HttpResponse(content_type=content_type)
+        if mode == 'x-accel':
+            prefix = getattr(settings, 'FILE_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+            response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(name)
+        else:
+            response['X-Sendfile'] = path
+    else:
+        size = stat.st_size
+        byte_range = None
+        range_header = request.META.get('HTTP_RANGE')
+        if range_header and if_range_matches(request, etag, last_modified):
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        try:
+            fh = open(path, 'rb')
+        except FileNotFoundError:
+            raise Http404("File not found")
+        if byte_range is None:
+            response = FileResponse(fh, content_type=content_type)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = FileResponse(
+                FileRange(fh, start, length),
+                status=206,
+                content_type=content_type,
+                headers={'Content-Length': str(length)},
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Accept-Ranges'] = 'bytes'
+
+    disposition = 'inline' if inline else 'attachment'
+    response['Content-Disposition'] = f"{disposition}; filename*=UTF-8''{quote(filename)}"
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Nur der angemeldete User darf die Antwort cachen
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,54 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+
+def project_group_name(project_id):
+    return f'project_{project_id}'
+
+
+def serialize_task_fields(task, fields):
+    """Nur die geänderten Felder, so wie sie das Board braucht."""
+    data = {}
+    for field in fields:
+        if field == 'deadline':
+            data['deadline'] = task.deadline.isoformat() if task.deadline else None
+        elif field == 'assigned_to':
+            data['assigned_to'] = task.assigned_to_id
+            data['assigned_to_username'] = task.assigned_to.username if task.assigned_to else None
+        elif field == 'milestone':
+            data['milestone'] = task.milestone_id
+        else:
+            data[field] = getattr(task, field)
+    return data
+
+
+def send_project_event(project_id, payload):
+    """Schickt ein Event nach erfolgreichem Commit an alle Clients des Projekts."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    def send():
+        async_to_sync(channel_layer.group_send)(
+            project_group_name(project_id),
+            {'type': 'project.event', 'payload': payload}
+        )
+
+    transaction.on_commit(send)
+
+
+def send_task_delta(task, fields, created=False):
+    send_project_event(task.project_id, {
+        'kind': 'task.created' if created else 'task.changed',
+        'id': task.id,
+        'version': task.version,
+        'fields': serialize_task_fields(task, fields),
+    })
+
+
+def send_task_deleted(project_id, task_id):
+    send_project_event(project_id, {
+        'kind': 'task.deleted',
+        'id': task_id,
+    })
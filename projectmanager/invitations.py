@@ -0,0 +1,71 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+
+from .models import ProjectInvitation
+
+# Wie viele Einladungen im Dropdown angezeigt werden
+PENDING_INVITATIONS_LIMIT = 5
+
+
+def pending_invitations_cache_key(email):
+    digest = hashlib.sha1(email.encode('utf-8')).hexdigest()
+    return f'pending_invitations:{digest}'
+
+
+def load_pending_invitations(email):
+    invitations = ProjectInvitation.objects.filter(
+        email=email,
+        accepted__isnull=True
+    ).order_by('-created_at')
+
+    items = [
+        {
+            'id': inv['id'],
+            'project': {'title': inv['project__title']},
+            'invited_by': {'username': inv['invited_by__username']},
+        }
+        for inv in invitations.values('id', 'project__title', 'invited_by__username')[:PENDING_INVITATIONS_LIMIT]
+    ]
+    count = len(items) if len(items) < PENDING_INVITATIONS_LIMIT else invitations.count()
+    return {'count': count, 'items': items}
+
+
+def invalidate_pending_invitations(email):
+    if email:
+        cache.delete(pending_invitations_cache_key(email))
+
+
+class PendingInvitations:
+    """
+    Offene Einladungen eines Users für das Template, erst beim ersten Zugriff
+    aus dem Cache (bzw. der DB) geladen.
+    """
+
+    def __init__(self, email):
+        self.email = email
+
+    @cached_property
+    def _data(self):
+        if not self.email:
+            return {'count': 0, 'items': []}
+        return cache.get_or_set(
+            pending_invitations_cache_key(self.email),
+            lambda: load_pending_invitations(self.email),
+            getattr(settings, 'INVITATIONS_CACHE_TIMEOUT', 300)
+        )
+
+    @property
+    def count(self):
+        return self._data['count']
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self._data['items'])
@@ -0,0 +1,276 @@
+"""
+Dauerhafte Job-Queue in der Datenbank.
+
+- enqueue() legt einen Job an und kehrt sofort zurück; mit dedup_key gibt es
+  pro Schlüssel höchstens einen offenen Job (z.B. pro Projekt und Vorschlagstyp)
+- `manage.py run_jobs` holt Jobs nach Priorität und führt sie in einem
+  Prozess-Pool aus
+- Fehlgeschlagene Jobs werden mit wachsendem Abstand erneut versucht
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Job-Art -> Funktion (Pfad, damit auch frisch gestartete Worker-Prozesse sie finden)
+JOB_HANDLERS = {
+    'ai_suggestion': 'projectmanager.suggestions.run_suggestion_job',
+    'deadline_risk': 'projectmanager.risk.run_deadline_risk_job',
+}
+
+# Wartezeit vor dem n-ten Wiederholungsversuch: RETRY_BASE_DELAY * 2**(n-1)
+RETRY_BASE_DELAY = 30
+# Wie oft der Worker nach hängengebliebenen Jobs sieht (Sekunden)
+STALE_CHECK_INTERVAL = 60
+
+
+def _job_model():
+    # Erst zur Laufzeit auflösen: Worker-Prozesse importieren dieses Modul vor django.setup()
+    return apps.get_model('projectmanager', 'Job')
+
+
+def enqueue(kind, payload=None, project=None, priority=0, dedup_key=None, max_attempts=3):
+    """
+    Legt einen Job an. Gibt es zu dedup_key schon einen offenen Job, wird
+    dieser zurückgegeben (und bei Bedarf höher priorisiert).
+    """
+    Job = _job_model()
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    try:
+        with transaction.atomic():
+            return Job.objects.create(
+                kind=kind,
+                project_id=getattr(project, 'pk', project),
+                payload=payload or {},
+                priority=priority,
+                active_key=dedup_key,
+                max_attempts=max_attempts,
+            )
+    except IntegrityError:
+        if dedup_key is None:
+            raise
+
+    Job.objects.filter(active_key=dedup_key, priority__lt=priority).update(priority=priority)
+    job = Job.objects.filter(active_key=dedup_key).first()
+    if job is None:
+        # Der offene Job wurde gerade fertig, also neu anlegen
+        return enqueue(kind, payload, project, priority, dedup_key, max_attempts)
+    return job
+
+
+def claim_jobs(worker_id, limit):
+    """Reserviert bis zu `limit` fällige Jobs für diesen Worker (höchste Priorität zuerst)."""
+    Job = _job_model()
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='PENDING', run_after__lte=now)
+            .order_by('-priority', 'run_after', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if ids:
+            Job.objects.filter(id__in=ids).update(
+                status='RUNNING',
+                locked_by=worker_id,
+                locked_at=now,
+                attempts=F('attempts') + 1,
+            )
+    return ids
+
+
+def release_jobs(worker_id, job_ids):
+    """Reservierte, aber nie gestartete Jobs zurückgeben, ohne einen Versuch zu verbrauchen."""
+    Job = _job_model()
+    return Job.objects.filter(id__in=job_ids, status='RUNNING', locked_by=worker_id).update(
+        status='PENDING',
+        locked_by='',
+        locked_at=None,
+        attempts=F('attempts') - 1,
+    )
+
+
+def _finish(job_id, error=None, worker_id=None, attempts=None):
+    """
+    Job als erledigt markieren oder für einen neuen Versuch einplanen.
+
+    Geschrieben wird nur, solange der Job noch von worker_id (und mit dem
+    Versuch `attempts`) reserviert ist. Wurde er inzwischen als hängend
+    freigegeben und neu vergeben, gewinnt der neue Lauf und es wird None
+    zurückgegeben.
+    """
+    Job = _job_model()
+    job = Job.objects.get(id=job_id)
+    worker_id = job.locked_by if worker_id is None else worker_id
+    attempts = job.attempts if attempts is None else attempts
+    if job.status != 'RUNNING' or job.locked_by != worker_id or job.attempts != attempts:
+        logger.warning("job %s is no longer held by %s (attempt %d), result dropped", job_id, worker_id, attempts)
+        return None
+    now = timezone.now()
+    if error is None:
+        job.status = 'DONE'
+        job.finished_at = now
+        job.active_key = None
+        job.last_error = ''
+    elif job.attempts < job.max_attempts:
+        job.status = 'PENDING'
+        job.run_after = now + timedelta(seconds=RETRY_BASE_DELAY * 2 ** (job.attempts - 1))
+        job.last_error = error
+    else:
+        job.status = 'FAILED'
+        job.finished_at = now
+        job.active_key = None
+        job.last_error = error
+    job.locked_by = ''
+    job.locked_at = None
+    fields = ['status', 'finished_at', 'active_key', 'last_error', 'run_after', 'locked_by', 'locked_at']
+    updated = Job.objects.filter(id=job_id, status='RUNNING', locked_by=worker_id, attempts=attempts).update(
+        **{field: getattr(job, field) for field in fields}
+    )
+    if not updated:
+        logger.warning("job %s was taken over while finishing, result dropped", job_id)
+        return None
+    return job
+
+
+def execute_job(job_id):
+    """Läuft im Worker-Prozess: Handler ausführen und Ergebnis festhalten."""
+    Job = _job_model()
+    job = Job.objects.select_related('project').get(id=job_id)
+    try:
+        handler = import_string(JOB_HANDLERS[job.kind])
+        handler(job)
+    except Exception:
+        logger.exception("job %s failed (attempt %d/%d)", job.id, job.attempts, job.max_attempts)
+        finished = _finish(job_id, traceback.format_exc(), job.locked_by, job.attempts)
+    else:
+        finished = _finish(job_id, None, job.locked_by, job.attempts)
+    return finished.status if finished is not None else None
+
+
+def requeue_stale_jobs(timeout=None):
+    """Jobs abgestürzter Worker wieder freigeben. Gibt die Anzahl zurück."""
+    Job = _job_model()
+    timeout = timeout if timeout is not None else getattr(settings, 'JOB_TIMEOUT', 600)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    stale = Job.objects.filter(status='RUNNING', locked_at__lt=cutoff).values_list('id', 'locked_by', 'attempts')
+    # Nur zählen, was nicht gerade doch noch fertig geworden ist
+    return sum(_finish(job_id, "worker timed out", locked_by, attempts) is not None for job_id, locked_by, attempts in stale)
+
+
+def run_pending(limit=None, worker_id='inline'):
+    """Fällige Jobs direkt im aktuellen Prozess abarbeiten (Tests, Debugging)."""
+    processed = 0
+    while limit is None or processed < limit:
+        ids = claim_jobs(worker_id, 1)
+        if not ids:
+            break
+        execute_job(ids[0])
+        processed += 1
+    return processed
+
+
+def _init_worker_process():
+    # Frisch gestarteter Prozess (spawn): Django laden
+    import django
+    django.setup()
+    # Strg+C beendet den Hauptprozess, der laufende Jobs noch fertig werden lässt
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class Worker:
+    """Hauptprozess: holt Jobs und verteilt sie auf den Prozess-Pool."""
+
+    def __init__(self, workers=None, poll_interval=None, burst=False):
+        self.workers = workers or getattr(settings, 'JOB_WORKERS', 2)
+        self.poll_interval = poll_interval if poll_interval is not None else getattr(settings, 'JOB_POLL_INTERVAL', 1.0)
+        self.burst = burst
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+
+    def stop(self, *args):
+        logger.info("worker %s stopping after running jobs finish", self.worker_id)
+        self.stopping = True
+
+    def _start_pool(self):
+        context = multiprocessing.get_context('spawn')
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_init_worker_process)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        requeue_stale_jobs()
+        last_stale_check = time.monotonic()
+        # Vor dem Start der Kindprozesse keine offenen Verbindungen vererben
+        connections.close_all()
+
+        processed = 0
+        in_flight = {}
+        pool = self._start_pool()
+        try:
+            while not self.stopping or in_flight:
+                if time.monotonic() - last_stale_check > STALE_CHECK_INTERVAL:
+                    requeue_stale_jobs()
+                    last_stale_check = time.monotonic()
+
+                broken = False
+                if not self.stopping:
+                    free = self.workers - len(in_flight)
+                    job_ids = claim_jobs(self.worker_id, free) if free else []
+                    for index, job_id in enumerate(job_ids):
+                        try:
+                            in_flight[pool.submit(execute_job, job_id)] = job_id
+                        except BrokenProcessPool:
+                            # Diese Jobs sind nie gelaufen: ohne Versuch zurück in die Queue
+                            release_jobs(self.worker_id, job_ids[index:])
+                            broken = True
+                            break
+                    if self.burst and not in_flight and not broken:
+                        break
+
+                if in_flight:
+                    done, _ = wait(in_flight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job_id = in_flight.pop(future)
+                        processed += 1
+                        error = future.exception()
+                        if error is not None:
+                            # Kindprozess abgestürzt o.ä., der Job selbst konnte nichts mehr schreiben
+                            logger.error("job %s crashed: %r", job_id, error)
+                            _finish(job_id, repr(error), self.worker_id)
+                            broken = broken or isinstance(error, BrokenProcessPool)
+                elif not broken:
+                    time.sleep(self.poll_interval)
+
+                if broken:
+                    # Ein toter Kindprozess reißt den ganzen Pool mit: welcher Job schuld war,
+                    # ist nicht bekannt, also zählt der Versuch für alle noch offenen Jobs
+                    for job_id in in_flight.values():
+                        processed += 1
+                        _finish(job_id, "worker pool broken", self.worker_id)
+                    in_flight.clear()
+                    logger.error("worker %s: process pool broken, starting a new one", self.worker_id)
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self._start_pool()
+        finally:
+            pool.shutdown(wait=True)
+        return processed
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Task
+
+
+def task_card_cache_key(task_id, version):
+    # version ändert sich bei jeder Task-Änderung, alte Einträge laufen einfach aus
+    return f'task_card:{task_id}:{version}'
+
+
+def render_kanban_columns(tasks):
+    """
+    Rendert das Board spaltenweise aus gecachten Task-Karten.
+
+    Liest zuerst nur (id, version, status) in der gewünschten Reihenfolge,
+    holt alle Karten mit einem get_many aus dem Cache und lädt/rendert nur
+    die fehlenden Tasks. Gruppiert wird in einem Durchlauf.
+    """
+    rows = list(tasks.values_list('id', 'version', 'status'))
+    keys = {task_id: task_card_cache_key(task_id, version) for task_id, version, _ in rows}
+    cards = cache.get_many(keys.values())
+
+    missing = [task_id for task_id, key in keys.items() if key not in cards]
+    if missing:
+        rendered = {}
+        for task in Task.objects.filter(id__in=missing).select_related('assigned_to'):
+            rendered[keys[task.id]] = render_to_string('projectmanager/task_card.html', {'task': task})
+        cache.set_many(rendered, getattr(settings, 'TASK_CARD_CACHE_TIMEOUT', 86400))
+        cards.update(rendered)
+
+    columns = {status: [] for status, _ in Task.STATUS_CHOICES}
+    for task_id, _, status in rows:
+        card = cards.get(keys[task_id])
+        # Zwischenzeitlich gelöschte Tasks fehlen einfach
+        if card is not None:
+            columns[status].append(card)
+
+    return [
+        {'status': status, 'label': label, 'cards': mark_safe(''.join(columns[status]))}
+        for status, label in Task.STATUS_CHOICES
+    ]
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from projectmanager.analytics import backfill_project
+from projectmanager.models import Project
+
+class Command(BaseCommand):
+    help = 'Baut die Tages-Snapshots (Burndown/Velocity) aus dem Activity-Log neu auf'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', dest='projects', help='Nur diese Projekt-IDs')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.order_by('id').values_list('id', flat=True)
+        if options['projects']:
+            projects = projects.filter(id__in=options['projects'])
+
+        days = 0
+        for project_id in projects:
+            days += backfill_project(project_id)
+        self.stdout.write(self.style.SUCCESS(f'{len(projects)} Projekte, {days} Tages-Snapshots geschrieben.'))
@@ -0,0 +1,91 @@
+import platform
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from projectmanager.benchmark import stats
+from projectmanager.benchmark.data import DEFAULT_PREFIX, benchmark_projects
+from projectmanager.benchmark.http_load import SCENARIOS, load_virtual_users, run_http
+from projectmanager.benchmark.ws_load import run_chat
+
+class Command(BaseCommand):
+    help = 'Lasttest der Views und des Chats mit den Daten aus bench_seed; gibt p50/p95/p99 und Durchsatz aus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Gegen einen laufenden Server testen, z.B. http://127.0.0.1:8000 (sonst im Prozess)')
+        parser.add_argument('--only', choices=['http', 'ws'], help='Nur HTTP oder nur WebSocket')
+        parser.add_argument('--prefix', default=DEFAULT_PREFIX)
+        parser.add_argument('--seed', type=int, default=0)
+        # HTTP
+        parser.add_argument('--concurrency', type=int, default=8, help='Gleichzeitige HTTP-Clients (Threads)')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--duration', type=float, help='Sekunden statt fester Anzahl Requests')
+        parser.add_argument('--users', type=int, default=20, help='Anzahl verschiedener Testuser')
+        parser.add_argument('--warmup', type=int, default=5, help='Nicht gemessene Requests je Client')
+        parser.add_argument('--scenarios', help=f"Komma-getrennt aus: {', '.join(SCENARIOS)}")
+        # WebSocket
+        parser.add_argument('--ws-clients', type=int, default=50)
+        parser.add_argument('--ws-rooms', type=int, default=5, help='Projekt-Chats, auf die die Clients verteilt werden')
+        parser.add_argument('--ws-messages', type=int, default=20, help='Nachrichten je Client')
+        parser.add_argument('--ws-interval', type=float, default=0.05, help='Sekunden zwischen zwei Nachrichten eines Clients')
+        # Ergebnisse
+        parser.add_argument('--json', help='Ergebnisse als JSON speichern (für --baseline)')
+        parser.add_argument('--baseline', help='JSON eines früheren Laufs zum Vergleich')
+
+    def handle(self, *args, **options):
+        scenarios = None
+        if options['scenarios']:
+            scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+            unknown = set(scenarios) - set(SCENARIOS)
+            if unknown:
+                raise CommandError(f"Unbekannte Szenarien: {', '.join(sorted(unknown))}")
+        if settings.DEBUG and not options['url']:
+            self.stdout.write(self.style.WARNING('DEBUG ist aktiv: SQL-Logging verfälscht die Messung im Prozess.'))
+
+        baseline = stats.load(options['baseline']) if options['baseline'] else {}
+        results = {
+            'meta': {
+                'target': options['url'] or 'in-process',
+                'python': platform.python_version(),
+                'database': settings.DATABASES['default']['ENGINE'],
+            },
+        }
+
+        if options['only'] != 'ws':
+            virtual_users = load_virtual_users(options['users'], options['prefix'])
+            if not virtual_users:
+                raise CommandError('Keine Testdaten gefunden, zuerst bench_seed ausführen.')
+            result = run_http(
+                virtual_users,
+                concurrency=options['concurrency'],
+                requests=None if options['duration'] else options['requests'],
+                duration=options['duration'],
+                scenarios=scenarios,
+                base_url=options['url'],
+                warmup=options['warmup'],
+                seed=options['seed'],
+            )
+            results['http'] = result.summary()
+            self.stdout.write(f"\nHTTP ({options['concurrency']} Clients, {result.elapsed:.1f}s)")
+            self.stdout.write(stats.format_table(results['http'], baseline.get('http')))
+
+        if options['only'] != 'http':
+            rooms = [
+                (project.id, list(project.members.all()))
+                for project in benchmark_projects(options['prefix']).order_by('id').prefetch_related('members')[:options['ws_rooms']]
+            ]
+            if not rooms:
+                raise CommandError('Keine Testdaten gefunden, zuerst bench_seed ausführen.')
+            result = run_chat(
+                rooms,
+                clients=options['ws_clients'],
+                messages=options['ws_messages'],
+                interval=options['ws_interval'],
+                base_url=options['url'],
+            )
+            results['ws'] = result.summary()
+            self.stdout.write(f"\nWebSocket ({options['ws_clients']} Clients in {len(rooms)} Räumen, {result.elapsed:.1f}s)")
+            self.stdout.write(stats.format_table(results['ws'], baseline.get('ws')))
+
+        if options['json']:
+            stats.save(options['json'], results)
+            self.stdout.write(self.style.SUCCESS(f"Ergebnisse in {options['json']} gespeichert."))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from projectmanager.benchmark.data import DEFAULT_PREFIX, Scale, benchmark_users, clear, generate
+
+class Command(BaseCommand):
+    help = 'Erzeugt synthetische Testdaten für Lasttests (bench_run), z.B. --projects 10000 --tasks 100 für 1M Tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=100)
+        parser.add_argument('--members', type=int, default=5, help='Mitglieder je Projekt')
+        parser.add_argument('--milestones', type=int, default=5, help='Milestones je Projekt')
+        parser.add_argument('--tasks', type=int, default=100, help='Tasks je Projekt')
+        parser.add_argument('--comments', type=float, default=1.0, help='Kommentare je Task (Durchschnitt)')
+        parser.add_argument('--messages', type=int, default=50, help='Chat-Nachrichten je Projekt')
+        parser.add_argument('--updates', type=int, default=20, help='Activity-Einträge je Projekt')
+        parser.add_argument('--users', type=int, default=0, help='Größe des User-Pools (Standard: Projekte * Mitglieder / 10)')
+        parser.add_argument('--batch-size', type=int, default=50000, help='Tasks pro Block/Transaktion')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default=DEFAULT_PREFIX)
+        parser.add_argument('--clear', action='store_true', help='Vorhandene Testdaten mit diesem Präfix vorher löschen')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if options['clear']:
+            self.stdout.write(f'{clear(prefix)} Objekte gelöscht.')
+        elif benchmark_users(prefix).exists():
+            raise CommandError(f'Es gibt schon Testdaten mit Präfix "{prefix}", --clear oder ein anderes --prefix verwenden.')
+
+        scale = Scale(**{name: options[name] for name in ['projects', 'members', 'milestones', 'tasks', 'comments', 'messages', 'updates', 'users']})
+        started = time.monotonic()
+
+        def progress(totals):
+            self.stdout.write(f"{totals['projects']}/{scale.projects} Projekte, {totals['tasks']} Tasks ({time.monotonic() - started:.0f}s)")
+
+        totals = generate(scale, prefix=prefix, seed=options['seed'], batch_size=options['batch_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['users']} User, {totals['projects']} Projekte, {totals['tasks']} Tasks, {totals['comments']} Kommentare "
+            f"in {time.monotonic() - started:.1f}s. Suche: rebuild_search_index, Analytics: backfill_snapshots."
+        ))
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from projectmanager.storage import collect_garbage, recount_references
+from projectmanager.uploads import purge_stale_uploads
+
+class Command(BaseCommand):
+    help = 'Löscht Datei-Blobs ohne Referenzen (Anhänge/Dokumente) und abgebrochene Uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=int, default=1)
+        parser.add_argument('--recount', action='store_true',
+                            help='Referenzzähler vorher aus den Tabellen neu berechnen')
+
+    def handle(self, *args, **options):
+        # Zuerst abgebrochene Chunk-Uploads, deren Dateien sonst liegen bleiben
+        stale = purge_stale_uploads()
+        self.stdout.write(f'{stale} abgebrochene Uploads entfernt.')
+        if options['recount']:
+            fixed = recount_references()
+            self.stdout.write(f'{fixed} Referenzzähler korrigiert.')
+        removed = collect_garbage(grace=timedelta(hours=options['grace_hours']))
+        self.stdout.write(self.style.SUCCESS(f'{removed} Dateien gelöscht.'))
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from projectmanager.activity import purge_expired_updates
+
+class Command(BaseCommand):
+    help = 'Löscht Activity-Log Einträge, die älter als die Aufbewahrungsfrist sind'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ACTIVITY_RETENTION_DAYS)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_updates(days=options['days'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'{deleted} Einträge gelöscht.'))
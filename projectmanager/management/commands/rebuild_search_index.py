@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from projectmanager.search import rebuild_index
+
+class Command(BaseCommand):
+    help = 'Baut den Suchindex komplett neu auf (danach wird er bei jeder Änderung fortgeschrieben)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        counts = rebuild_index(batch_size=options['batch_size'])
+        for kind, count in counts.items():
+            self.stdout.write(f'{kind}: {count}')
+        self.stdout.write(self.style.SUCCESS('Suchindex neu aufgebaut.'))
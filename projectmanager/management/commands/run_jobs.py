@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from projectmanager.jobs import Worker
+
+class Command(BaseCommand):
+    help = 'Arbeitet die Job-Queue in einem Prozess-Pool ab (läuft bis SIGTERM/Strg+C)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Anzahl Prozesse (Standard: JOB_WORKERS)')
+        parser.add_argument('--poll-interval', type=float, default=None, help='Sekunden zwischen Abfragen der Queue')
+        parser.add_argument('--burst', action='store_true', help='Beenden, sobald keine Jobs mehr fällig sind')
+
+    def handle(self, *args, **options):
+        worker = Worker(workers=options['workers'], poll_interval=options['poll_interval'], burst=options['burst'])
+        processed = worker.run()
+        self.stdout.write(self.style.SUCCESS(f'{processed} Jobs abgearbeitet.'))
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+from projectmanager.risk import update_deadline_risks
+
+class Command(BaseCommand):
+    help = 'Berechnet das Deadline-Risiko aller offenen Tasks neu (z.B. nächtlich per Cron) und schreibt Vorschläge bei deutlichen Änderungen'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', dest='projects', help='Nur diese Projekt-IDs')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        scored, changed, suggestions = update_deadline_risks(options['projects'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{scored} Tasks bewertet, {changed} deutlich geändert, {suggestions} Vorschläge '
+            f'({time.monotonic() - started:.1f}s).'
+        ))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projectmanager', '0013_task_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='update',
+            name='event_type',
+            field=models.CharField(choices=[('NOTE', 'Note'), ('TASK_CREATED', 'Task created'), ('TASK_STATUS', 'Task status changed'), ('TASK_PRIORITY', 'Task priority changed'), ('TASK_MILESTONE', 'Task added to milestone'), ('TASK_DELETED', 'Task deleted'), ('COMMENT_ADDED', 'Comment added'), ('ATTACHMENT_ADDED', 'Attachment added')], default='NOTE', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='update',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='update',
+            name='text',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projectmanager', '0015_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='update',
+            name='event_type',
+            field=models.CharField(choices=[('NOTE', 'Note'), ('TASK_CREATED', 'Task created'), ('TASK_STATUS', 'Task status changed'), ('TASK_PRIORITY', 'Task priority changed'), ('TASK_MILESTONE', 'Task added to milestone'), ('TASK_DELETED', 'Task deleted'), ('COMMENT_ADDED', 'Comment added'), ('ATTACHMENT_ADDED', 'Attachment added'), ('TASK_BULK', 'Tasks updated in bulk')], default='NOTE', max_length=20),
+        ),
+    ]
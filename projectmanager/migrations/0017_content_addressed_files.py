@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:58
+
+import projectmanager.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projectmanager', '0016_update_task_bulk_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='original_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='taskattachment',
+            name='original_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='file',
+            field=models.FileField(storage=projectmanager.storage.ContentAddressedStorage(), upload_to='documents/'),
+        ),
+        migrations.AlterField(
+            model_name='taskattachment',
+            name='file',
+            field=models.FileField(storage=projectmanager.storage.ContentAddressedStorage(), upload_to='task_attachments/'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+from django.db.models import Max
+
+
+def create_message_state(apps, schema_editor):
+    # Der Chat-Flush indexiert nur neue Nachrichten; alles bis hierhin
+    # übernimmt `manage.py rebuild_search_index`
+    Message = apps.get_model('projectmanager', 'Message')
+    SearchIndexState = apps.get_model('projectmanager', 'SearchIndexState')
+    last_id = Message.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    SearchIndexState.objects.get_or_create(kind='message', defaults={'last_id': last_id})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projectmanager', '0022_daily_snapshots'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_message_state, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,38 @@
+import os
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.utils import timezone
+
+from .storage import blob_storage
 
 # Create your models here.
+class ProjectQuerySet(models.QuerySet):
+    def with_list_stats(self, user):
+        # Rolle, Task-Zähler, Mitgliederzahl und nächste Deadline in einer Query
+        role = ProjectMembership.objects.filter(
+            project=models.OuterRef('pk'),
+            user=user
+        ).values('role')[:1]
+
+        member_count = ProjectMembership.objects.filter(
+            project=models.OuterRef('pk')
+        ).values('project').annotate(count=models.Count('id')).values('count')
+
+        return self.annotate(
+            user_role=models.Subquery(role),
+            member_count=models.Subquery(member_count),
+            todo_count=models.Count('tasks', filter=models.Q(tasks__status='TODO')),
+            in_progress_count=models.Count('tasks', filter=models.Q(tasks__status='IN_PROGRESS')),
+            done_count=models.Count('tasks', filter=models.Q(tasks__status='DONE')),
+            next_deadline=models.Min(
+                'tasks__deadline',
+                filter=~models.Q(tasks__status='DONE') & models.Q(tasks__deadline__gte=timezone.localdate())
+            ),
+        )
+
 class Project(models.Model):
     title = models.CharField(max_length=200)
     goal = models.TextField()
@@ -15,6 +45,8 @@ class Project(models.Model):
         related_name='projects'
     )
 
+    objects = ProjectQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
@@ -37,6 +69,12 @@ class ProjectInvitation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     accepted = models.BooleanField(null=True)  
 
+    class Meta:
+        indexes = [
+            # Offene Einladungen im invitations_processor
+            models.Index(fields=['email', 'accepted'], name='invitation_email_accepted_idx'),
+        ]
+
     def __str__(self):
         return f"{self.email} -> {self.project.title}"
 
@@ -64,26 +102,124 @@ class Task(models.Model):
     assigned_to = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True) 
     milestone = models.ForeignKey('Milestone', on_delete=models.SET_NULL, null=True, blank=True, related_name="tasks")
 
+    # Wird bei jeder Änderung hochgezählt (Live-Updates, Konflikterkennung)
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # Filter und Sortierung im Dashboard, available_tasks (milestone IS NULL)
+            models.Index(fields=['project', 'status'], name='task_project_status_idx'),
+            models.Index(fields=['project', 'priority'], name='task_project_priority_idx'),
+            models.Index(fields=['project', 'deadline'], name='task_project_deadline_idx'),
+            models.Index(fields=['project', 'milestone'], name='task_project_milestone_idx'),
+        ]
+
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            self.version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
     
 class Update(models.Model):
+    EVENT_CHOICES = [
+        ('NOTE', 'Note'),
+        ('TASK_CREATED', 'Task created'),
+        ('TASK_STATUS', 'Task status changed'),
+        ('TASK_PRIORITY', 'Task priority changed'),
+        ('TASK_MILESTONE', 'Task added to milestone'),
+        ('TASK_DELETED', 'Task deleted'),
+        ('COMMENT_ADDED', 'Comment added'),
+        ('ATTACHMENT_ADDED', 'Attachment added'),
+        ('TASK_BULK', 'Tasks updated in bulk'),
+    ]
+
+    # Einzel- und Sammeltext je Event-Typ, gefüllt aus dem Payload
+    EVENT_TEXTS = {
+        'TASK_CREATED': ("created task '{title}'", "created {count} tasks"),
+        'TASK_STATUS': ("changed status of '{title}' to {to}", "changed {count} task statuses"),
+        'TASK_PRIORITY': ("changed priority of '{title}' to {to}", "changed {count} task priorities"),
+        'TASK_MILESTONE': ("added '{title}' to milestone '{milestone}'", "added {count} tasks to milestones"),
+        'TASK_DELETED': ("deleted task '{title}'", "deleted {count} tasks"),
+        'COMMENT_ADDED': ("commented on '{title}'", "commented {count} times"),
+        'ATTACHMENT_ADDED': ("uploaded attachment to '{title}'", "uploaded {count} attachments"),
+        'TASK_BULK': ("updated {count} tasks", "ran {count} bulk updates"),
+    }
+
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="updates")
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
-    text = models.TextField()
+    event_type = models.CharField(max_length=20, choices=EVENT_CHOICES, default='NOTE')
+    payload = models.JSONField(default=dict, blank=True)
+    # Nur noch für freie Notizen und alte Einträge
+    text = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Activity-Feed (neueste zuerst) und Aufräumen nach Alter
+            models.Index(fields=['project', 'created_at'], name='update_project_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.project.title} - {self.created_at}"
-class Document(models.Model):
+
+    def describe(self, count=1):
+        return self.describe_event(self.event_type, self.payload, self.text, count)
+
+    @classmethod
+    def describe_event(cls, event_type, payload, text='', count=1):
+        # Auch für values()-Zeilen nutzbar, ohne Model-Instanz
+        texts = cls.EVENT_TEXTS.get(event_type)
+        if texts is None:
+            return text
+        single, collapsed = texts
+        if count > 1:
+            return collapsed.format(count=count)
+        try:
+            return single.format(**{'count': count, **payload})
+        except (KeyError, IndexError):
+            return dict(cls.EVENT_CHOICES).get(event_type, event_type)
+
+class Blob(models.Model):
+    # Inhaltsadressierte Datei unter blobs/ab/cd/<sha256>, siehe storage.py
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256} ({self.ref_count} refs)"
+
+
+class StoredFileMixin:
+    """Originalen Dateinamen merken, der Blob-Name ist nur der Hash."""
+
+    def remember_original_name(self):
+        if self.file and not self.file._committed and not self.original_name:
+            self.original_name = os.path.basename(self.file.name)[:255]
+
+    @property
+    def display_name(self):
+        return self.original_name or os.path.basename(self.file.name)
+
+
+class Document(StoredFileMixin, models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="documents")
     title = models.CharField(max_length=200)
-    file = models.FileField(upload_to='documents/')
+    file = models.FileField(upload_to='documents/', storage=blob_storage)
+    original_name = models.CharField(max_length=255, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.remember_original_name()
+        super().save(*args, **kwargs)
+
    
 class ProjectMembership(models.Model):
     ROLE_CHOICES = [
@@ -117,6 +253,50 @@ class AISuggestion(models.Model):
     def __str__(self):
         return f"{self.suggestion_type} suggestion"
 
+class TaskRiskScore(models.Model):
+    # Zuletzt gemeldetes Deadline-Risiko (risk.py), nur bei deutlicher Änderung neu geschrieben
+    task = models.OneToOneField('Task', on_delete=models.CASCADE, primary_key=True, related_name='risk_score')
+    score = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.task_id}: {self.score:.2f}"
+
+class Job(models.Model):
+    # Hintergrundjob in der DB-Queue, ausgeführt von `manage.py run_jobs` (jobs.py)
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    payload = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    # Nur gesetzt, solange der Job offen ist: unique verhindert doppelte offene Jobs
+    active_key = models.CharField(max_length=100, null=True, blank=True, unique=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Nächste Jobs holen: status = PENDING, nach Priorität
+            models.Index(fields=['status', 'priority', 'run_after'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+
 class TaskComment(models.Model):
     task=models.ForeignKey('Task', on_delete=models.CASCADE)
     user=models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -126,14 +306,41 @@ class TaskComment(models.Model):
     def __str__(self):
         return f"{self.user.username} on {self.task.title}"
     
-class TaskAttachment(models.Model):
+class TaskAttachment(StoredFileMixin, models.Model):
     task=models.ForeignKey('Task', on_delete=models.CASCADE, related_name="attachments")
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
-    file = models.FileField(upload_to='task_attachments/')
+    file = models.FileField(upload_to='task_attachments/', storage=blob_storage)
+    original_name = models.CharField(max_length=255, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.file.name}" ({self.uploaded_by.username if self.uploaded_by else 'Unknown'})
+        return f"{self.display_name} ({self.uploaded_by.username if self.uploaded_by else 'Unknown'})"
+
+    def save(self, *args, **kwargs):
+        self.remember_original_name()
+        super().save(*args, **kwargs)
+
+class UploadSession(models.Model):
+    # Laufender Chunk-Upload eines Anhangs, Daten liegen in einer .part-Datei (uploads.py)
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    task = models.ForeignKey('Task', on_delete=models.CASCADE, related_name="upload_sessions")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+class MilestoneQuerySet(models.QuerySet):
+    def with_progress(self):
+        # Fortschritt aller Milestones in einer gruppierten Query
+        return self.annotate(
+            task_total=models.Count('tasks'),
+            task_done=models.Count('tasks', filter=models.Q(tasks__status='DONE')),
+        )
 
 class Milestone(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="milestones")
@@ -142,22 +349,108 @@ class Milestone(models.Model):
     deadline = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = MilestoneQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
     @property
     def progress(self):
-        tasks = self.tasks.all()
-        if not tasks:
+        # Ohne with_progress() Annotation: eine Aggregat-Query statt drei
+        if not hasattr(self, 'task_total'):
+            counts = self.tasks.aggregate(
+                total=models.Count('id'),
+                done=models.Count('id', filter=models.Q(status='DONE')),
+            )
+            self.task_total = counts['total']
+            self.task_done = counts['done']
+
+        if not self.task_total:
             return 0
-        done = tasks.filter(status="DONE").count()
-        return int((done / tasks.count()) * 100)
+        return int((self.task_done / self.task_total) * 100)
     
+class ProjectSnapshot(models.Model):
+    # Stand am Ende eines Tages (analytics.py); Tage ohne Änderung haben keine Zeile
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='snapshots')
+    date = models.DateField()
+    todo = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    done = models.IntegerField(default=0)
+    # Übergänge nach DONE an diesem Tag (Velocity)
+    completed = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('project', 'date')
+
+    def __str__(self):
+        return f"{self.project_id} {self.date}"
+
+class MilestoneSnapshot(models.Model):
+    milestone = models.ForeignKey('Milestone', on_delete=models.CASCADE, related_name='snapshots')
+    date = models.DateField()
+    done = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('milestone', 'date')
+
+    def __str__(self):
+        return f"{self.milestone_id} {self.date}"
+
 class Message(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="messages")
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset-Pagination der Chat-Historie: (project, created_at, id)
+            models.Index(fields=['project', 'created_at', 'id'], name='message_project_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sender.username}: {self.content[:20]}"
+
+class SearchDocument(models.Model):
+    # Ein indexiertes Objekt (Task, Kommentar, Nachricht, ...), siehe search.py
+    kind = models.CharField(max_length=20)
+    object_id = models.PositiveBigIntegerField()
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    # z.B. die Task eines Kommentars, für den Link im Suchergebnis
+    parent_id = models.PositiveBigIntegerField(null=True, blank=True)
+    title = models.CharField(max_length=255)
+    length = models.PositiveIntegerField(default=0)
+    checksum = models.CharField(max_length=40)
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.title}"
+
+
+class SearchPosting(models.Model):
+    # Invertierter Index: Term -> Dokument, project redundant für den Mitgliedschaftsfilter
+    term = models.CharField(max_length=64)
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='postings')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    weight = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            # Exakte Terme und Präfixe (term >= 'abc' AND term < 'abc' + PREFIX_END) als Range-Scan
+            models.Index(fields=['term', 'project'], name='search_term_project_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.document_id}"
+
+
+class SearchIndexState(models.Model):
+    # Fortschritt der nur angehängten Quellen (Nachrichten, Activity-Log)
+    kind = models.CharField(max_length=20, unique=True)
+    last_id = models.PositiveBigIntegerField(default=0)
+
     def __str__(self):
-        return f"{self.sender.username}: {self.content[:20]}"
\ No newline at end of file
+        return f"{self.kind}: {self.last_id}"
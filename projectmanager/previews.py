@@ -0,0 +1,178 @@
+"""
+Vorschaubilder und Textvorschauen für Anhänge.
+
+Nach dem Upload (on_commit) in einem lokalen Thread-Pool erzeugt, der Request
+wartet nicht darauf. Die Ergebnisse liegen neben dem Blob
+(blobs/ab/cd/<sha256>.thumb.png / .preview.txt) und werden nur einmal pro
+Inhalt erzeugt.
+
+- Bilder: Pillow (optional)
+- PDFs: pdftoppm / pdftotext aus poppler-utils (optional)
+- Textdateien: die ersten Zeichen
+"""
+import logging
+import mimetypes
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from django.conf import settings
+from django.db import transaction
+
+from .storage import TEXT_PREVIEW_SUFFIX, THUMBNAIL_SUFFIX, blob_digest
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow ist optional, dann gibt es nur Textvorschauen
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (320, 320)
+TEXT_PREVIEW_CHARS = 600
+# Zeitlimit für externe Tools (pdftoppm, pdftotext)
+TOOL_TIMEOUT = 30
+
+TEXT_EXTENSIONS = {'.txt', '.md', '.csv', '.log', '.json', '.xml', '.yml', '.yaml', '.py', '.js', '.html', '.css'}
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PREVIEW_WORKERS', 2),
+                thread_name_prefix='preview',
+            )
+        return _executor
+
+
+def preview_kind(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    mime_type = mimetypes.guess_type(filename)[0] or ''
+    if mime_type.startswith('image/'):
+        return 'image'
+    if extension == '.pdf':
+        return 'pdf'
+    if extension in TEXT_EXTENSIONS or mime_type.startswith('text/'):
+        return 'text'
+    return None
+
+
+def _write_atomic(target, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+    with os.fdopen(fd, 'wb') as out:
+        out.write(data)
+    os.replace(tmp_path, target)
+
+
+def _save_thumbnail(image, target):
+    image.thumbnail(THUMBNAIL_SIZE)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+    with os.fdopen(fd, 'wb') as out:
+        image.save(out, format='PNG', optimize=True)
+    os.replace(tmp_path, target)
+
+
+def _image_thumbnail(source, target):
+    if Image is None:
+        return
+    with Image.open(source) as image:
+        # Nur so viel dekodieren wie für die Zielgröße nötig (JPEG)
+        image.draft('RGB', THUMBNAIL_SIZE)
+        _save_thumbnail(image, target)
+
+
+def _pdf_previews(source, thumbnail_target, text_target):
+    if Image is not None and shutil.which('pdftoppm'):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prefix = os.path.join(tmp_dir, 'page')
+            subprocess.run(
+                ['pdftoppm', '-png', '-r', '50', '-f', '1', '-l', '1', '-singlefile', source, prefix],
+                check=True, timeout=TOOL_TIMEOUT, capture_output=True,
+            )
+            with Image.open(prefix + '.png') as image:
+                _save_thumbnail(image, thumbnail_target)
+
+    if shutil.which('pdftotext'):
+        result = subprocess.run(
+            ['pdftotext', '-f', '1', '-l', '2', '-enc', 'UTF-8', source, '-'],
+            check=True, timeout=TOOL_TIMEOUT, capture_output=True,
+        )
+        _write_text_preview(result.stdout, text_target)
+
+
+def _write_text_preview(raw, target):
+    text = raw.decode('utf-8', errors='replace')
+    text = ' '.join(text.split())[:TEXT_PREVIEW_CHARS]
+    if text:
+        _write_atomic(target, text.encode('utf-8'))
+
+
+def _text_preview(source, target):
+    with open(source, 'rb') as fh:
+        # Etwas mehr lesen, da Leerraum zusammengefasst wird
+        _write_text_preview(fh.read(TEXT_PREVIEW_CHARS * 4), target)
+
+
+def generate_previews(storage, name, filename):
+    """Erzeugt die Vorschauen für einen Blob, sofern noch nicht vorhanden."""
+    if blob_digest(name) is None:
+        return
+    kind = preview_kind(filename)
+    if kind is None:
+        return
+
+    source = storage.path(name)
+    thumbnail_target = source + THUMBNAIL_SUFFIX
+    text_target = source + TEXT_PREVIEW_SUFFIX
+    if os.path.exists(thumbnail_target) or os.path.exists(text_target):
+        return
+
+    if kind == 'image':
+        _image_thumbnail(source, thumbnail_target)
+    elif kind == 'pdf':
+        _pdf_previews(source, thumbnail_target, text_target)
+    else:
+        _text_preview(source, text_target)
+
+
+def _run(storage, name, filename):
+    try:
+        generate_previews(storage, name, filename)
+    except Exception:
+        # Eine kaputte Datei darf den Worker nicht stören
+        logger.exception("Preview generation failed for %s", name)
+
+
+def schedule_previews(field_file, filename):
+    """Nach dem Commit im Hintergrund erzeugen."""
+    storage, name = field_file.storage, field_file.name
+    transaction.on_commit(lambda: get_executor().submit(_run, storage, name, filename))
+
+
+def preview_path(field_file, kind):
+    suffix = THUMBNAIL_SUFFIX if kind == 'thumbnail' else TEXT_PREVIEW_SUFFIX
+    path = field_file.storage.path(field_file.name) + suffix
+    return path if blob_digest(field_file.name) and os.path.exists(path) else None
+
+
+def attachment_preview(attachment):
+    """Für das Template: vorhandenes Vorschaubild und/oder Textauszug."""
+    text_path = preview_path(attachment.file, 'text')
+    text = ''
+    if text_path:
+        with open(text_path, encoding='utf-8', errors='replace') as fh:
+            text = fh.read()
+    return {
+        'thumbnail': preview_path(attachment.file, 'thumbnail') is not None,
+        'text': text,
+    }
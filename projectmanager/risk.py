@@ -0,0 +1,251 @@
+"""
+Deadline-Risiko aller offenen Tasks, in einem NumPy-Durchlauf berechnet.
+
+Grundlage sind Status, Priorität, Deadline und Bearbeiter der Tasks sowie die
+Zeiten aus dem Activity-Log (TASK_CREATED -> TASK_STATUS 'DONE'):
+
+- erwartete Bearbeitungszeit je Projekt: geometrisches Mittel der bisherigen
+  Durchlaufzeiten, bei wenig Historie zum globalen Wert hin gezogen
+- Restaufwand nach Status, verlängert durch die Auslastung des Bearbeiters,
+  fehlende Zuweisung und fehlende Aktivität
+- Risiko = Sigmoid(Restaufwand - verbleibende Tage), überfällig = 1.0
+
+update_deadline_risks() (nachts per `manage.py score_deadline_risk`) schreibt
+AISuggestion(DEADLINE) nur für Tasks, deren Score sich deutlich geändert hat.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AISuggestion, Task, TaskRiskScore, Update
+
+# Durchlaufzeit ohne jede Historie (Tage)
+DEFAULT_DURATION_DAYS = 7.0
+# So viele "virtuelle" Tasks mit globaler Durchlaufzeit fließen in jedes Projekt ein
+DURATION_PRIOR_WEIGHT = 5
+# Nur so weit zurück im Activity-Log suchen
+HISTORY_DAYS = 365
+
+# Anteil der Arbeit, der je Status schon erledigt ist
+STATUS_PROGRESS = {'TODO': 0.0, 'IN_PROGRESS': 0.5}
+# Knappe Deadlines wiegen bei wichtigen Tasks schwerer
+PRIORITY_BIAS = {'LOW': -0.5, 'MEDIUM': 0.0, 'HIGH': 0.25, 'URGENT': 0.5}
+# Jeder weitere offene Task des Bearbeiters verlängert den Restaufwand um diesen Anteil
+LOAD_WEIGHT = 0.25
+UNASSIGNED_DELAY_DAYS = 2.0
+# In Arbeit, aber seit so vielen Tagen keine Aktivität: Restaufwand * STALE_FACTOR
+STALE_DAYS = 7
+STALE_FACTOR = 1.5
+# Tage Differenz zwischen Restaufwand und Deadline, die den Score um eine "Stufe" verschieben
+RISK_SCALE_DAYS = 3.0
+
+# Ab diesem Score gilt ein Task als gefährdet
+RISK_THRESHOLD = 0.5
+# Neue Vorschläge nur bei so großer Änderung gegenüber dem zuletzt gemeldeten Score
+CHANGE_THRESHOLD = 0.2
+MIN_CROSSING_CHANGE = 0.05
+MAX_SUGGESTION_LINES = 20
+WRITE_BATCH_SIZE = 1000
+
+
+@dataclass
+class RiskScores:
+    """Spaltenweise Ergebnisse, gleiche Reihenfolge in allen Arrays."""
+    task_ids: np.ndarray
+    project_ids: np.ndarray
+    scores: np.ndarray
+    days_left: np.ndarray
+    expected_days: np.ndarray
+
+    def __len__(self):
+        return len(self.task_ids)
+
+
+def _days(dt):
+    return dt.timestamp() / 86400.0
+
+
+def _task_history(since):
+    """
+    Zeitpunkte aus dem Activity-Log je Task-ID: erstellt, erledigt, letzte Aktivität
+    und das Projekt. Gibt (task_ids, project_ids, created, done, last) zurück, sortiert nach ID.
+    """
+    rows = list(
+        Update.objects
+        .filter(created_at__gte=since, payload__task__isnull=False)
+        .exclude(event_type__in=['NOTE', 'TASK_BULK', 'TASK_DELETED'])
+        .values_list('payload__task', 'project_id', 'event_type', 'payload__to', 'created_at')
+    )
+    if not rows:
+        empty = np.empty(0)
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), empty, empty, empty
+
+    task_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    project_ids = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+    times = np.fromiter((_days(row[4]) for row in rows), dtype=np.float64, count=len(rows))
+    is_created = np.fromiter((row[2] == 'TASK_CREATED' for row in rows), dtype=bool, count=len(rows))
+    is_done = np.fromiter((row[2] == 'TASK_STATUS' and row[3] == 'DONE' for row in rows), dtype=bool, count=len(rows))
+
+    unique_ids, inverse = np.unique(task_ids, return_inverse=True)
+    created = np.full(len(unique_ids), np.inf)
+    np.minimum.at(created, inverse[is_created], times[is_created])
+    done = np.full(len(unique_ids), -np.inf)
+    np.maximum.at(done, inverse[is_done], times[is_done])
+    last = np.full(len(unique_ids), -np.inf)
+    np.maximum.at(last, inverse, times)
+    projects = np.zeros(len(unique_ids), dtype=np.int64)
+    projects[inverse] = project_ids
+    return unique_ids, projects, created, done, last
+
+
+def _expected_durations(project_index, history_projects, durations, n_projects):
+    """Geometrisches Mittel der Durchlaufzeit je Projekt, mit globalem Wert als Prior."""
+    log_durations = np.log(np.maximum(durations, 1.0 / 24))
+    global_log = log_durations.mean() if len(log_durations) else np.log(DEFAULT_DURATION_DAYS)
+
+    sums = np.bincount(history_projects, weights=log_durations, minlength=n_projects)
+    counts = np.bincount(history_projects, minlength=n_projects)
+    per_project = (sums + DURATION_PRIOR_WEIGHT * global_log) / (counts + DURATION_PRIOR_WEIGHT)
+    return np.exp(per_project)[project_index]
+
+
+def score_open_tasks(project_ids=None, now=None):
+    """Risiko-Scores aller offenen Tasks (optional nur für bestimmte Projekte)."""
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+
+    tasks = Task.objects.exclude(status='DONE')
+    if project_ids is not None:
+        tasks = tasks.filter(project_id__in=project_ids)
+    rows = list(tasks.values_list('id', 'project_id', 'status', 'priority', 'deadline', 'assigned_to_id'))
+    if not rows:
+        empty = np.empty(0)
+        return RiskScores(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), empty, empty, empty)
+
+    n = len(rows)
+    task_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=n)
+    task_projects = np.fromiter((row[1] for row in rows), dtype=np.int64, count=n)
+    progress = np.fromiter((STATUS_PROGRESS.get(row[2], 0.0) for row in rows), dtype=np.float64, count=n)
+    priority_bias = np.fromiter((PRIORITY_BIAS.get(row[3], 0.0) for row in rows), dtype=np.float64, count=n)
+    days_left = np.fromiter((row[4].toordinal() for row in rows), dtype=np.float64, count=n) - today.toordinal()
+    assignees = np.fromiter((row[5] or 0 for row in rows), dtype=np.int64, count=n)
+
+    # Historie: Durchlaufzeiten erledigter Tasks und letzte Aktivität offener Tasks
+    history_ids, history_projects, created, done, last = _task_history(now - timedelta(days=HISTORY_DAYS))
+    finished = np.isfinite(created) & np.isfinite(done) & (done >= created)
+
+    all_projects, project_index = np.unique(
+        np.concatenate([task_projects, history_projects[finished]]), return_inverse=True
+    )
+    expected = _expected_durations(
+        project_index[:n], project_index[n:], (done - created)[finished], len(all_projects)
+    )
+
+    # Auslastung: offene Tasks je Bearbeiter über alle Projekte
+    assigned = assignees != 0
+    _, assignee_index, assignee_load = np.unique(assignees, return_inverse=True, return_counts=True)
+    load = np.where(assigned, assignee_load[assignee_index], 1)
+
+    remaining = expected * (1.0 - progress) * (1.0 + LOAD_WEIGHT * (load - 1))
+    remaining += np.where(assigned, 0.0, UNASSIGNED_DELAY_DAYS)
+
+    # Tasks ohne Einträge im Log (ältere Daten) gelten nicht als liegengeblieben
+    idle_days = np.zeros(n)
+    if len(history_ids):
+        position = np.minimum(np.searchsorted(history_ids, task_ids), len(history_ids) - 1)
+        known = history_ids[position] == task_ids
+        idle_days = np.where(known, _days(now) - last[position], 0.0)
+    stale = (progress > 0) & (idle_days > STALE_DAYS)
+    remaining = np.where(stale, remaining * STALE_FACTOR, remaining)
+
+    # Begrenzen, damit exp() bei weit entfernten Deadlines nicht überläuft
+    z = np.clip((remaining - days_left) / RISK_SCALE_DAYS + priority_bias, -50, 50)
+    scores = np.where(days_left < 0, 1.0, 1.0 / (1.0 + np.exp(-z)))
+    return RiskScores(task_ids, task_projects, scores, days_left, remaining)
+
+
+def _changed(scores, previous):
+    """Deutliche Änderung oder Überschreiten der Risikoschwelle in eine Richtung."""
+    difference = np.abs(scores - previous)
+    crossed = (scores >= RISK_THRESHOLD) != (previous >= RISK_THRESHOLD)
+    # Kleine Schwankungen direkt an der Schwelle sollen nicht jede Nacht melden
+    return (difference >= CHANGE_THRESHOLD) | (crossed & (difference >= MIN_CROSSING_CHANGE))
+
+
+def describe_risks(task_ids, scores, previous=None):
+    """Textzeilen für AISuggestion, höchstes Risiko zuerst."""
+    order = np.argsort(-scores, kind='stable')
+    shown = order[:MAX_SUGGESTION_LINES]
+    tasks = Task.objects.select_related('assigned_to').in_bulk([int(task_ids[i]) for i in shown])
+
+    lines = []
+    for i in shown:
+        task = tasks.get(int(task_ids[i]))
+        if task is None:
+            continue
+        who = task.assigned_to.username if task.assigned_to else 'nobody'
+        line = (
+            f"'{task.title}' ({task.get_status_display()}, assigned to {who}, due {task.deadline:%Y-%m-%d}): "
+            f"deadline risk {scores[i]:.0%}"
+        )
+        if previous is not None and previous[i] >= 0:
+            line += f" (was {previous[i]:.0%})"
+        lines.append(line + '.')
+    if len(order) > len(shown):
+        lines.append(f"... and {len(order) - len(shown)} more tasks.")
+    return '\n'.join(lines)
+
+
+def update_deadline_risks(project_ids=None, now=None):
+    """
+    Scores neu berechnen und nur deutliche Änderungen festhalten: TaskRiskScore
+    speichert den zuletzt gemeldeten Wert, je Projekt entsteht höchstens ein
+    AISuggestion(DEADLINE). Gibt (bewertete Tasks, geänderte Tasks, Vorschläge) zurück.
+    """
+    result = score_open_tasks(project_ids, now)
+
+    stored = TaskRiskScore.objects.all()
+    if project_ids is not None:
+        stored = stored.filter(task__project_id__in=project_ids)
+    stored = dict(stored.values_list('task_id', 'score'))
+    # -1: noch nie gemeldet, zählt wie Score 0
+    previous = np.fromiter((stored.get(int(task_id), -1.0) for task_id in result.task_ids), dtype=np.float64, count=len(result))
+    changed = _changed(result.scores, np.maximum(previous, 0.0))
+
+    changed_ids = result.task_ids[changed]
+    changed_scores = result.scores[changed]
+    # Gemeldet wird, was gefährdet ist oder war
+    reported = changed & ((result.scores >= RISK_THRESHOLD) | (previous >= RISK_THRESHOLD))
+
+    suggestions = []
+    for project_id in np.unique(result.project_ids[reported]):
+        in_project = reported & (result.project_ids == project_id)
+        suggestions.append(AISuggestion(
+            project_id=int(project_id),
+            suggestion_type='DEADLINE',
+            content=describe_risks(result.task_ids[in_project], result.scores[in_project], previous[in_project]),
+        ))
+
+    with transaction.atomic():
+        # Erledigte oder gelöschte Tasks brauchen keinen Score mehr
+        done = TaskRiskScore.objects.filter(task__status='DONE')
+        if project_ids is not None:
+            done = done.filter(task__project_id__in=project_ids)
+        done.delete()
+        for start in range(0, len(changed_ids), WRITE_BATCH_SIZE):
+            TaskRiskScore.objects.filter(task_id__in=changed_ids[start:start + WRITE_BATCH_SIZE].tolist()).delete()
+        if len(changed_ids):
+            TaskRiskScore.objects.bulk_create([
+                TaskRiskScore(task_id=int(task_id), score=float(score))
+                for task_id, score in zip(changed_ids, changed_scores)
+            ], batch_size=WRITE_BATCH_SIZE)
+        AISuggestion.objects.bulk_create(suggestions)
+    return len(result), len(changed_ids), len(suggestions)
+
+
+def run_deadline_risk_job(job):
+    """Job-Handler: optional payload {'project_ids': [...]}."""
+    return update_deadline_risks(job.payload.get('project_ids'))
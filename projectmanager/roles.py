@@ -0,0 +1,45 @@
+from .models import ProjectMembership
+
+# Attribut am User-Objekt; request.user lebt genau einen Request lang
+_CACHE_ATTR = '_project_roles_cache'
+
+
+def get_project_roles(user):
+    """
+    Gibt die Rollen des Users als {project_id: role} zurück.
+    Wird beim ersten Aufruf mit einer Query geladen und danach am User gemerkt.
+    """
+    if not user.is_authenticated:
+        return {}
+
+    roles = getattr(user, _CACHE_ATTR, None)
+    if roles is None:
+        roles = dict(
+            ProjectMembership.objects.filter(user=user).values_list('project_id', 'role')
+        )
+        setattr(user, _CACHE_ATTR, roles)
+    return roles
+
+
+def invalidate_project_roles(user):
+    """
+    Verwirft die gemerkten Rollen dieses User-Objekts, z.B. nach Änderungen an
+    seinen eigenen Mitgliedschaften. Der Cache lebt nur im aktuellen Request:
+    Änderungen an anderen Usern brauchen keine Invalidierung.
+    """
+    if hasattr(user, _CACHE_ATTR):
+        delattr(user, _CACHE_ATTR)
+
+
+def get_project_role(user, project):
+    """Rolle des Users im Projekt (Project-Objekt oder ID) oder None."""
+    project_id = getattr(project, 'pk', project)
+    return get_project_roles(user).get(project_id)
+
+
+def is_project_member(user, project):
+    return get_project_role(user, project) is not None
+
+
+def is_project_admin(user, project):
+    return get_project_role(user, project) == 'ADMIN'
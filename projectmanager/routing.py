@@ -3,4 +3,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/chat/(?P<project_id>\d+)/$', consumers.ChatConsumer.as_asgi()),
+    re_path(r'ws/projects/(?P<project_id>\d+)/events/$', consumers.ProjectEventConsumer.as_asgi()),
 ]
\ No newline at end of file
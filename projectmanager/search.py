@@ -0,0 +1,361 @@
+"""
+Volltextsuche über Tasks, Kommentare, Chat-Nachrichten, Activity-Notizen und Dokumente.
+
+- Invertierter Index in der DB (SearchDocument / SearchPosting), kein externer Dienst
+- Wird beim Schreiben aktualisiert: Signale für bearbeitbare Objekte,
+  Nachrichten werden nach jedem Chat-Flush per catch_up() nachindexiert
+  (höchstens ein Batch pro Flush, der Startpunkt kommt aus Migration 0023)
+- Gefiltert über die Projekt-Mitgliedschaften des Users, Ranking mit BM25,
+  der letzte Suchbegriff wird als Präfix gesucht ("desi" findet "design")
+- `manage.py rebuild_search_index` baut den Index einmalig komplett auf
+"""
+import hashlib
+import heapq
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.db import transaction
+from django.db.models import Avg, Count
+from django.db.models.signals import post_delete, post_save
+from django.urls import reverse
+
+from .models import Document, Message, SearchDocument, SearchIndexState, SearchPosting, Task, TaskComment, Update
+from .roles import get_project_roles
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+MAX_TERM_LENGTH = 64
+STOPWORDS = {
+    'the', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'is', 'it', 'an', 'at', 'be', 'this', 'that', 'with',
+    'der', 'die', 'das', 'und', 'oder', 'ist', 'ein', 'eine', 'zu', 'im', 'mit', 'von', 'den', 'auf', 'für',
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Obergrenze pro Suchbegriff, damit sehr häufige Präfixe die Suche nicht ausbremsen
+MAX_POSTINGS_PER_TERM = 5000
+# Obere Grenze für Präfixe als Range (term >= 'abc' AND term < 'abc' + PREFIX_END).
+# startswith wird auf MySQL zu LIKE BINARY und nutzt den Index auf term nicht;
+# Terme sind schon kleingeschrieben, ein einfacher Vergleich reicht.
+PREFIX_END = '\U0010ffff'
+# Höchstens so viele Treffer werden genau bewertet
+MAX_CANDIDATES = 1000
+INDEX_BATCH_SIZE = 500
+TITLE_LENGTH = 255
+
+
+def tokenize(text):
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall((text or '').lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+@dataclass
+class SearchSource:
+    kind: str
+    model: type
+    # Feld -> Gewicht
+    fields: dict
+    project_id: Callable
+    title: Callable
+    parent_id: Callable = lambda obj: None
+    queryset: Optional[Callable] = None
+
+    def get_queryset(self):
+        return self.queryset() if self.queryset else self.model.objects.all()
+
+
+SOURCES = {
+    source.kind: source for source in [
+        SearchSource(
+            kind='task', model=Task, fields={'title': 3, 'description': 1},
+            project_id=lambda task: task.project_id,
+            title=lambda task: task.title,
+        ),
+        SearchSource(
+            kind='comment', model=TaskComment, fields={'text': 1},
+            project_id=lambda comment: comment.task.project_id,
+            title=lambda comment: comment.text,
+            parent_id=lambda comment: comment.task_id,
+            queryset=lambda: TaskComment.objects.select_related('task'),
+        ),
+        SearchSource(
+            kind='message', model=Message, fields={'content': 1},
+            project_id=lambda message: message.project_id,
+            title=lambda message: message.content,
+        ),
+        SearchSource(
+            kind='update', model=Update, fields={'text': 1},
+            project_id=lambda update: update.project_id,
+            title=lambda update: update.text,
+            queryset=lambda: Update.objects.exclude(text=''),
+        ),
+        SearchSource(
+            kind='document', model=Document, fields={'title': 2, 'display_name': 2},
+            project_id=lambda document: document.project_id,
+            title=lambda document: document.title,
+        ),
+    ]
+}
+SOURCE_BY_MODEL = {source.model: source for source in SOURCES.values()}
+
+
+def _analyze(source, obj):
+    """Gewichtete Terme, Tokenanzahl und Prüfsumme eines Objekts."""
+    weights = Counter()
+    length = 0
+    values = []
+    for field, boost in source.fields.items():
+        value = getattr(obj, field) or ''
+        values.append(value)
+        tokens = tokenize(value)
+        length += len(tokens)
+        for token in tokens:
+            weights[token] += boost
+
+    project_id = source.project_id(obj)
+    checksum = hashlib.sha1('\x00'.join([str(project_id), *values]).encode('utf-8')).hexdigest()
+    return weights, length, checksum
+
+
+def _bulk_index(source, objs):
+    """Schreibt Dokumente und Postings; erwartet, dass noch keine Einträge existieren."""
+    documents = []
+    analyzed = {}
+    for obj in objs:
+        weights, length, checksum = _analyze(source, obj)
+        if not weights:
+            continue
+        analyzed[obj.pk] = weights
+        documents.append(SearchDocument(
+            kind=source.kind,
+            object_id=obj.pk,
+            project_id=source.project_id(obj),
+            parent_id=source.parent_id(obj),
+            title=(source.title(obj) or '')[:TITLE_LENGTH],
+            length=length,
+            checksum=checksum,
+        ))
+    if not documents:
+        return 0
+
+    SearchDocument.objects.bulk_create(documents)
+    # bulk_create liefert nicht auf jeder DB die IDs zurück
+    ids = dict(
+        SearchDocument.objects
+        .filter(kind=source.kind, object_id__in=analyzed)
+        .values_list('object_id', 'id')
+    )
+    postings = [
+        SearchPosting(term=term, document_id=ids[document.object_id], project_id=document.project_id, weight=weight)
+        for document in documents
+        for term, weight in analyzed[document.object_id].items()
+    ]
+    SearchPosting.objects.bulk_create(postings, batch_size=1000)
+    return len(documents)
+
+
+def remove_objects(kind, object_ids):
+    SearchDocument.objects.filter(kind=kind, object_id__in=list(object_ids)).delete()
+
+
+def index_objects(kind, objs):
+    """Indexiert Objekte neu (ersetzt vorhandene Einträge)."""
+    source = SOURCES[kind]
+    objs = list(objs)
+    with transaction.atomic():
+        remove_objects(kind, [obj.pk for obj in objs])
+        return _bulk_index(source, objs)
+
+
+def index_object(obj, created=False):
+    """Ein einzelnes Objekt nach dem Speichern; unveränderte Inhalte kosten nur eine Query."""
+    source = SOURCE_BY_MODEL[type(obj)]
+    if created:
+        with transaction.atomic():
+            _bulk_index(source, [obj])
+        return
+
+    weights, _, checksum = _analyze(source, obj)
+    existing = SearchDocument.objects.filter(kind=source.kind, object_id=obj.pk).values_list('checksum', flat=True).first()
+    if existing == checksum:
+        return
+    if not weights and existing is None:
+        return
+    index_objects(source.kind, [obj])
+
+
+def catch_up(kind, batch_size=INDEX_BATCH_SIZE, max_batches=None):
+    """
+    Indexiert neue Zeilen von Quellen, die nur per bulk_create angehängt werden
+    (Chat-Nachrichten). Merkt sich die zuletzt indexierte ID in SearchIndexState.
+    Mit max_batches bleibt der Aufwand pro Aufruf begrenzt, der Rest folgt beim nächsten.
+    """
+    source = SOURCES[kind]
+    indexed = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        batches += 1
+        with transaction.atomic():
+            state, _ = SearchIndexState.objects.select_for_update().get_or_create(kind=kind)
+            objs = list(source.get_queryset().filter(pk__gt=state.last_id).order_by('pk')[:batch_size])
+            if not objs:
+                return indexed
+            _bulk_index(source, objs)
+            state.last_id = objs[-1].pk
+            state.save(update_fields=['last_id'])
+        indexed += len(objs)
+        if len(objs) < batch_size:
+            return indexed
+    return indexed
+
+
+def rebuild_index(batch_size=INDEX_BATCH_SIZE):
+    """Kompletter Neuaufbau, z.B. nach dem ersten Deployment. Gibt {kind: Anzahl} zurück."""
+    counts = {}
+    for kind, source in SOURCES.items():
+        SearchDocument.objects.filter(kind=kind).delete()
+        counts[kind] = 0
+        last_id = 0
+        while True:
+            objs = list(source.get_queryset().filter(pk__gt=last_id).order_by('pk')[:batch_size])
+            if not objs:
+                break
+            with transaction.atomic():
+                counts[kind] += _bulk_index(source, objs)
+            last_id = objs[-1].pk
+        SearchIndexState.objects.update_or_create(kind=kind, defaults={'last_id': last_id})
+    return counts
+
+
+# -------------------------
+# Signale
+# -------------------------
+
+def _index_on_save(sender, instance, created=False, update_fields=None, **kwargs):
+    source = SOURCE_BY_MODEL[sender]
+    # z.B. reine Status-Updates betreffen den Index nicht
+    if update_fields is not None and not set(update_fields) & set(source.fields):
+        return
+    index_object(instance, created=created)
+
+
+def _remove_on_delete(sender, instance, **kwargs):
+    remove_objects(SOURCE_BY_MODEL[sender].kind, [instance.pk])
+
+
+def connect_search_signals():
+    # Nachrichten kommen per bulk_create und werden über catch_up() indexiert.
+    # Activity-Einträge werden nicht gelöscht per Signal (purge_updates räumt selbst auf),
+    # damit das Löschen dort ein schnelles DELETE bleibt.
+    for model in (Task, TaskComment, Document, Update):
+        post_save.connect(_index_on_save, sender=model, dispatch_uid=f'projectmanager_search_save_{model.__name__}')
+    for model in (Task, TaskComment, Document):
+        post_delete.connect(_remove_on_delete, sender=model, dispatch_uid=f'projectmanager_search_delete_{model.__name__}')
+
+
+# -------------------------
+# Suche
+# -------------------------
+
+@dataclass
+class SearchResult:
+    kind: str
+    object_id: int
+    project_id: int
+    title: str
+    score: float
+    url: str
+
+
+def result_url(document):
+    kind = document['kind']
+    if kind == 'task':
+        return reverse('task_detail', args=[document['object_id']])
+    if kind == 'comment':
+        return reverse('task_detail', args=[document['parent_id']])
+    if kind == 'document':
+        return reverse('download_document', args=[document['object_id']])
+    return reverse('project_dashboard', args=[document['project_id']])
+
+
+def search(user, query, limit=20, project_id=None, kinds=None):
+    """
+    Alle Begriffe müssen vorkommen (UND), der letzte als Präfix.
+    Nur Projekte, in denen der User Mitglied ist.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+
+    project_ids = list(get_project_roles(user))
+    if project_id is not None:
+        project_ids = [pid for pid in project_ids if pid == project_id]
+    if not project_ids:
+        return []
+
+    # Je Begriff: Dokument -> Gewicht (bei Präfixen über alle passenden Terme summiert)
+    matches = []
+    for i, term in enumerate(terms):
+        postings = SearchPosting.objects.filter(project_id__in=project_ids)
+        if i == len(terms) - 1:
+            postings = postings.filter(term__gte=term, term__lt=term + PREFIX_END)
+        else:
+            postings = postings.filter(term=term)
+        if kinds:
+            postings = postings.filter(document__kind__in=kinds)
+
+        # Beim Abschneiden die stärksten Treffer behalten, unabhängig von der Reihenfolge der DB
+        postings = postings.order_by('-weight', 'document_id').values_list('document_id', 'weight')
+        weights = Counter()
+        for document_id, weight in postings[:MAX_POSTINGS_PER_TERM]:
+            weights[document_id] += weight
+        if not weights:
+            return []
+        matches.append(weights)
+
+    candidates = set(matches[0]).intersection(*matches[1:])
+    if not candidates:
+        return []
+
+    documents = SearchDocument.objects.filter(project_id__in=project_ids)
+    if kinds:
+        documents = documents.filter(kind__in=kinds)
+    stats = documents.aggregate(total=Count('id'), avg_length=Avg('length'))
+    total = stats['total'] or 1
+    avg_length = stats['avg_length'] or 1
+
+    idf = [math.log(1 + (total - len(weights) + 0.5) / (len(weights) + 0.5)) for weights in matches]
+
+    if len(candidates) > MAX_CANDIDATES:
+        # Vorauswahl ohne Längennormierung, nur diese Dokumente werden geladen
+        candidates = heapq.nlargest(
+            MAX_CANDIDATES, candidates,
+            key=lambda doc_id: sum(term_idf * weights[doc_id] for term_idf, weights in zip(idf, matches)),
+        )
+
+    rows = SearchDocument.objects.filter(id__in=candidates).values(
+        'id', 'kind', 'object_id', 'project_id', 'parent_id', 'title', 'length'
+    )
+    results = []
+    for row in rows:
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * row['length'] / avg_length)
+        score = sum(
+            term_idf * weights[row['id']] * (BM25_K1 + 1) / (weights[row['id']] + norm)
+            for term_idf, weights in zip(idf, matches)
+        )
+        results.append(SearchResult(
+            kind=row['kind'],
+            object_id=row['object_id'],
+            project_id=row['project_id'],
+            title=row['title'],
+            score=round(score, 4),
+            url=result_url(row),
+        ))
+
+    results.sort(key=lambda result: (-result.score, result.kind, -result.object_id))
+    return results[:limit]
@@ -0,0 +1,235 @@
+"""
+Inhaltsadressierter Dateispeicher für Anhänge und Dokumente.
+
+- Uploads werden beim Schreiben in eine Temp-Datei gestreamt und dabei gehasht (SHA-256)
+- Jeder Inhalt liegt genau einmal unter blobs/ab/cd/<sha256>
+- Blob.ref_count zählt die Referenzen; delete() gibt nur eine Referenz frei,
+  physisch gelöscht wird erst durch collect_garbage() (manage.py gc_blobs)
+"""
+import hashlib
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.apps import apps
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = 'blobs'
+BLOB_NAME_RE = re.compile(rf'^{BLOB_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/(?P<digest>[0-9a-f]{{64}})$')
+
+# Abgeleitete Dateien liegen neben dem Blob (previews.py) und teilen seine Lebensdauer
+THUMBNAIL_SUFFIX = '.thumb.png'
+TEXT_PREVIEW_SUFFIX = '.preview.txt'
+DERIVED_SUFFIXES = (THUMBNAIL_SUFFIX, TEXT_PREVIEW_SUFFIX)
+
+
+def blob_name(digest):
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def blob_digest(name):
+    """SHA-256 aus einem Blob-Namen, None für alte (nicht deduplizierte) Dateien."""
+    match = BLOB_NAME_RE.match(name or '')
+    return match.group('digest') if match else None
+
+
+def hash_file(path, buffer_size=1024 * 1024):
+    hasher = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as fh:
+        while chunk := fh.read(buffer_size):
+            hasher.update(chunk)
+            size += len(chunk)
+    return hasher.hexdigest(), size
+
+
+def _blob_model():
+    # storage.py wird von models.py importiert, daher erst zur Laufzeit auflösen
+    return apps.get_model('projectmanager', 'Blob')
+
+
+def add_reference(digest, size):
+    """Erhöht den Referenzzähler, legt den Blob-Eintrag bei Bedarf an."""
+    Blob = _blob_model()
+    while True:
+        # Das UPDATE sperrt die Zeile und serialisiert sich so mit dem GC
+        if Blob.objects.filter(sha256=digest).update(ref_count=F('ref_count') + 1):
+            return
+        try:
+            with transaction.atomic():
+                Blob.objects.create(sha256=digest, size=size, ref_count=1)
+            return
+        except IntegrityError:
+            # Parallel angelegt, nochmal hochzählen
+            continue
+
+
+def release_reference(digest):
+    _blob_model().objects.filter(sha256=digest, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def _save(self, name, content):
+        if hasattr(content, 'temporary_file_path'):
+            # Liegt schon als Datei vor (großer Upload, fertiger Chunk-Upload):
+            # nur hashen und verschieben statt nochmal kopieren
+            tmp_path = content.temporary_file_path()
+            digest, size = hash_file(tmp_path)
+            return self._store(tmp_path, digest, size)
+
+        tmp_dir = self.path(os.path.join(BLOB_DIR, 'tmp'))
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if hasattr(content, 'seek') and content.seekable():
+                    content.seek(0)
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            return self._store(tmp_path, hasher.hexdigest(), size)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _store(self, tmp_path, digest, size):
+        """Legt tmp_path als Blob ab (oder verwirft es, falls schon vorhanden)."""
+        name = blob_name(digest)
+
+        # Erst die Referenz zählen, dann die Datei ablegen: der GC löscht
+        # nur Blobs mit ref_count 0 und sieht diese Referenz daher schon
+        add_reference(digest, size)
+
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.remove(tmp_path)
+            # Frisch halten, damit der GC die Datei nicht als verwaist ansieht
+            os.utime(full_path)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            file_move_safe(tmp_path, full_path, allow_overwrite=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # Der endgültige Name ergibt sich erst aus dem Inhalt
+        return name
+
+    def delete(self, name):
+        digest = blob_digest(name)
+        if digest is None:
+            # Dateien aus der Zeit vor der Deduplizierung
+            return super().delete(name)
+        release_reference(digest)
+
+
+blob_storage = ContentAddressedStorage()
+
+
+def _blob_file_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def _release_on_delete(sender, instance, **kwargs):
+    # Auch kaskadierende Löschungen (z.B. Task -> Anhänge) geben ihre Blobs frei
+    for field in _blob_file_fields(sender):
+        file = getattr(instance, field.attname)
+        if file:
+            field.storage.delete(file.name)
+
+
+def connect_blob_signals():
+    # Nur für Models mit Blob-Feldern, sonst verlieren alle anderen das schnelle DELETE
+    for model in apps.get_models():
+        if _blob_file_fields(model):
+            post_delete.connect(
+                _release_on_delete, sender=model,
+                dispatch_uid=f'projectmanager_blob_release_{model._meta.label_lower}'
+            )
+
+
+def referenced_blob_counts():
+    """Tatsächliche Referenzen je Digest über alle Felder, die blob_storage nutzen."""
+    counts = {}
+    for model in apps.get_models():
+        for field in _blob_file_fields(model):
+            names = model._default_manager.filter(**{f'{field.name}__startswith': f'{BLOB_DIR}/'})
+            for name in names.values_list(field.name, flat=True).iterator():
+                digest = blob_digest(name)
+                if digest:
+                    counts[digest] = counts.get(digest, 0) + 1
+    return counts
+
+
+def recount_references():
+    """Setzt ref_count auf die tatsächliche Anzahl Referenzen. Gibt die Anzahl Korrekturen zurück."""
+    Blob = _blob_model()
+    counts = referenced_blob_counts()
+    fixed = 0
+    for blob in Blob.objects.only('id', 'sha256', 'ref_count').iterator():
+        actual = counts.get(blob.sha256, 0)
+        if blob.ref_count != actual:
+            Blob.objects.filter(pk=blob.pk).update(ref_count=actual)
+            fixed += 1
+    return fixed
+
+
+def collect_garbage(grace=timedelta(hours=1), storage=blob_storage):
+    """
+    Löscht Blobs ohne Referenzen, die älter als `grace` sind, sowie Dateien
+    unter blobs/ ohne Blob-Eintrag. Gibt die Anzahl gelöschter Dateien zurück.
+    """
+    Blob = _blob_model()
+    cutoff = timezone.now() - grace
+    removed = 0
+
+    candidates = Blob.objects.filter(ref_count=0, created_at__lt=cutoff).values_list('id', flat=True)
+    for blob_id in list(candidates):
+        with transaction.atomic():
+            # Zeile sperren und erneut prüfen, ein Upload könnte gerade referenzieren
+            blob = Blob.objects.select_for_update().filter(id=blob_id, ref_count=0).first()
+            if blob is None:
+                continue
+            name = blob_name(blob.sha256)
+            for path in [name, *(name + suffix for suffix in DERIVED_SUFFIXES)]:
+                if storage.exists(path):
+                    os.remove(storage.path(path))
+                    removed += 1
+            blob.delete()
+
+    # Verwaiste Dateien (z.B. abgebrochene Uploads)
+    root = storage.path(BLOB_DIR)
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            full_path = os.path.join(dirpath, filename)
+            modified = datetime.fromtimestamp(os.path.getmtime(full_path), tz=dt_timezone.utc)
+            if modified >= cutoff:
+                continue
+            name = os.path.relpath(full_path, storage.location).replace(os.sep, '/')
+            for suffix in DERIVED_SUFFIXES:
+                name = name.removesuffix(suffix)
+            digest = blob_digest(name)
+            if digest is not None and Blob.objects.filter(sha256=digest).exists():
+                continue
+            os.remove(full_path)
+            removed += 1
+
+    return removed
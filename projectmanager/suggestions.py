@@ -0,0 +1,129 @@
+"""
+Vorschläge (AISuggestion) für ein Projekt, erzeugt im Job-Worker.
+
+Views rufen nur enqueue_suggestion() auf; pro Projekt und Typ gibt es höchstens
+einen offenen Job. Die eigentliche Auswertung läuft in run_suggestion_job().
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .jobs import enqueue
+from .models import AISuggestion, Milestone, Project, Update
+
+SUGGESTION_TYPES = dict(AISuggestion.SUGGESTION_TYPE_CHOICES)
+
+MAX_ITEMS = 5
+
+
+def suggestion_dedup_key(project_id, suggestion_type):
+    return f'suggestion:{project_id}:{suggestion_type}'
+
+
+def enqueue_suggestion(project, suggestion_type, priority=0):
+    if suggestion_type not in SUGGESTION_TYPES:
+        raise ValueError(f"Unknown suggestion type: {suggestion_type}")
+    project_id = getattr(project, 'pk', project)
+    return enqueue(
+        'ai_suggestion',
+        payload={'suggestion_type': suggestion_type},
+        project=project_id,
+        priority=priority,
+        dedup_key=suggestion_dedup_key(project_id, suggestion_type),
+    )
+
+
+def _task_list(tasks):
+    return ', '.join(f"'{task.title}'" for task in tasks[:MAX_ITEMS])
+
+
+def summarize_project(project):
+    today = timezone.localdate()
+    tasks = project.tasks.all()
+    counts = tasks.aggregate(
+        total=Count('id'),
+        todo=Count('id', filter=Q(status='TODO')),
+        in_progress=Count('id', filter=Q(status='IN_PROGRESS')),
+        done=Count('id', filter=Q(status='DONE')),
+    )
+    lines = [
+        f"'{project.title}' has {counts['total']} tasks: {counts['todo']} to do, "
+        f"{counts['in_progress']} in progress, {counts['done']} done."
+    ]
+
+    overdue = list(tasks.exclude(status='DONE').filter(deadline__lt=today).order_by('deadline')[:MAX_ITEMS])
+    if overdue:
+        lines.append(f"Overdue: {_task_list(overdue)}.")
+    due_soon = list(
+        tasks.exclude(status='DONE')
+        .filter(deadline__gte=today, deadline__lte=today + timedelta(days=7))
+        .order_by('deadline')[:MAX_ITEMS]
+    )
+    if due_soon:
+        lines.append(f"Due this week: {_task_list(due_soon)}.")
+
+    for milestone in Milestone.objects.filter(project=project).with_progress().order_by('deadline'):
+        lines.append(f"Milestone '{milestone.title}': {milestone.progress}% done.")
+
+    activity = Update.objects.filter(project=project, created_at__gte=timezone.now() - timedelta(days=7)).count()
+    lines.append(f"{activity} activity entries in the last 7 days.")
+    return '\n'.join(lines)
+
+
+def deadline_suggestions(project):
+    # Gleiche Bewertung wie der nächtliche Lauf (risk.py), aber immer der aktuelle Stand
+    from .risk import RISK_THRESHOLD, describe_risks, score_open_tasks
+
+    result = score_open_tasks(project_ids=[project.id])
+    at_risk = result.scores >= RISK_THRESHOLD
+    if not at_risk.any():
+        return ''
+    return describe_risks(result.task_ids[at_risk], result.scores[at_risk])
+
+
+def task_suggestions(project):
+    lines = []
+    empty_milestones = Milestone.objects.filter(project=project).annotate(task_count=Count('tasks')).filter(task_count=0)
+    for milestone in empty_milestones[:MAX_ITEMS]:
+        lines.append(f"Milestone '{milestone.title}' has no tasks yet, break it down into tasks.")
+
+    unassigned = list(
+        project.tasks.exclude(status='DONE')
+        .filter(assigned_to__isnull=True, priority__in=['HIGH', 'URGENT'])[:MAX_ITEMS]
+    )
+    if unassigned:
+        lines.append(f"Assign the high priority tasks {_task_list(unassigned)}.")
+
+    idle = project.members.annotate(
+        open_tasks=Count('task', filter=Q(task__project=project) & ~Q(task__status='DONE'))
+    ).filter(open_tasks=0)
+    for user in idle[:MAX_ITEMS]:
+        lines.append(f"{user.username} has no open tasks in this project.")
+    return '\n'.join(lines)
+
+
+GENERATORS = {
+    'SUMMARY': summarize_project,
+    'DEADLINE': deadline_suggestions,
+    'TASK': task_suggestions,
+}
+
+
+def run_suggestion_job(job):
+    """Job-Handler: schreibt einen AISuggestion-Eintrag, sofern es etwas Neues gibt."""
+    suggestion_type = job.payload['suggestion_type']
+    project = job.project or Project.objects.get(id=job.project_id)
+    content = GENERATORS[suggestion_type](project)
+    if not content:
+        return None
+
+    latest = (
+        AISuggestion.objects.filter(project=project, suggestion_type=suggestion_type, accepted=False)
+        .order_by('-created_at', '-id')
+        .values_list('content', flat=True)
+        .first()
+    )
+    if latest == content:
+        return None
+    return AISuggestion.objects.create(project=project, suggestion_type=suggestion_type, content=content)
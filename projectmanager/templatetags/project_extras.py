@@ -1,14 +1,13 @@
 from django import template
-from projectmanager.models import ProjectMembership
+from projectmanager.previews import attachment_preview as load_attachment_preview
+from projectmanager.roles import get_project_role
 
 register = template.Library()
 
 @register.filter
 def project_role(user, project):
-    try:
-        return ProjectMembership.objects.get(
-            user=user,
-            project=project
-        ).role
-    except ProjectMembership.DoesNotExist:
-        return None
\ No newline at end of file
+    return get_project_role(user, project)
+
+@register.filter
+def attachment_preview(attachment):
+    return load_attachment_preview(attachment)
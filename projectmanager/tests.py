@@ -1,3 +1,1687 @@
-from django.test import TestCase
+import io
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+from datetime import date, timedelta
+from importlib import import_module
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock, skipIf
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.exceptions import ChannelFull
+from channels.layers import get_channel_layer
+
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from student_pm.channel_layers import build_channel_layers
+
+from .activity import compact_activity, purge_updates
+from .analytics import backfill_project, milestone_series, project_series, record_task_changes
+from .benchmark.data import Scale, benchmark_projects, generate
+from .benchmark.http_load import SCENARIOS, load_virtual_users, run_http
+from .benchmark.stats import LatencyStats, percentile
+from .benchmark.ws_load import run_chat
+from .chat_buffer import MessageBuffer
+from .invitations import PENDING_INVITATIONS_LIMIT, PendingInvitations
+from .jobs import JOB_HANDLERS, Worker, _finish, claim_jobs, enqueue, requeue_stale_jobs, run_pending
+from .events import project_group_name
+from .models import AISuggestion, Blob, Document, Job, Message, Milestone, MilestoneSnapshot, Project, ProjectInvitation, ProjectMembership, ProjectSnapshot, SearchDocument, SearchIndexState, Task, TaskAttachment, TaskComment, TaskRiskScore, Update, UploadSession
+from .roles import get_project_role, invalidate_project_roles, is_project_admin, is_project_member
+from .previews import generate_previews
+from .risk import score_open_tasks, update_deadline_risks
+from .search import catch_up, rebuild_index, search
+from .storage import blob_storage, collect_garbage, hash_file
+from .suggestions import enqueue_suggestion
+from .uploads import fcntl, finalize_upload, start_upload, upload_dir, write_chunk
+from .views import _update_returning_supported
+from . import urls
+
+
+def make_project(owner, size):
+    """Legt ein Projekt mit `size` Mitgliedern, Milestones, Tasks, Updates und Nachrichten an."""
+    project = Project.objects.create(
+        title=f"Project {size}",
+        goal="Test",
+        start_date=date(2026, 1, 1),
+        end_date=date(2026, 12, 31),
+    )
+    ProjectMembership.objects.create(user=owner, project=project, role='ADMIN')
+
+    members = [owner]
+    for i in range(size):
+        user = User.objects.create_user(username=f"member_{project.id}_{i}", email=f"m{project.id}_{i}@example.com")
+        ProjectMembership.objects.create(user=user, project=project, role='MEMBER')
+        members.append(user)
+
+    milestones = Milestone.objects.bulk_create([
+        Milestone(project=project, title=f"Milestone {i}", deadline=date(2026, 6, 1))
+        for i in range(size)
+    ])
+
+    statuses = [choice for choice, _ in Task.STATUS_CHOICES]
+    Task.objects.bulk_create([
+        Task(
+            project=project,
+            title=f"Task {i}",
+            deadline=date(2026, 6, 1),
+            status=statuses[i % len(statuses)],
+            assigned_to=members[i % len(members)],
+            milestone=milestones[i % len(milestones)] if milestones else None,
+        )
+        for i in range(size * 5)
+    ])
+
+    Update.objects.bulk_create([
+        Update(project=project, user=members[i % len(members)], text=f"update {i}")
+        for i in range(size)
+    ])
+    Message.objects.bulk_create([
+        Message(project=project, sender=members[i % len(members)], content=f"message {i}")
+        for i in range(size)
+    ])
+    return project
+
+
+class ProjectDashboardQueryTests(TestCase):
+    # Session, User, Rollen, Projekt, Mitglieder, Einladungen, Task-Versionen,
+    # Karten bei Cache-Miss, Milestones, Updates
+    DASHBOARD_QUERY_BUDGET = 10
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+
+    def count_dashboard_queries(self, project):
+        url = reverse('project_dashboard', args=[project.id])
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_dashboard_query_count_is_independent_of_project_size(self):
+        small = make_project(self.user, 1)
+        large = make_project(self.user, 20)
+        inviter = User.objects.create_user(username="inviter")
+        for project in (small, large):
+            ProjectInvitation.objects.create(project=project, email=self.user.email, invited_by=inviter)
+
+        small_count = self.count_dashboard_queries(small)
+        large_count = self.count_dashboard_queries(large)
+
+        self.assertEqual(small_count, large_count)
+        self.assertLessEqual(large_count, self.DASHBOARD_QUERY_BUDGET)
+
+    def test_milestone_progress_uses_annotation(self):
+        project = make_project(self.user, 3)
+        response = self.client.get(reverse('project_dashboard', args=[project.id]))
+        for milestone in response.context['milestones']:
+            done = milestone.tasks.filter(status='DONE').count()
+            expected = int((done / milestone.tasks.count()) * 100)
+            self.assertEqual(milestone.progress, expected)
+
+
+class KanbanCardCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+        self.project = make_project(self.user, 5)
+        self.url = reverse('project_dashboard', args=[self.project.id])
+        cache.clear()
+
+    def test_cards_are_grouped_by_status(self):
+        response = self.client.get(self.url)
+        columns = {column['status']: column['cards'] for column in response.context['kanban_columns']}
+        for task in self.project.tasks.all():
+            marker = f'data-task-id="{task.id}"'
+            for status, cards in columns.items():
+                self.assertEqual(marker in cards, status == task.status)
+
+    def test_warm_cache_skips_card_query(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        card_queries = [q for q in ctx.captured_queries if 'auth_user' in q['sql'] and 'projectmanager_task' in q['sql']]
+        self.assertEqual(card_queries, [])
+
+    def test_edit_renders_fresh_card(self):
+        self.client.get(self.url)
+        task = self.project.tasks.first()
+        task.title = "Renamed task"
+        task.save()
+
+        response = self.client.get(self.url)
+        self.assertContains(response, "Renamed task")
+
+
+class MilestoneProgressTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+        self.project = make_project(self.user, 2)
+
+    def test_milestone_detail_reports_aggregated_progress(self):
+        milestone = self.project.milestones.first()
+        url = reverse('milestone_detail', args=[milestone.id])
+        # Session, User, Milestone inkl. Fortschritt, Tasks
+        with self.assertNumQueries(4):
+            data = self.client.get(url).json()
+
+        done = milestone.tasks.filter(status='DONE').count()
+        total = milestone.tasks.count()
+        self.assertEqual(data['done'], done)
+        self.assertEqual(data['total'], total)
+        self.assertEqual(data['progress'], int((done / total) * 100))
+        self.assertEqual(len(data['tasks']), total)
+
+    def test_progress_without_annotation(self):
+        milestone = Milestone.objects.create(project=self.project, title="Empty")
+        self.assertEqual(milestone.progress, 0)
+
+
+class ProjectListQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+
+    def count_list_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('project_list'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_project_list_query_count_is_independent_of_project_count(self):
+        make_project(self.user, 2)
+        small_count, _ = self.count_list_queries()
+
+        for size in range(1, 6):
+            make_project(self.user, size)
+        large_count, response = self.count_list_queries()
+
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(response.context['projects_with_roles']), 6)
+
+    def test_project_list_annotations(self):
+        project = make_project(self.user, 3)
+        Task.objects.filter(project=project).update(deadline=date(2099, 1, 1))
+        _, response = self.count_list_queries()
+        item = response.context['projects_with_roles'][0]
+
+        self.assertEqual(item['user_role'], 'ADMIN')
+        self.assertEqual(item['project'].member_count, 4)
+        self.assertEqual(item['project'].todo_count, project.tasks.filter(status='TODO').count())
+        self.assertEqual(item['project'].done_count, project.tasks.filter(status='DONE').count())
+        self.assertEqual(item['project'].next_deadline, date(2099, 1, 1))
+
+
+class ChatHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+        self.project = make_project(self.user, 0)
+        Message.objects.bulk_create([
+            Message(project=self.project, sender=self.user, content=f"message {i}")
+            for i in range(7)
+        ])
+
+    def test_pages_through_history_by_cursor(self):
+        url = reverse('chat_history', args=[self.project.id])
+        contents = []
+        params = {'limit': 3}
+        while True:
+            data = self.client.get(url, params).json()
+            contents = [m['message'] for m in data['messages']] + contents
+            if not data['next_cursor']:
+                break
+            params = {'limit': 3, **data['next_cursor']}
+
+        self.assertEqual(contents, [f"message {i}" for i in range(7)])
+
+    def test_limit_below_one_returns_a_single_message(self):
+        url = reverse('chat_history', args=[self.project.id])
+        for limit in (0, -5):
+            response = self.client.get(url, {'limit': limit})
+            self.assertEqual(response.status_code, 200, limit)
+            self.assertEqual([m['message'] for m in response.json()['messages']], ["message 6"])
+            self.assertIsNotNone(response.json()['next_cursor'])
+
+    def test_requires_membership(self):
+        other = User.objects.create_user(username="other")
+        self.client.force_login(other)
+        response = self.client.get(reverse('chat_history', args=[self.project.id]))
+        self.assertEqual(response.status_code, 403)
+
+
+class ChannelLayerTests(SimpleTestCase):
+    layer_config = {'capacity': 2, 'expiry': 5, 'group_expiry': 10}
+
+    def test_redis_url_selects_redis_layer(self):
+        with mock.patch('student_pm.channel_layers.find_spec', return_value=object()):
+            layers = build_channel_layers('redis://localhost:6379/0', self.layer_config)
+        self.assertEqual(layers['default']['BACKEND'], 'channels_redis.core.RedisChannelLayer')
+        self.assertEqual(layers['default']['CONFIG'], {'hosts': ['redis://localhost:6379/0'], **self.layer_config})
+
+    def test_redis_url_without_package_fails_clearly(self):
+        with mock.patch('student_pm.channel_layers.find_spec', return_value=None):
+            with self.assertRaisesMessage(ImproperlyConfigured, "pip install channels-redis redis"):
+                build_channel_layers('redis://localhost:6379/0', self.layer_config)
+
+    def test_in_memory_stand_in_fans_out_and_honours_capacity(self):
+        with override_settings(CHANNEL_LAYERS=build_channel_layers('', self.layer_config)):
+            layer = get_channel_layer()
+            self.assertEqual((layer.capacity, layer.expiry, layer.group_expiry), (2, 5, 10))
+
+            first = async_to_sync(layer.new_channel)()
+            second = async_to_sync(layer.new_channel)()
+            for channel in (first, second):
+                async_to_sync(layer.group_add)('chat_1', channel)
+            async_to_sync(layer.group_send)('chat_1', {'type': 'chat_message', 'message': 'hi'})
+            for channel in (first, second):
+                self.assertEqual(async_to_sync(layer.receive)(channel)['message'], 'hi')
+
+            async_to_sync(layer.send)(first, {'type': 'chat_message'})
+            async_to_sync(layer.send)(first, {'type': 'chat_message'})
+            with self.assertRaises(ChannelFull):
+                async_to_sync(layer.send)(first, {'type': 'chat_message'})
+
+
+class TaskEventTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+        self.project = make_project(self.user, 1)
+        self.task = self.project.tasks.filter(assigned_to=self.user).first()
+
+        self.channel_layer = get_channel_layer()
+        self.channel = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)(project_group_name(self.project.id), self.channel)
+
+    def receive_event(self):
+        return async_to_sync(self.channel_layer.receive)(self.channel)['payload']
+
+    def test_status_change_pushes_delta(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('update_task_status_ajax', args=[self.task.id]),
+                data=json.dumps({'status': 'DONE', 'from': self.task.status}),
+                content_type='application/json',
+            )
+
+        event = self.receive_event()
+        self.task.refresh_from_db()
+        self.assertEqual(event, {
+            'kind': 'task.changed',
+            'id': self.task.id,
+            'version': self.task.version,
+            'fields': {'status': 'DONE'},
+        })
+
+    def test_delete_pushes_event(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('delete_task', args=[self.task.id]))
+
+        self.assertEqual(self.receive_event(), {'kind': 'task.deleted', 'id': self.task.id})
+
+
+class ActivityLogTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+        self.project = make_project(self.user, 1)
+        self.project.updates.all().delete()
+
+    def test_status_changes_are_written_structured(self):
+        task = self.project.tasks.filter(assigned_to=self.user, status='TODO').first()
+        self.client.post(
+            reverse('update_task_status_ajax', args=[task.id]),
+            data=json.dumps({'status': 'DONE', 'from': 'TODO'}),
+            content_type='application/json',
+        )
+
+        update = self.project.updates.get()
+        self.assertEqual(update.event_type, 'TASK_STATUS')
+        self.assertEqual(update.payload, {'task': task.id, 'title': task.title, 'from': 'TODO', 'to': 'DONE'})
+        self.assertEqual(update.describe(), f"changed status of '{task.title}' to DONE")
+
+    def test_runs_are_collapsed_on_read(self):
+        Update.objects.bulk_create([
+            Update(project=self.project, user=self.user, event_type='TASK_STATUS',
+                   payload={'task': i, 'title': f"Task {i}", 'from': 'TODO', 'to': 'DONE'})
+            for i in range(12)
+        ] + [Update(project=self.project, user=self.user, event_type='NOTE', text="hello")])
+
+        entries = compact_activity(self.project.updates.order_by('-id'))
+        self.assertEqual([e.text for e in entries], ["hello", "changed 12 task statuses"])
+        self.assertEqual(entries[1].count, 12)
+
+    def test_purge_deletes_in_chunks(self):
+        Update.objects.bulk_create([
+            Update(project=self.project, user=self.user, text=f"note {i}") for i in range(25)
+        ])
+        with self.assertNumQueries(9):
+            # 3 Blöcke à (IDs lesen + DELETE + Notizen aus dem Suchindex entfernen)
+            deleted = purge_updates(self.project.updates.all(), chunk_size=10)
+        self.assertEqual(deleted, 25)
+        self.assertFalse(self.project.updates.exists())
+
+
+# Tabellen, auf denen die Views filtern und die mit den Projekten wachsen
+INDEXED_TABLES = (
+    'projectmanager_task',
+    'projectmanager_update',
+    'projectmanager_message',
+    'projectmanager_projectinvitation',
+    'projectmanager_projectmembership',
+    'projectmanager_milestone',
+)
+
+
+def full_table_scans(sql):
+    """
+    Gibt die Zeilen des Query-Plans zurück, die eine der Tabellen komplett lesen.
+    Ein Scan über einen (auch abdeckenden) Index liest ebenfalls jede Zeile und zählt mit.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = [row[-1] for row in cursor.fetchall()]
+            return [step for step in plan if step.startswith('SCAN ') and step.split()[1] in INDEXED_TABLES]
+        if connection.vendor == 'mysql':
+            cursor.execute('EXPLAIN ' + sql)
+            columns = [column[0] for column in cursor.description]
+            plan = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            return [step for step in plan if step['type'] in ('ALL', 'index') and step['table'] in INDEXED_TABLES]
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN ' + sql)
+            plan = [row[0] for row in cursor.fetchall()]
+            return [step for step in plan if 'Seq Scan on' in step and any(t in step for t in INDEXED_TABLES)]
+    return []
+
+
+class TaskStatusTransitionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+        self.project = make_project(self.user, 1)
+        self.task = self.project.tasks.filter(assigned_to=self.user, status='TODO').first()
+        self.url = reverse('update_task_status_ajax', args=[self.task.id])
+
+    def post(self, payload):
+        return self.client.post(self.url, data=json.dumps(payload), content_type='application/json')
+
+    def test_single_conditional_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post({'status': 'IN_PROGRESS', 'from': 'TODO'})
+        self.assertTrue(response.json()['success'])
+
+        task_queries = [q['sql'] for q in ctx.captured_queries if 'projectmanager_task' in q['sql']]
+        self.assertTrue(task_queries[0].startswith('UPDATE'))
+        self.assertIn(connection.ops.quote_name('status'), task_queries[0].split('WHERE')[1])
+        self.assertNotIn(connection.ops.quote_name('title') + ' =', task_queries[0].split('WHERE')[0])
+        if _update_returning_supported():
+            # Neue Version kommt per RETURNING, die Zeile wird nicht nachgelesen
+            self.assertFalse([sql for sql in task_queries[1:] if connection.ops.quote_name('version') in sql])
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'IN_PROGRESS')
+        self.assertEqual(self.task.version, response.json()['version'])
+
+    def test_reports_conflict(self):
+        Task.objects.filter(id=self.task.id).update(status='DONE')
+        response = self.post({'status': 'IN_PROGRESS', 'from': 'TODO'})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['current_status'], 'DONE')
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'DONE')
+
+    def test_expected_status_is_required(self):
+        response = self.post({'status': 'DONE'})
+        self.assertEqual(response.status_code, 400)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'TODO')
+        self.assertEqual(self.task.version, 1)
+
+    def test_only_assignee_may_change_status(self):
+        Task.objects.filter(id=self.task.id).update(assigned_to=None)
+        response = self.post({'status': 'DONE', 'from': 'TODO'})
+        self.assertFalse(response.json()['success'])
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'TODO')
+
+
+class BulkTaskUpdateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+        self.project = make_project(self.user, 4)
+        self.url = reverse('bulk_update_tasks', args=[self.project.id])
+
+    def post(self, payload):
+        return self.client.post(self.url, data=json.dumps(payload), content_type='application/json')
+
+    def test_updates_all_tasks_in_one_activity_entry(self):
+        task_ids = list(self.project.tasks.values_list('id', flat=True))
+        milestone = self.project.milestones.first()
+        self.project.updates.all().delete()
+
+        response = self.post({
+            'task_ids': task_ids,
+            'changes': {'status': 'DONE', 'priority': 'URGENT', 'assigned_to': self.user.id, 'milestone': milestone.id},
+        })
+
+        self.assertEqual(sorted(response.json()['updated']), sorted(task_ids))
+        self.assertEqual(
+            self.project.tasks.exclude(status='DONE', priority='URGENT', assigned_to=self.user, milestone=milestone).count(),
+            0
+        )
+        update = self.project.updates.get()
+        self.assertEqual(update.event_type, 'TASK_BULK')
+        self.assertEqual(update.describe(), f"updated {len(task_ids)} tasks")
+        self.assertEqual(sorted(task_id for task_id, _, _ in update.payload['tasks']), sorted(task_ids))
+
+    def test_rejects_non_integer_references(self):
+        task_ids = list(self.project.tasks.values_list('id', flat=True))
+        for field in ('assigned_to', 'milestone'):
+            response = self.post({'task_ids': task_ids, 'changes': {field: "abc"}})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.project.tasks.filter(milestone__isnull=True).count(), 0)
+
+    def test_query_count_does_not_grow_with_task_count(self):
+        task_ids = list(self.project.tasks.values_list('id', flat=True))
+        # Die ersten Änderungen des Tages legen die Snapshot-Zeilen an
+        self.post({'task_ids': task_ids, 'changes': {'status': 'DONE'}})
+        with CaptureQueriesContext(connection) as few:
+            self.post({'task_ids': task_ids[:2], 'changes': {'status': 'IN_PROGRESS'}})
+        with CaptureQueriesContext(connection) as many:
+            self.post({'task_ids': task_ids, 'changes': {'status': 'TODO'}})
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+    def test_members_only_change_their_own_tasks(self):
+        member = self.project.memberships.filter(role='MEMBER').first().user
+        own = self.project.tasks.filter(assigned_to=member).values_list('id', flat=True)
+        self.client.force_login(member)
+
+        response = self.post({'task_ids': list(self.project.tasks.values_list('id', flat=True)), 'changes': {'priority': 'LOW'}})
+
+        self.assertEqual(sorted(response.json()['updated']), sorted(own))
+        self.assertEqual(self.project.tasks.filter(priority='LOW').count(), len(own))
+
+
+class ReadApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+        self.project = make_project(self.user, 3)
+
+    def test_sparse_fieldsets(self):
+        url = reverse('api_task_list', args=[self.project.id])
+        data = self.client.get(url, {'fields': 'id,status'}).json()
+
+        self.assertEqual(data['version'], 'v1')
+        self.assertEqual(len(data['results']), self.project.tasks.count())
+        self.assertEqual(set(data['results'][0]), {'id', 'status'})
+        self.assertEqual(self.client.get(url, {'fields': 'id,secret'}).status_code, 400)
+
+    def test_not_modified_until_a_task_changes(self):
+        url = reverse('api_task_list', args=[self.project.id])
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        task = self.project.tasks.first()
+        task.priority = 'URGENT'
+        task.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_covers_changes_without_a_version_bump(self):
+        task_url = reverse('api_task_list', args=[self.project.id])
+        milestone_url = reverse('api_milestone_list', args=[self.project.id])
+        milestone = Milestone.objects.create(project=self.project, title="Draft", deadline=date(2026, 6, 1))
+        task = self.project.tasks.filter(assigned_to=self.user).first()
+        Task.objects.filter(id=task.id).update(milestone=milestone)
+
+        def changed(url, change):
+            etag = self.client.get(url)['ETag']
+            change()
+            return self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+        self.assertTrue(changed(task_url, lambda: User.objects.filter(id=self.user.id).update(username="renamed")))
+        self.assertTrue(changed(milestone_url, lambda: Milestone.objects.filter(id=milestone.id).update(description="Scope")))
+        # Löschen des Milestones setzt task.milestone per SET_NULL, version bleibt gleich
+        self.assertTrue(changed(task_url, milestone.delete))
+        self.assertFalse(changed(task_url, lambda: None))
+
+    def test_activity_limit_must_be_positive(self):
+        url = reverse('api_activity_list', args=[self.project.id])
+        for limit in ('0', '-5', 'all'):
+            response = self.client.get(url, {'limit': limit})
+            self.assertEqual(response.status_code, 400, limit)
+            self.assertEqual(response.json(), {'error': 'Invalid limit'})
+        self.assertEqual(len(self.client.get(url, {'limit': 1}).json()['results']), 1)
+
+    def test_anonymous_clients_get_401_json(self):
+        self.client.logout()
+        response = self.client.get(reverse('api_task_list', args=[self.project.id]))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {'error': 'Authentication required'})
+
+    def test_endpoints_return_data(self):
+        for name in ('api_project_detail', 'api_milestone_list', 'api_member_list', 'api_activity_list'):
+            response = self.client.get(reverse(name, args=[self.project.id]))
+            self.assertEqual(response.status_code, 200, name)
+            self.assertIn('ETag', response)
+
+            self.assertEqual(self.client.get(response.wsgi_request.path, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304, name)
+
+        projects = self.client.get(reverse('api_project_list')).json()['results']
+        self.assertEqual(projects[0]['role'], 'ADMIN')
+
+    def test_non_members_get_404(self):
+        self.client.force_login(User.objects.create_user(username="stranger"))
+        response = self.client.get(reverse('api_task_list', args=[self.project.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class PendingInvitationsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username="admin", email="admin@example.com")
+        self.invitee = User.objects.create_user(username="invitee", email="invitee@example.com")
+        self.project = make_project(self.admin, 0)
+
+    def test_cached_until_invalidated(self):
+        self.assertEqual(len(PendingInvitations(self.invitee.email)), 0)
+
+        self.client.force_login(self.admin)
+        self.client.post(reverse('add_member', args=[self.project.id]), {'email': self.invitee.email})
+
+        pending = PendingInvitations(self.invitee.email)
+        self.assertEqual(len(pending), 1)
+        self.assertEqual(list(pending)[0]['project']['title'], self.project.title)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(len(PendingInvitations(self.invitee.email)), 1)
+
+        self.client.force_login(self.invitee)
+        self.client.get(reverse('accept_invitation', args=[list(pending)[0]['id']]))
+        self.assertEqual(len(PendingInvitations(self.invitee.email)), 0)
+
+
+class ProjectRoleResolverTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.projects = [make_project(self.user, 0) for _ in range(3)]
+        self.other = Project.objects.create(
+            title="Other", goal="Test", start_date=date(2026, 1, 1), end_date=date(2026, 12, 31)
+        )
+
+    def test_roles_are_loaded_once(self):
+        with self.assertNumQueries(1):
+            for project in self.projects:
+                self.assertTrue(is_project_admin(self.user, project))
+                self.assertTrue(is_project_member(self.user, project.id))
+            self.assertIsNone(get_project_role(self.user, self.other))
+
+    def test_invalidate_reloads_roles(self):
+        self.assertIsNone(get_project_role(self.user, self.other))
+        ProjectMembership.objects.create(user=self.user, project=self.other, role='VIEWER')
+        self.assertIsNone(get_project_role(self.user, self.other))
+
+        invalidate_project_roles(self.user)
+        self.assertEqual(get_project_role(self.user, self.other), 'VIEWER')
+
+    def test_role_changes_reach_the_member_on_the_next_request(self):
+        project = self.projects[0]
+        member = User.objects.create_user(username="member")
+        ProjectMembership.objects.create(user=member, project=project, role='MEMBER')
+        dashboard = reverse('project_dashboard', args=[project.id])
+
+        self.client.force_login(self.user)
+        self.client.post(reverse('change_role', args=[project.id, member.id]), {'role': 'VIEWER'})
+        self.client.force_login(member)
+        self.assertEqual(self.client.get(dashboard).context['user_role'], 'VIEWER')
+
+        self.client.force_login(self.user)
+        self.client.post(reverse('remove_member', args=[project.id, member.id]))
+        self.client.force_login(member)
+        self.assertEqual(self.client.get(dashboard).status_code, 404)
+
+
+class MessageBufferTests(TransactionTestCase):
+    # database_sync_to_async schließt die Verbindung; in einer TestCase-Transaktion ginge sie verloren
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.project = make_project(self.user, 0)
+
+    async def test_flushes_when_full(self):
+        buffer = MessageBuffer(max_size=3, flush_interval=60)
+        for i in range(2):
+            await buffer.add(self.project.id, self.user.id, f"message {i}")
+        self.assertEqual(await Message.objects.acount(), 0)
+
+        await buffer.add(self.project.id, self.user.id, "message 2")
+        self.assertEqual(await Message.objects.acount(), 3)
+        self.assertEqual(buffer.stats()["pending"], 0)
+        self.assertEqual(buffer.stats()["flushed_total"], 3)
+
+    async def test_failed_flush_keeps_messages_and_caps_buffer(self):
+        buffer = MessageBuffer(max_size=2, flush_interval=60, max_pending=3)
+        with mock.patch.object(buffer, '_write', side_effect=OperationalError("db gone")):
+            for i in range(3):
+                self.assertTrue(await buffer.add(self.project.id, self.user.id, f"message {i}"))
+            self.assertFalse(await buffer.add(self.project.id, self.user.id, "message 3"))
+        buffer._timer.cancel()
+        self.assertEqual(buffer.stats()["pending"], 3)
+        self.assertEqual(buffer.stats()["dropped_total"], 1)
+
+        # Der nächste Flush schreibt die zurückgehaltenen Nachrichten
+        self.assertEqual(await buffer.flush(), 3)
+        self.assertEqual(await Message.objects.acount(), 3)
+
+    def test_flush_sync_writes_remaining_messages(self):
+        buffer = MessageBuffer(max_size=10, flush_interval=60)
+        async_to_sync(buffer.add)(self.project.id, self.user.id, "bye")
+        self.assertEqual(buffer.flush_sync(), 1)
+        self.assertEqual(Message.objects.get().content, "bye")
+
+
+def use_temp_media_root(testcase):
+    """MEDIA_ROOT für die Dauer des Tests in ein Temp-Verzeichnis legen."""
+    media_root = tempfile.mkdtemp()
+    testcase.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    settings_override = override_settings(MEDIA_ROOT=media_root)
+    settings_override.enable()
+    testcase.addCleanup(settings_override.disable)
+    return media_root
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = use_temp_media_root(self)
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+        self.project = make_project(self.user, 1)
+        self.task = self.project.tasks.first()
+
+    def upload(self, task, name="report.pdf", content=b"%PDF same content"):
+        self.client.post(
+            reverse('add_task_attachment', args=[task.id]),
+            {'file': SimpleUploadedFile(name, content)},
+        )
+        return task.attachments.latest('id')
+
+    def test_identical_uploads_share_one_blob(self):
+        other_task = Task.objects.create(project=self.project, title="Other", deadline=date.today())
+        first = self.upload(self.task)
+        second = self.upload(other_task, name="copy.pdf")
+
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+        self.assertEqual(second.display_name, "copy.pdf")
+        blob_dir = os.path.dirname(blob_storage.path(first.file.name))
+        self.assertEqual(os.listdir(blob_dir), [os.path.basename(first.file.name)])
+
+    def test_delete_keeps_shared_blob_until_last_reference(self):
+        other_task = Task.objects.create(project=self.project, title="Other", deadline=date.today())
+        first = self.upload(self.task)
+        self.upload(other_task)
+        path = blob_storage.path(first.file.name)
+
+        self.client.post(reverse('delete_task_attachment', args=[first.id]))
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        collect_garbage(grace=timedelta(0))
+        self.assertTrue(os.path.exists(path))
+
+        # Kaskadierendes Löschen gibt die letzte Referenz frei
+        other_task.delete()
+        self.assertEqual(Blob.objects.get().ref_count, 0)
+        self.assertEqual(collect_garbage(grace=timedelta(0)), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(TaskAttachment.objects.exists())
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        use_temp_media_root(self)
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+        self.project = make_project(self.user, 1)
+        self.task = self.project.tasks.first()
+        self.content = bytes(range(256)) * 40
+
+    def start(self):
+        response = self.client.post(
+            reverse('start_attachment_upload', args=[self.task.id]),
+            json.dumps({'filename': 'design.psd', 'size': len(self.content)}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()['upload_id']
+
+    def put_chunk(self, upload_id, offset, data):
+        return self.client.put(
+            reverse('attachment_upload', args=[upload_id]) + f'?offset={offset}',
+            data, content_type='application/octet-stream',
+        )
+
+    def test_chunks_are_resumable_and_finalized(self):
+        upload_id = self.start()
+        self.assertEqual(self.put_chunk(upload_id, 0, self.content[:4000]).json()['offset'], 4000)
+
+        # Falscher Offset (z.B. nach Verbindungsabbruch): Server nennt den richtigen
+        response = self.put_chunk(upload_id, 1000, self.content[1000:5000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 4000)
+
+        state = self.client.get(reverse('attachment_upload', args=[upload_id])).json()
+        self.put_chunk(upload_id, state['offset'], self.content[state['offset']:])
+
+        response = self.client.post(reverse('finalize_attachment_upload', args=[upload_id]))
+        self.assertEqual(response.status_code, 200)
+
+        attachment = TaskAttachment.objects.get(id=response.json()['attachment_id'])
+        self.assertEqual(attachment.task, self.task)
+        self.assertEqual(attachment.display_name, 'design.psd')
+        with attachment.file.open('rb') as fh:
+            self.assertEqual(fh.read(), self.content)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(os.listdir(upload_dir()), [])
+
+    def test_finalize_rejects_incomplete_upload(self):
+        upload_id = self.start()
+        self.put_chunk(upload_id, 0, self.content[:100])
+
+        response = self.client.post(reverse('finalize_attachment_upload', args=[upload_id]))
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(TaskAttachment.objects.exists())
+        self.assertTrue(UploadSession.objects.filter(id=upload_id).exists())
+
+    def test_stale_offset_leaves_file_untouched(self):
+        upload_id = self.start()
+        self.put_chunk(upload_id, 0, self.content[:4000])
+        self.put_chunk(upload_id, 4000, self.content[4000:8000])
+
+        # Wiederholter erster Chunk darf den zweiten weder überschreiben noch abschneiden
+        self.assertEqual(self.put_chunk(upload_id, 0, b"x" * 100).status_code, 409)
+        with open(os.path.join(upload_dir(), f'{upload_id}.part'), 'rb') as fh:
+            self.assertEqual(fh.read(), self.content[:8000])
+
+    def test_finalize_rejects_damaged_part_file(self):
+        upload_id = self.start()
+        self.put_chunk(upload_id, 0, self.content)
+        with open(os.path.join(upload_dir(), f'{upload_id}.part'), 'r+b') as fh:
+            fh.truncate(100)
+
+        response = self.client.post(reverse('finalize_attachment_upload', args=[upload_id]))
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(TaskAttachment.objects.exists())
+
+    @skipIf(fcntl is None, "needs fcntl file locks")
+    def test_parallel_writer_is_rejected_immediately(self):
+        upload_id = self.start()
+        with open(os.path.join(upload_dir(), f'{upload_id}.part'), 'rb') as fh:
+            # Ein anderer Request schreibt gerade
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            response = self.put_chunk(upload_id, 0, self.content[:100])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 0)
+
+    def test_no_transaction_while_streaming_or_hashing(self):
+        base_depth = len(connection.atomic_blocks)
+        depths = []
+
+        class Stream(io.BytesIO):
+            def read(self, size=-1):
+                depths.append(len(connection.atomic_blocks))
+                return super().read(size)
+
+        session = start_upload(self.task, self.user, "design.psd", len(self.content))
+        write_chunk(session, 0, Stream(self.content), len(self.content))
+        with mock.patch('projectmanager.storage.hash_file', side_effect=lambda *args: depths.append(len(connection.atomic_blocks)) or hash_file(*args)):
+            attachment = finalize_upload(session)
+
+        self.assertTrue(depths)
+        self.assertEqual(set(depths), {base_depth})
+        with attachment.file.open('rb') as fh:
+            self.assertEqual(fh.read(), self.content)
+
+    def test_other_users_cannot_write_to_session(self):
+        upload_id = self.start()
+        other = User.objects.create_user(username="other")
+        self.client.force_login(other)
+        self.assertEqual(self.put_chunk(upload_id, 0, self.content[:10]).status_code, 404)
+
+
+class AttachmentDownloadTests(TestCase):
+    def setUp(self):
+        use_temp_media_root(self)
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+        self.project = make_project(self.user, 1)
+        self.content = b"0123456789" * 100
+        self.attachment = TaskAttachment.objects.create(
+            task=self.project.tasks.first(),
+            uploaded_by=self.user,
+            file=SimpleUploadedFile("notes.txt", self.content),
+        )
+        self.url = reverse('download_attachment', args=[self.attachment.id])
+
+    def test_full_download_streams_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn("notes.txt", response['Content-Disposition'])
+
+    def test_range_request_returns_partial_content(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(b"".join(response.streaming_content), self.content[10:20])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b"".join(response.streaming_content), self.content[-5:])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_conditional_request_returns_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_non_members_get_not_found(self):
+        self.client.force_login(User.objects.create_user(username="stranger"))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_missing_file_returns_not_found(self):
+        os.remove(self.attachment.file.path)
+        with self.assertLogs('projectmanager.downloads', 'WARNING'):
+            self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    @override_settings(FILE_DOWNLOAD_MODE='x-accel')
+    def test_x_accel_mode_hands_off_to_front_server(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.attachment.file.name)
+        self.assertEqual(response.content, b"")
+
+
+class AttachmentPreviewTests(TestCase):
+    def setUp(self):
+        use_temp_media_root(self)
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+        self.project = make_project(self.user, 1)
+        self.task = self.project.tasks.first()
+
+    def test_upload_schedules_preview_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.client.post(
+                reverse('add_task_attachment', args=[self.task.id]),
+                {'file': SimpleUploadedFile("readme.txt", b"hello")},
+            )
+        self.assertTrue(callbacks)
+        self.assertFalse(os.path.exists(blob_storage.path(self.task.attachments.get().file.name) + '.preview.txt'))
+
+    def test_text_preview_is_shown_and_cached(self):
+        attachment = TaskAttachment.objects.create(
+            task=self.task,
+            uploaded_by=self.user,
+            file=SimpleUploadedFile("minutes.md", b"# Kickoff\n\nAgreed on   the scope."),
+        )
+        generate_previews(attachment.file.storage, attachment.file.name, attachment.display_name)
+
+        response = self.client.get(reverse('task_detail', args=[self.task.id]))
+        self.assertContains(response, "# Kickoff Agreed on the scope.")
+
+        response = self.client.get(reverse('attachment_preview', args=[attachment.id, 'text']))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(
+            self.client.get(reverse('attachment_preview', args=[attachment.id, 'thumbnail'])).status_code, 404
+        )
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+        self.project = make_project(self.user, 0)
+        self.other = make_project(User.objects.create_user(username="stranger"), 0)
+
+    def make_task(self, project, title, description=""):
+        return Task.objects.create(project=project, title=title, description=description, deadline=date(2026, 6, 1))
+
+    def result_ids(self, query, kind='task'):
+        return [result.object_id for result in search(self.user, query) if result.kind == kind]
+
+    def test_prefix_search_ranks_title_matches_first(self):
+        in_description = self.make_task(self.project, "Slides", "finish the design review")
+        in_title = self.make_task(self.project, "Design review")
+
+        self.assertEqual(self.result_ids("design rev"), [in_title.id, in_description.id])
+        self.assertEqual(self.result_ids("desi"), [in_title.id, in_description.id])
+        self.assertEqual(self.result_ids("design slides"), [in_description.id])
+        self.assertEqual(self.result_ids("design budget"), [])
+
+    def test_prefix_uses_a_range_and_truncation_keeps_the_best_postings(self):
+        # Zuerst angelegt, landet also ohne Sortierung vorne
+        self.make_task(self.project, "Slides", "design notes")
+        in_title = self.make_task(self.project, "Design review")
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.result_ids("desi")
+        posting_sql = next(q['sql'] for q in ctx.captured_queries if 'projectmanager_searchposting' in q['sql'])
+        self.assertNotIn('LIKE', posting_sql.upper())
+
+        # Nur ein Posting erlaubt: das mit dem höheren Gewicht (Titel) bleibt
+        with mock.patch('projectmanager.search.MAX_POSTINGS_PER_TERM', 1):
+            self.assertEqual(self.result_ids("desi"), [in_title.id])
+
+    def test_results_are_limited_to_member_projects(self):
+        self.make_task(self.other, "Secret roadmap")
+        self.assertEqual(search(self.user, "roadmap"), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        task = self.make_task(self.project, "Budget draft")
+        task.title = "Final budget"
+        task.save()
+        self.assertEqual(self.result_ids("draft"), [])
+        self.assertEqual(self.result_ids("final"), [task.id])
+
+        # Statusänderungen berühren den Index nicht
+        with self.assertNumQueries(1):
+            task.status = 'DONE'
+            task.save(update_fields=['status'])
+
+        task.delete()
+        self.assertEqual(self.result_ids("budget"), [])
+
+    def test_comments_and_chat_messages_are_indexed(self):
+        task = self.make_task(self.project, "Poster")
+        self.client.post(reverse('add_task_comment', args=[task.id]), {'text': "Printer quote attached"})
+        buffer = MessageBuffer(max_size=10, flush_interval=60)
+        async_to_sync(buffer.add)(self.project.id, self.user.id, "printer is booked for friday")
+        buffer.flush_sync()
+
+        response = self.client.get(reverse('search'), {'q': 'printer', 'format': 'json'})
+        kinds = sorted(result['kind'] for result in response.json()['results'])
+        self.assertEqual(kinds, ['comment', 'message'])
+        comment_result = next(r for r in response.json()['results'] if r['kind'] == 'comment')
+        self.assertEqual(comment_result['url'], reverse('task_detail', args=[task.id]))
+        self.assertContains(self.client.get(reverse('search'), {'q': 'printer'}), "Printer quote attached")
+
+    def test_rebuild_indexes_existing_rows(self):
+        Message.objects.bulk_create([Message(project=self.project, sender=self.user, content="legacy kickoff notes")])
+        self.assertEqual(search(self.user, "kickoff"), [])
+        rebuild_index()
+        self.assertEqual([result.kind for result in search(self.user, "kickoff")], ['message'])
+
+    def test_chat_flush_only_indexes_new_messages(self):
+        Message.objects.bulk_create([
+            Message(project=self.project, sender=self.user, content=f"legacy kickoff {i}") for i in range(3)
+        ])
+        # Wie nach dem Deployment: Migration 0023 setzt den Startpunkt hinter die vorhandenen Nachrichten
+        SearchIndexState.objects.filter(kind='message').delete()
+        import_module('projectmanager.migrations.0023_search_index_state_message').create_message_state(django_apps, None)
+
+        buffer = MessageBuffer(max_size=10, flush_interval=60)
+        async_to_sync(buffer.add)(self.project.id, self.user.id, "kickoff moved to monday")
+        buffer.flush_sync()
+        self.assertEqual(len(search(self.user, "kickoff")), 1)
+
+        # Ein Rückstand wird pro Flush nur in einem Batch abgebaut
+        SearchDocument.objects.filter(kind='message').delete()
+        SearchIndexState.objects.filter(kind='message').update(last_id=0)
+        self.assertEqual(catch_up('message', batch_size=2, max_batches=1), 2)
+        self.assertEqual(catch_up('message', batch_size=2, max_batches=1), 2)
+        self.assertEqual(len(search(self.user, "kickoff")), 4)
+
+
+def failing_job(job):
+    raise RuntimeError("boom")
+
+
+def noop_job(job):
+    pass
+
+
+class FakePool:
+    """Ersatz für den Prozess-Pool: `crash` lässt laufende Jobs scheitern, `refuse` schon das submit()."""
+
+    def __init__(self, mode):
+        self.mode = mode
+
+    def submit(self, fn, *args):
+        if self.mode == 'refuse':
+            raise BrokenProcessPool("pool already broken")
+        future = Future()
+        if self.mode == 'crash':
+            future.set_exception(BrokenProcessPool("child process died"))
+        else:
+            future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+        self.project = make_project(self.user, 2)
+
+    def test_request_enqueues_and_returns_immediately(self):
+        url = reverse('request_ai_suggestion', args=[self.project.id])
+        response = self.client.post(url, {'type': 'SUMMARY'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(AISuggestion.objects.count(), 0)
+
+        # Gleicher Typ, noch offen: kein zweiter Job
+        again = self.client.post(url, json.dumps({'type': 'SUMMARY'}), content_type='application/json')
+        self.assertEqual(again.json()['job_id'], response.json()['job_id'])
+        self.assertEqual(self.client.post(url, {'type': 'NONSENSE'}).status_code, 400)
+
+        self.assertEqual(run_pending(), 1)
+        suggestion = AISuggestion.objects.get()
+        self.assertEqual(suggestion.suggestion_type, 'SUMMARY')
+        self.assertIn("10 tasks", suggestion.content)
+
+        listing = self.client.get(reverse('ai_suggestion_list', args=[self.project.id])).json()
+        self.assertEqual([s['id'] for s in listing['suggestions']], [suggestion.id])
+        self.assertEqual(listing['pending'], [])
+
+        # Nach dem Abschluss darf wieder ein Job angelegt werden, unveränderter Inhalt erzeugt keine neue Zeile
+        self.assertNotEqual(self.client.post(url, {'type': 'SUMMARY'}).json()['job_id'], response.json()['job_id'])
+        run_pending()
+        self.assertEqual(AISuggestion.objects.count(), 1)
+
+    def test_non_members_cannot_enqueue(self):
+        self.client.force_login(User.objects.create_user(username="stranger"))
+        response = self.client.post(reverse('request_ai_suggestion', args=[self.project.id]), {'type': 'TASK'})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Job.objects.exists())
+
+    def test_higher_priority_runs_first_and_dedup_raises_priority(self):
+        summary = enqueue_suggestion(self.project, 'SUMMARY')
+        deadline = enqueue_suggestion(self.project, 'DEADLINE', priority=5)
+        task = enqueue_suggestion(self.project, 'TASK')
+        self.assertEqual(enqueue_suggestion(self.project, 'SUMMARY', priority=10).id, summary.id)
+
+        order = []
+        with mock.patch('projectmanager.suggestions.GENERATORS', {
+            kind: (lambda project, kind=kind: order.append(kind) or '') for kind in ['SUMMARY', 'DEADLINE', 'TASK']
+        }):
+            run_pending()
+        self.assertEqual(order, ['SUMMARY', 'DEADLINE', 'TASK'])
+        self.assertEqual(set(Job.objects.values_list('status', flat=True)), {'DONE'})
+        self.assertFalse(Job.objects.exclude(active_key=None).exists())
+        self.assertEqual({summary.id, deadline.id, task.id}, set(Job.objects.values_list('id', flat=True)))
+
+    @mock.patch.dict(JOB_HANDLERS, {'failing': 'projectmanager.tests.failing_job'})
+    def test_failed_jobs_are_retried_with_backoff(self):
+        job = enqueue('failing', max_attempts=2)
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('PENDING', 1))
+        self.assertIn("boom", job.last_error)
+        # Noch nicht fällig
+        self.assertEqual(run_pending(), 0)
+
+        Job.objects.filter(id=job.id).update(run_after=job.created_at)
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('FAILED', 2))
+        self.assertIsNone(job.active_key)
+
+    @mock.patch.dict(JOB_HANDLERS, {'noop': 'projectmanager.tests.noop_job'})
+    def test_late_result_does_not_overwrite_a_new_claim(self):
+        job = enqueue('noop')
+        claim_jobs('old-worker', 1)
+        # Der alte Worker hängt, der Job wird freigegeben und neu vergeben
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale_jobs(timeout=60), 1)
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        claim_jobs('new-worker', 1)
+
+        self.assertIsNone(_finish(job.id, None, 'old-worker', 1))
+        self.assertEqual(requeue_stale_jobs(timeout=60), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.attempts), ('RUNNING', 'new-worker', 2))
+
+    @mock.patch.dict(JOB_HANDLERS, {'noop': 'projectmanager.tests.noop_job'})
+    @mock.patch('projectmanager.jobs.RETRY_BASE_DELAY', 0)
+    @mock.patch('projectmanager.jobs.signal.signal')
+    # Würde die Verbindung samt Test-Transaktion schließen
+    @mock.patch('projectmanager.jobs.connections.close_all')
+    def test_broken_pool_is_replaced(self, _close_all, _signal):
+        jobs = [enqueue('noop'), enqueue('noop')]
+        pools = [FakePool('crash'), FakePool('refuse'), FakePool('inline')]
+        worker = Worker(workers=2, poll_interval=0, burst=True)
+        with mock.patch.object(worker, '_start_pool', side_effect=pools) as start_pool:
+            worker.run()
+
+        self.assertEqual(start_pool.call_count, 3)
+        for job in jobs:
+            job.refresh_from_db()
+            # Ein Versuch im abgestürzten Pool, der abgelehnte submit() zählt nicht
+            self.assertEqual((job.status, job.attempts, job.locked_by), ('DONE', 2, ''))
+
+
+class DeadlineRiskTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.project = make_project(self.user, 0)
+        self.today = date.today()
+
+    def make_task(self, title, days, **fields):
+        return Task.objects.create(project=self.project, title=title, deadline=self.today + timedelta(days=days), **fields)
+
+    def scores(self):
+        result = score_open_tasks()
+        return dict(zip(result.task_ids.tolist(), result.scores.tolist()))
+
+    def test_scores_follow_deadline_status_and_load(self):
+        overdue = self.make_task("Overdue", -1, assigned_to=self.user)
+        tomorrow = self.make_task("Tomorrow", 1, assigned_to=self.user)
+        later = self.make_task("Later", 60, assigned_to=self.user)
+        started = self.make_task("Started", 1, assigned_to=self.user, status='IN_PROGRESS')
+        self.make_task("Finished", -5, status='DONE')
+
+        scores = self.scores()
+        self.assertEqual(set(scores), {overdue.id, tomorrow.id, later.id, started.id})
+        self.assertEqual(scores[overdue.id], 1.0)
+        self.assertGreater(scores[tomorrow.id], scores[started.id])
+        self.assertLess(scores[later.id], 0.1)
+
+        # Mehr offene Tasks beim Bearbeiter erhöhen das Risiko
+        for i in range(4):
+            self.make_task(f"More {i}", 60, assigned_to=self.user)
+        self.assertGreater(self.scores()[tomorrow.id], scores[tomorrow.id])
+
+    def test_history_from_activity_log_sets_expected_duration(self):
+        task = self.make_task("Poster", 5, assigned_to=self.user)
+        baseline = self.scores()[task.id]
+
+        # Bisher dauerten Tasks in diesem Projekt etwa 20 Tage
+        now = timezone.now()
+        for i in range(10):
+            created = Update.objects.create(project=self.project, event_type='TASK_CREATED', payload={'task': 1000 + i})
+            done = Update.objects.create(project=self.project, event_type='TASK_STATUS', payload={'task': 1000 + i, 'to': 'DONE'})
+            Update.objects.filter(id=created.id).update(created_at=now - timedelta(days=30))
+            Update.objects.filter(id=done.id).update(created_at=now - timedelta(days=10))
+        self.assertGreater(self.scores()[task.id], baseline)
+
+    def test_suggestions_only_for_meaningful_changes(self):
+        task = self.make_task("Report", 30, assigned_to=self.user)
+        self.make_task("Slides", 60, assigned_to=self.user)
+
+        self.assertEqual(update_deadline_risks(), (2, 0, 0))
+        self.assertFalse(AISuggestion.objects.exists())
+
+        Task.objects.filter(id=task.id).update(deadline=self.today)
+        self.assertEqual(update_deadline_risks(), (2, 1, 1))
+        suggestion = AISuggestion.objects.get()
+        self.assertEqual(suggestion.suggestion_type, 'DEADLINE')
+        self.assertIn("'Report'", suggestion.content)
+        self.assertNotIn("'Slides'", suggestion.content)
+
+        # Unverändert: nichts Neues
+        self.assertEqual(update_deadline_risks(), (2, 0, 0))
+
+        Task.objects.filter(id=task.id).update(status='DONE')
+        update_deadline_risks()
+        self.assertFalse(TaskRiskScore.objects.exists())
+
+    def test_query_count_does_not_grow_with_tasks(self):
+        Task.objects.bulk_create([
+            Task(project=self.project, title=f"Task {i}", deadline=self.today + timedelta(days=i % 10))
+            for i in range(200)
+        ])
+        # Tasks, Historie, gespeicherte Scores, Aufräumen, Löschen, Schreiben, Savepoint, Titel
+        with CaptureQueriesContext(connection) as queries:
+            update_deadline_risks()
+        self.assertLessEqual(len(queries), 10)
+
+
+class SnapshotAnalyticsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+        self.project = make_project(self.user, 0)
+        self.milestone = Milestone.objects.create(project=self.project, title="Beta")
+        self.today = timezone.localdate()
+
+    def create_task(self, title, milestone=None):
+        self.client.post(reverse('create_task', args=[self.project.id]), {
+            'title': title, 'deadline': '2026-06-01', 'status': 'TODO', 'priority': 'MEDIUM',
+            'assigned_to': self.user.id, 'milestone': milestone.id if milestone else '',
+        })
+        return Task.objects.get(title=title)
+
+    def move(self, task, old, new):
+        self.client.post(
+            reverse('update_task_status_ajax', args=[task.id]),
+            json.dumps({'status': new, 'from': old}), content_type='application/json',
+        )
+
+    def snapshot(self):
+        return ProjectSnapshot.objects.values('todo', 'in_progress', 'done', 'completed').get(project=self.project, date=self.today)
+
+    def test_transitions_update_todays_rows_incrementally(self):
+        first = self.create_task("First", self.milestone)
+        second = self.create_task("Second")
+        self.move(first, 'TODO', 'IN_PROGRESS')
+        self.move(first, 'IN_PROGRESS', 'DONE')
+        self.client.post(
+            reverse('bulk_update_tasks', args=[self.project.id]),
+            json.dumps({'task_ids': [second.id], 'changes': {'milestone': self.milestone.id}}),
+            content_type='application/json',
+        )
+        self.assertEqual(self.snapshot(), {'todo': 1, 'in_progress': 0, 'done': 1, 'completed': 1})
+        self.assertEqual(
+            MilestoneSnapshot.objects.values('done', 'total').get(milestone=self.milestone, date=self.today),
+            {'done': 1, 'total': 2},
+        )
+
+        self.client.post(reverse('delete_task', args=[second.id]))
+        self.assertEqual(self.snapshot(), {'todo': 0, 'in_progress': 0, 'done': 1, 'completed': 1})
+
+        # Nur die Zeile von heute, ohne die Tasks neu zu zählen
+        with self.assertNumQueries(2):
+            record_task_changes(self.project.id, [(('DONE', None), ('TODO', None))])
+
+    def test_backfill_replays_activity_log(self):
+        first = self.create_task("First", self.milestone)
+        second = self.create_task("Second")
+        self.move(first, 'TODO', 'DONE')
+        self.move(second, 'TODO', 'IN_PROGRESS')
+        self.client.post(reverse('add_task_to_milestone', args=[self.milestone.id, second.id]))
+
+        # Einträge auf drei Tage verteilen: erstellt vor 3 Tagen, First erledigt vor 2 Tagen
+        updates = Update.objects.filter(project=self.project).order_by('id')
+        for update, days_ago in zip(updates, [3, 3, 2, 1, 1]):
+            Update.objects.filter(id=update.id).update(created_at=timezone.now() - timedelta(days=days_ago))
+        ProjectSnapshot.objects.all().delete()
+        MilestoneSnapshot.objects.all().delete()
+
+        backfill_project(self.project.id)
+
+        response = self.client.get(reverse('api_project_analytics', args=[self.project.id]), {
+            'start': str(self.today - timedelta(days=4)), 'end': str(self.today), 'milestone': self.milestone.id,
+        })
+        data = response.json()
+        self.assertEqual([day['remaining'] for day in data['burndown']], [0, 2, 1, 1, 1])
+        self.assertEqual([day['in_progress'] for day in data['burndown']], [0, 0, 0, 1, 1])
+        self.assertEqual([day['completed'] for day in data['velocity']['daily']], [0, 0, 1, 0, 0])
+        self.assertEqual(sum(week['completed'] for week in data['velocity']['weekly']), 1)
+        self.assertEqual([day['total'] for day in data['milestone']['burndown']], [0, 1, 1, 2, 2])
+
+    def test_backfill_replays_bulk_edits_and_milestone_moves(self):
+        gamma = Milestone.objects.create(project=self.project, title="Gamma")
+        first = self.create_task("First", self.milestone)
+        second = self.create_task("Second")
+        self.client.post(
+            reverse('bulk_update_tasks', args=[self.project.id]),
+            json.dumps({'task_ids': [first.id, second.id], 'changes': {'status': 'DONE', 'milestone': self.milestone.id}}),
+            content_type='application/json',
+        )
+        # Umhängen von einem Milestone auf einen anderen
+        self.client.post(reverse('add_task_to_milestone', args=[gamma.id, first.id]))
+
+        # Erstellt vor 2 Tagen, Bulk-Edit gestern, Umhängen heute
+        updates = Update.objects.filter(project=self.project).order_by('id')
+        for update, days_ago in zip(updates, [2, 2, 1, 0]):
+            Update.objects.filter(id=update.id).update(created_at=timezone.now() - timedelta(days=days_ago))
+        ProjectSnapshot.objects.all().delete()
+        MilestoneSnapshot.objects.all().delete()
+
+        backfill_project(self.project.id)
+
+        start = self.today - timedelta(days=3)
+        series = project_series(self.project.id, start, self.today)
+        self.assertEqual([day['done'] for day in series['burndown']], [0, 0, 2, 2])
+        self.assertEqual([day['todo'] for day in series['burndown']], [0, 2, 0, 0])
+        self.assertEqual([day['completed'] for day in series['velocity']['daily']], [0, 0, 2, 0])
+        self.assertEqual([day['total'] for day in milestone_series(self.milestone.id, start, self.today)], [0, 1, 2, 1])
+        self.assertEqual([day['total'] for day in milestone_series(gamma.id, start, self.today)], [0, 0, 0, 1])
+
+    def test_series_cost_does_not_depend_on_range(self):
+        self.create_task("First")
+        url = reverse('api_project_analytics', args=[self.project.id])
+        with CaptureQueriesContext(connection) as short:
+            self.client.get(url, {'start': str(self.today - timedelta(days=7))})
+        with CaptureQueriesContext(connection) as long:
+            response = self.client.get(url, {'start': str(self.today - timedelta(days=700))})
+        self.assertEqual(len(short.captured_queries), len(long.captured_queries))
+        self.assertEqual(len(response.json()['burndown']), 701)
+        self.assertEqual(response.json()['burndown'][-1]['todo'], 1)
+
+        self.assertEqual(self.client.get(url, {'start': 'yesterday'}).status_code, 400)
+        self.client.force_login(User.objects.create_user(username="stranger"))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+QUERY_BUDGET_FILE = os.path.join(os.path.dirname(__file__), 'query_budgets.json')
+# SQL-Zeit schwankt je nach Rechner/DB: Budget mit Spielraum, nie unter dem Minimum
+SQL_TIME_FLOOR_MS = 50
+SQL_TIME_HEADROOM = 5
+
+
+def budget_request(method='GET', data=None, query='', prepare=None):
+    """data: dict (Formular), str (JSON), bytes (roh) oder callable(values)."""
+    return method, data, query, prepare
+
+
+def with_upload(received):
+    # Frische 8-Byte-Session, damit PUT/Finalize bei jeder Messung gleich ablaufen
+    def prepare(testcase, values):
+        session = start_upload(Task.objects.get(id=values['task_id']), testcase.user, "budget.bin", 8)
+        write_chunk(session, 0, io.BytesIO(b"x" * received), received)
+        return {**values, 'upload_id': session.id}
+    return prepare
+
+
+# Anfragen je Route aus urls.py; nicht aufgeführte Routen werden mit GET gemessen
+BUDGET_REQUESTS = {
+    'projects/new/': [
+        budget_request(),
+        budget_request('POST', {'title': "Budget", 'goal': "Budget", 'start_date': '2026-01-01', 'end_date': '2026-12-31'}),
+    ],
+    'projects/<int:project_id>/tasks/new/': [
+        budget_request(),
+        budget_request('POST', {'title': "Budget", 'deadline': '2026-06-01', 'status': 'TODO', 'priority': 'MEDIUM'}),
+    ],
+    'task/<int:task_id>/status/': [budget_request('POST', {'status': 'IN_PROGRESS', 'from': 'TODO'})],
+    'tasks/<int:task_id>/update-status/': [budget_request('POST', {'status': 'IN_PROGRESS', 'from': 'TODO'})],
+    'tasks/<int:task_id>/update_status/': [budget_request('POST', json.dumps({'status': 'IN_PROGRESS', 'from': 'TODO'}))],
+    # GET von add-member/add_attachment rendert nicht vorhandene Templates (UI nutzt Modals)
+    'projects/<int:project_id>/add-member/': [budget_request('POST', {'email': "new@example.com"})],
+    'projects/<int:project_id>/change_role/<int:user_id>/': [budget_request('POST', {'role': 'VIEWER'})],
+    # Löschsignale laufen je Kommentar/Anhang der gelöschten Task, das ist deren eigene
+    # Größe und nicht die des Datenbestands: Task mit fester Form in beiden Fixtures
+    'tasks/<int:task_id>/delete/': [budget_request('POST', prepare=lambda testcase, values: {**values, 'task_id': values['plain_task_id']})],
+    'tasks/<int:task_id>/add_comment/': [budget_request('POST', {'text': "Budget"})],
+    'tasks/<int:task_id>/add_attachment/': [
+        budget_request('POST', lambda values: {'file': SimpleUploadedFile("budget.txt", b"budget")}),
+    ],
+    'tasks/<int:task_id>/uploads/': [budget_request('POST', json.dumps({'filename': "budget.bin", 'size': 8}))],
+    'uploads/<uuid:upload_id>/': [
+        budget_request(prepare=with_upload(4)),
+        budget_request('PUT', b"yyyy", query='offset=4', prepare=with_upload(4)),
+    ],
+    'uploads/<uuid:upload_id>/finalize/': [budget_request('POST', prepare=with_upload(8))],
+    'attachments/<int:attachment_id>/delete/': [budget_request('POST')],
+    'projects/<int:project_id>/tasks/bulk/': [
+        budget_request('POST', lambda values: json.dumps({'task_ids': values['task_ids'], 'changes': {'status': 'DONE'}})),
+    ],
+    'tasks/<int:task_id>/update_priority/': [budget_request('POST', {'priority': 'HIGH'})],
+    'projects/<int:project_id>/milestones/create/': [budget_request('POST', {'title': "Budget", 'deadline': '2026-06-01'})],
+    'milestone/<int:milestone_id>/add_task/<int:task_id>/': [budget_request('POST')],
+    'projects/<int:project_id>/update/': [budget_request('POST', {'goal': "Budget"})],
+    'search/': [budget_request(query='q=task'), budget_request(query='q=task&format=json')],
+    'projects/<int:project_id>/suggestions/request/': [budget_request('POST', {'type': 'SUMMARY'})],
+}
+
+
+class RouteRequestsMixin:
+    """Datenbestand und Anfragen für jede Route in urls.py (Query-Budgets und Query-Pläne)."""
+
+    def setUp(self):
+        use_temp_media_root(self)
+        self.user = User.objects.create_user(username="owner", email="owner@example.com")
+        self.client.force_login(self.user)
+
+    def build_fixture(self, size):
+        """Projekt der Größe `size` samt allem, was die Routen brauchen; gibt die URL-Parameter zurück."""
+        project = make_project(self.user, size)
+        # Weitere Projekte des Users für Projektliste und Suche
+        for _ in range(size - 1):
+            make_project(self.user, 1)
+        member = project.memberships.exclude(user=self.user).first().user
+        task = project.tasks.filter(assigned_to=self.user, status='TODO').first()
+
+        for i in range(size):
+            TaskComment.objects.create(task=task, user=member, text=f"comment {i}")
+            TaskAttachment.objects.create(
+                task=task, uploaded_by=self.user, file=SimpleUploadedFile(f"notes{i}.txt", f"notes {project.id} {i}".encode()),
+            )
+            AISuggestion.objects.create(project=project, suggestion_type='SUMMARY', content=f"summary {i}")
+        # Über dem Dropdown-Limit kommt genau ein COUNT dazu, daher in beiden Größen darüber
+        for i in range(PENDING_INVITATIONS_LIMIT + size):
+            other = Project.objects.create(title=f"Invite {project.id} {i}", goal="Test", start_date=date(2026, 1, 1), end_date=date(2026, 12, 31))
+            ProjectInvitation.objects.create(project=other, email=self.user.email, invited_by=member)
+        plain_task = project.tasks.filter(assigned_to=self.user).exclude(id=task.id).first()
+        TaskComment.objects.create(task=plain_task, user=member, text="comment")
+        TaskAttachment.objects.create(task=plain_task, uploaded_by=self.user, file=SimpleUploadedFile("plain.txt", b"plain"))
+
+        attachment = task.attachments.first()
+        generate_previews(attachment.file.storage, attachment.file.name, attachment.display_name)
+        document = Document.objects.create(project=project, title="Spec", file=SimpleUploadedFile("spec.txt", f"spec {project.id}".encode()))
+        rebuild_index()
+
+        return {
+            'project_id': project.id,
+            'task_id': task.id,
+            'plain_task_id': plain_task.id,
+            'task_ids': list(project.tasks.values_list('id', flat=True)),
+            'milestone_id': project.milestones.first().id,
+            'user_id': member.id,
+            'attachment_id': attachment.id,
+            'document_id': document.id,
+            'invitation_id': ProjectInvitation.objects.filter(email=self.user.email).first().id,
+            'kind': 'text',
+        }
+
+    def route_requests(self):
+        for pattern in urls.urlpatterns:
+            route = str(pattern.pattern)
+            for request in BUDGET_REQUESTS.get(route, [budget_request()]):
+                yield route, request
+
+    def run_request(self, route, request, values):
+        """Führt die Anfrage aus und gibt (Methode und URL, Response, Queries) zurück."""
+        method, data, query, prepare = request
+        cache.clear()
+        # Jede Anfrage in einem Savepoint, damit auch Löschungen den Bestand nicht verändern
+        with transaction.atomic():
+            if prepare:
+                values = prepare(self, values)
+            url = '/' + re.sub(r'<(?:\w+:)?(\w+)>', lambda m: str(values[m.group(1)]), route)
+            if query:
+                url += '?' + query
+            if callable(data):
+                data = data(values)
+            kwargs = {}
+            if isinstance(data, str):
+                kwargs['content_type'] = 'application/json'
+            elif isinstance(data, bytes):
+                kwargs['content_type'] = 'application/octet-stream'
+
+            with CaptureQueriesContext(connection) as ctx:
+                response = getattr(self.client, method.lower())(url, data, **kwargs)
+            # Downloads zu Ende lesen, damit die Datei geschlossen wird. response.close() würde
+            # request_finished senden und damit die DB-Verbindung samt Test-Transaktion schließen
+            if response.streaming:
+                b"".join(response.streaming_content)
+            transaction.set_rollback(True)
+
+        self.assertLess(response.status_code, 400, f"{method} {url}")
+        return f"{method} {url}", response, ctx.captured_queries
+
+
+class QueryBudgetTests(RouteRequestsMixin, TestCase):
+    """
+    Misst Queries und SQL-Zeit für jede Route in urls.py mit einem kleinen und
+    einem großen Datenbestand. Fehlschlag, wenn die Anzahl mit den Daten wächst
+    oder vom Budget in query_budgets.json abweicht.
+
+    Nach gewollten Änderungen das Budget neu schreiben und den Diff reviewen:
+    QUERY_BUDGETS_UPDATE=1 python manage.py test projectmanager.tests.QueryBudgetTests
+    """
+
+    def measure_all(self, values):
+        results = {}
+        for route, request in self.route_requests():
+            _, _, queries = self.run_request(route, request, values)
+            results[f"{request[0]} /{route}"] = {
+                'queries': len(queries),
+                'sql_ms': sum(float(query['time']) for query in queries) * 1000,
+            }
+        return results
+
+    def updated_budgets(self, budgets, measured):
+        updated = {}
+        for key, result in measured.items():
+            sql_ms = budgets.get(key, {}).get('sql_ms')
+            # Zeitbudget nur anheben, sonst entstehen bei jedem Lauf Diffs
+            if sql_ms is None or result['sql_ms'] > sql_ms:
+                sql_ms = max(SQL_TIME_FLOOR_MS, math.ceil(result['sql_ms'] * SQL_TIME_HEADROOM))
+            updated[key] = {'queries': result['queries'], 'sql_ms': sql_ms}
+        return updated
+
+    def test_views_stay_within_query_budget(self):
+        small_values = self.build_fixture(1)
+        # Erster Durchlauf wärmt prozessweite Caches (z.B. ContentTypes) auf
+        self.measure_all(small_values)
+        small = self.measure_all(small_values)
+        large = self.measure_all(self.build_fixture(10))
+
+        budgets = {}
+        if os.path.exists(QUERY_BUDGET_FILE):
+            with open(QUERY_BUDGET_FILE) as fh:
+                budgets = json.load(fh)
+        if os.environ.get('QUERY_BUDGETS_UPDATE'):
+            budgets = self.updated_budgets(budgets, large)
+            with open(QUERY_BUDGET_FILE, 'w') as fh:
+                json.dump(budgets, fh, indent=2, sort_keys=True)
+                fh.write('\n')
+
+        problems = []
+        for key, result in large.items():
+            budget = budgets.get(key)
+            if small[key]['queries'] != result['queries']:
+                problems.append(f"{key}: {small[key]['queries']} queries with the small fixture, {result['queries']} with the large one")
+            if budget is None:
+                problems.append(f"{key}: no budget")
+            elif result['queries'] != budget['queries']:
+                problems.append(f"{key}: {result['queries']} queries, budget is {budget['queries']}")
+            elif result['sql_ms'] > budget['sql_ms']:
+                problems.append(f"{key}: {result['sql_ms']:.1f} ms SQL time, budget is {budget['sql_ms']} ms")
+        for key in sorted(set(budgets) - set(large)):
+            problems.append(f"{key}: budget for a route that no longer exists")
+
+        if problems:
+            self.fail("\n".join(problems + [
+                "Update query_budgets.json with QUERY_BUDGETS_UPDATE=1 if the change is intended.",
+            ]))
+
+
+class QueryPlanTests(RouteRequestsMixin, TestCase):
+    # Weitere Filter/Sortierungen, die eigene Query-Pläne ergeben
+    EXTRA_QUERIES = {
+        'projects/<int:project_id>/': ['status=DONE', 'priority=HIGH', 'sort=deadline', 'assigned={user_id}'],
+    }
+
+    def test_views_use_indexes(self):
+        values = self.build_fixture(3)
+        requests = list(self.route_requests()) + [
+            (route, budget_request(query=query.format(**values)))
+            for route, queries in self.EXTRA_QUERIES.items()
+            for query in queries
+        ]
+
+        problems = []
+        for route, request in requests:
+            label, _, queries = self.run_request(route, request, values)
+            for query in queries:
+                if query['sql'].startswith('SELECT'):
+                    problems.extend(f"{label}: {step}\n    {query['sql']}" for step in full_table_scans(query['sql']))
+        self.assertFalse(problems, "\n".join(problems))
+
+
+class BenchmarkHarnessTests(TransactionTestCase):
+    # Die Lastgeneratoren laufen in eigenen Threads mit eigenen DB-Verbindungen
+
+    def setUp(self):
+        self.totals = generate(Scale(projects=3, members=3, milestones=2, tasks=10, messages=5, updates=4, comments=0.5, users=6), seed=1)
+
+    def test_generate_creates_requested_scale(self):
+        self.assertEqual(self.totals['projects'], 3)
+        self.assertEqual(self.totals['tasks'], 30)
+        self.assertEqual(Task.objects.count(), 30)
+        self.assertEqual(ProjectMembership.objects.count(), 9)
+        self.assertEqual(Milestone.objects.count(), 6)
+        self.assertEqual(Message.objects.count(), 15)
+        for task in Task.objects.select_related('milestone'):
+            self.assertIn(task.assigned_to_id, {m.user_id for m in task.project.memberships.all()})
+            if task.milestone:
+                self.assertEqual(task.milestone.project_id, task.project_id)
+
+    def test_percentiles(self):
+        self.assertEqual(percentile([], 95), 0.0)
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+        stats = LatencyStats()
+        stats.start()
+        for ms in range(1, 101):
+            stats.add('view', ms / 1000)
+        stats.add('view', 0.5, ok=False)
+        stats.stop()
+        summary = stats.summary()
+        self.assertEqual(summary['view']['count'], 101)
+        self.assertEqual(summary['view']['errors'], 1)
+        self.assertEqual(summary['view']['p50_ms'], 51)
+
+    def run_scenarios(self, concurrency):
+        virtual_users = load_virtual_users(3)
+        self.assertTrue(virtual_users)
+        summary = run_http(virtual_users, concurrency=concurrency, requests=40, warmup=1).summary()
+        self.assertEqual(summary['total']['count'], 40)
+        self.assertEqual(summary['total']['errors'], 0)
+
+    def test_http_scenarios_run_without_errors(self):
+        self.run_scenarios(concurrency=1)
+
+    def test_duration_mode_runs_until_the_deadline(self):
+        # Wie `bench_run --duration`: keine feste Anzahl, die Threads dürfen nicht vor der Deadline starten
+        stats = run_http(load_virtual_users(3), concurrency=1, requests=None, duration=0.2, warmup=0)
+        summary = stats.summary()
+        self.assertGreater(summary['total']['count'], 0)
+        self.assertEqual(summary['total']['errors'], 0)
+
+    def test_http_scenarios_run_concurrently(self):
+        # Alle Szenarien inkl. update_task_status parallel, also mit gleichzeitigen Schreibzugriffen
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest(
+                "in-memory SQLite (shared cache) locks whole tables, concurrent writers fail with "
+                "'database table is locked'; set DATABASES['default']['TEST']['NAME'] to a file to run this"
+            )
+        self.run_scenarios(concurrency=2)
+
+    def test_chat_round_trip_and_fanout(self):
+        rooms = [(project.id, list(project.members.all())) for project in benchmark_projects().prefetch_related('members')[:1]]
+        summary = run_chat(rooms, clients=2, messages=2, interval=0).summary()
+        self.assertEqual(summary['ws_connect']['count'], 2)
+        self.assertEqual(summary['chat_round_trip']['count'], 4)
+        self.assertEqual(summary['chat_fanout']['count'], 4)
+        self.assertEqual(summary['total']['errors'], 0)
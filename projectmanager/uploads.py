@@ -0,0 +1,189 @@
+"""
+Chunk-Uploads für Task-Anhänge.
+
+1. start_upload legt eine UploadSession und eine leere .part-Datei an
+2. write_chunk schreibt einen Chunk ab `offset` direkt aus dem Request-Stream
+3. finalize_upload legt die fertige Datei ab und hängt sie in einer kurzen
+   Transaktion an den Task
+
+Der Client kann jederzeit den aktuellen Offset abfragen und dort weitermachen.
+Während ein Request die .part-Datei schreibt, hält er eine Dateisperre; ein
+paralleler PUT oder Finalize wird sofort abgewiesen. Eine DB-Sperre oder
+Transaktion bleibt dabei nie über die Dauer der Übertragung offen.
+"""
+import os
+from contextlib import contextmanager
+from datetime import timedelta
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: ohne Dateisperre, das bedingte UPDATE erkennt Konflikte trotzdem
+    fcntl = None
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import TaskAttachment, UploadSession
+
+# Lesepuffer beim Schreiben eines Chunks
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    pass
+
+
+class PartFile(File):
+    """Fertige .part-Datei; blob_storage verschiebt sie, statt sie zu kopieren."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def upload_dir():
+    return getattr(settings, 'CHUNKED_UPLOAD_DIR', '') or os.path.join(settings.MEDIA_ROOT, 'uploads')
+
+
+def part_path(session):
+    return os.path.join(upload_dir(), f'{session.pk}.part')
+
+
+@contextmanager
+def locked_part_file(session, mode):
+    """Öffnet die .part-Datei exklusiv; ein zweiter Request wartet nicht, sondern bekommt UploadError."""
+    try:
+        fh = open(part_path(session), mode)
+    except FileNotFoundError:
+        raise UploadError("Upload file not found")
+    with fh:
+        if fcntl is not None:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadError("Another request is writing this upload")
+        yield fh
+
+
+def start_upload(task, user, filename, size):
+    max_size = getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 2 * 1024 ** 3)
+    if size < 0 or size > max_size:
+        raise UploadError(f"File size must be between 0 and {max_size} bytes")
+
+    session = UploadSession.objects.create(
+        task=task,
+        user=user,
+        filename=os.path.basename(filename)[:255],
+        size=size,
+    )
+    os.makedirs(upload_dir(), exist_ok=True)
+    open(part_path(session), 'wb').close()
+    return session
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    Schreibt `length` Bytes aus `stream` ab `offset` in die .part-Datei und
+    setzt den Offset der Session. Gibt den neuen Offset zurück.
+
+    Geprüft wird unter der Dateisperre: ein wiederholter PUT mit veraltetem
+    Offset wird abgewiesen, bevor er die Datei anfasst. Der Offset wird per
+    bedingtem UPDATE weitergesetzt, 0 Zeilen heißt Konflikt.
+    """
+    with locked_part_file(session, 'r+b') as out:
+        received, size = UploadSession.objects.filter(pk=session.pk).values_list('received', 'size').get()
+        if offset != received:
+            raise UploadError("Offset does not match")
+        if offset + length > size:
+            raise UploadError("Chunk exceeds declared file size")
+
+        out.seek(offset)
+        remaining = length
+        while remaining:
+            data = stream.read(min(COPY_BUFFER_SIZE, remaining))
+            if not data:
+                break
+            out.write(data)
+            remaining -= len(data)
+        # Reste eines abgebrochenen Versuchs abschneiden
+        out.truncate()
+
+        if remaining:
+            # Offset bleibt stehen, der Client wiederholt den Chunk
+            raise UploadError("Chunk incomplete")
+
+        updated = UploadSession.objects.filter(pk=session.pk, received=offset).update(
+            received=offset + length, updated_at=timezone.now()
+        )
+        if not updated:
+            raise UploadError("Offset does not match")
+    session.received = offset + length
+    return session.received
+
+
+def finalize_upload(session):
+    """
+    Erzeugt den TaskAttachment; bei Fehlern bleibt die Session erhalten.
+    Hashen und Ablegen der Datei laufen vor der Transaktion, die nur die Zeilen ändert.
+    """
+    with locked_part_file(session, 'rb') as fh:
+        session = UploadSession.objects.get(pk=session.pk)
+        if session.received != session.size:
+            raise UploadError("Upload incomplete")
+        # Zähler und Datei müssen übereinstimmen, sonst würde eine beschädigte Datei angehängt
+        if os.fstat(fh.fileno()).st_size != session.size:
+            raise UploadError("Uploaded file does not match the declared size")
+
+        attachment = TaskAttachment(
+            task_id=session.task_id,
+            uploaded_by_id=session.user_id,
+            original_name=session.filename,
+        )
+        attachment.file.save(session.filename, PartFile(fh), save=False)
+
+    try:
+        with transaction.atomic():
+            # Sperrt die Zeile nur für die beiden Schreibzugriffe, z.B. gegen ein paralleles abort_upload
+            if not UploadSession.objects.select_for_update().filter(pk=session.pk).exists():
+                raise UploadError("Upload was aborted")
+            attachment.save()
+            session.delete()
+    except BaseException:
+        # Referenz auf den schon abgelegten Blob freigeben, die Datei räumt der GC weg
+        attachment.file.storage.delete(attachment.file.name)
+        raise
+    return attachment
+
+
+def abort_upload(session):
+    session.delete()
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def purge_stale_uploads(hours=None):
+    """Entfernt abgebrochene Uploads und verwaiste .part-Dateien. Gibt die Anzahl zurück."""
+    hours = hours if hours is not None else getattr(settings, 'CHUNKED_UPLOAD_EXPIRY_HOURS', 24)
+    cutoff = timezone.now() - timedelta(hours=hours)
+
+    removed = 0
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff):
+        abort_upload(session)
+        removed += 1
+
+    # .part-Dateien, deren Session z.B. mit dem Task gelöscht wurde
+    directory = upload_dir()
+    if os.path.isdir(directory):
+        active = {str(pk) for pk in UploadSession.objects.values_list('pk', flat=True)}
+        for filename in os.listdir(directory):
+            path = os.path.join(directory, filename)
+            upload_id = filename.removesuffix('.part')
+            if upload_id in active or os.path.getmtime(path) >= cutoff.timestamp():
+                continue
+            os.remove(path)
+            removed += 1
+    return removed
@@ -1,7 +1,5 @@
 from django.urls import path
-from . import views
-from django.conf import settings
-from django.conf.urls.static import static
+from . import views, api
 
 urlpatterns = [
     # Homepage: A logged in user sees all of his projects
@@ -51,6 +49,16 @@ urlpatterns = [
     #Add Attachment
     path('tasks/<int:task_id>/add_attachment/', views.add_task_attachment, name='add_task_attachment'),
 
+    #Authenticated downloads (Range/Conditional, optional X-Accel-Redirect/X-Sendfile)
+    path('attachments/<int:attachment_id>/download/', views.download_attachment, name='download_attachment'),
+    path('attachments/<int:attachment_id>/preview/<str:kind>/', views.attachment_preview_file, name='attachment_preview'),
+    path('documents/<int:document_id>/download/', views.download_document, name='download_document'),
+
+    #Chunked (resumable) attachment upload
+    path('tasks/<int:task_id>/uploads/', views.start_attachment_upload, name='start_attachment_upload'),
+    path('uploads/<uuid:upload_id>/', views.attachment_upload, name='attachment_upload'),
+    path('uploads/<uuid:upload_id>/finalize/', views.finalize_attachment_upload, name='finalize_attachment_upload'),
+
     #Update task
     path('tasks/<int:task_id>/update-status/', views.update_task_status, name="update_task_status"),
 
@@ -60,6 +68,9 @@ urlpatterns = [
     #Clear Activity log
     path("project/<int:project_id>/clear-updates/", views.clear_updates, name="clear_updates"),
 
+    #Bulk update of tasks (status, priority, assignee, milestone)
+    path('projects/<int:project_id>/tasks/bulk/', views.bulk_update_tasks, name='bulk_update_tasks'),
+
     #update Priorities
     path('tasks/<int:task_id>/update_priority/', views.update_task_priority, name='update_task_priority'),
 
@@ -77,7 +88,23 @@ urlpatterns = [
 
     #update Project Details
     path('projects/<int:project_id>/update/', views.update_project, name='update_project'),
-]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root= settings.MEDIA_ROOT)
\ No newline at end of file
+    #Read API (v1)
+    path('api/v1/projects/', api.project_list, name='api_project_list'),
+    path('api/v1/projects/<int:project_id>/', api.project_detail, name='api_project_detail'),
+    path('api/v1/projects/<int:project_id>/tasks/', api.task_list, name='api_task_list'),
+    path('api/v1/projects/<int:project_id>/milestones/', api.milestone_list, name='api_milestone_list'),
+    path('api/v1/projects/<int:project_id>/members/', api.member_list, name='api_member_list'),
+    path('api/v1/projects/<int:project_id>/activity/', api.activity_list, name='api_activity_list'),
+    path('api/v1/projects/<int:project_id>/analytics/', api.project_analytics, name='api_project_analytics'),
+
+    #Full-text search
+    path('search/', views.search_view, name='search'),
+
+    #Chat history (keyset pagination)
+    path('projects/<int:project_id>/messages/', views.chat_history, name='chat_history'),
+
+    #AI suggestions (generated by the job worker)
+    path('projects/<int:project_id>/suggestions/', views.ai_suggestion_list, name='ai_suggestion_list'),
+    path('projects/<int:project_id>/suggestions/request/', views.request_ai_suggestion, name='request_ai_suggestion'),
+]
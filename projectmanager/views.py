@@ -1,15 +1,40 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Project, Task, ProjectInvitation, ProjectMembership, TaskComment, TaskAttachment, Update, Milestone, Message
+from .models import Project, Task, ProjectInvitation, ProjectMembership, TaskComment, TaskAttachment, Update, Milestone, Message, UploadSession, Document, AISuggestion, Job
 from .forms import TaskForm, ProjectForm, AddMemberForm, CustomUserCreationForm, TaskAttachmentForm
+from .roles import get_project_role, invalidate_project_roles, is_project_admin, is_project_member
+from .events import send_task_delta, send_task_deleted
+from .activity import log_activity, log_task_activity, purge_updates, recent_activity
+from .analytics import record_status_change, record_task_changes
+from .invitations import invalidate_pending_invitations
+from .kanban import render_kanban_columns
+from .downloads import serve_file
+from .search import SOURCES as SEARCH_SOURCES, search
+from .previews import preview_path, schedule_previews
+from .storage import blob_digest
+from .suggestions import SUGGESTION_TYPES, enqueue_suggestion
+from .uploads import UploadError, abort_upload, finalize_upload, start_upload, write_chunk
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.contrib.auth import login
-from django.http import HttpResponseForbidden
+from django.http import FileResponse, Http404, HttpResponseForbidden
 from django.http import JsonResponse
 import json
-from django.views.decorators.http import require_POST
+import os
+from dataclasses import asdict
+from django.views.decorators.http import require_http_methods, require_POST
 from django.views.decorators.csrf import csrf_exempt
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.cache import get_conditional_response
+from django.utils.html import escape
+from django.utils.http import quote_etag
+from django.urls import reverse
+
+# Felder, die eine Task-Karte auf dem Board anzeigt
+TASK_CARD_FIELDS = ['title', 'status', 'priority', 'deadline', 'assigned_to', 'milestone']
 
 #View to create task
 @login_required
@@ -23,13 +48,10 @@ def create_task(request, project_id):
             task = form.save(commit=False)
             task.project = project
             task.save()
+            send_task_delta(task, TASK_CARD_FIELDS, created=True)
+            record_task_changes(project.id, [(None, (task.status, task.milestone_id))])
 
-           
-            Update.objects.create(
-                project=project,
-                user=request.user,
-                text=f"created task '{task.title}'"
-            )
+            log_task_activity(task, request.user, 'TASK_CREATED')
 
             return redirect('project_dashboard', project_id=project.id)
 
@@ -41,42 +63,116 @@ def create_task(request, project_id):
         'project': project
     })
 
+# Felder, die nach einem Statuswechsel für Delta, Snapshots und Activity gebraucht werden
+TRANSITION_FIELDS = ['project_id', 'title', 'version', 'milestone_id']
+
+
+def _update_returning_supported():
+    # UPDATE ... RETURNING: PostgreSQL und SQLite >= 3.35 (gleiche Grenze wie bei INSERT), nicht MySQL/MariaDB
+    return connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert
+
+
+def _transition_returning(task_id, user, new_status, expected_status):
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(field) for field in TRANSITION_FIELDS)
+    sql = (
+        f"UPDATE {qn(Task._meta.db_table)} SET {qn('status')} = %s, {qn('version')} = {qn('version')} + 1 "
+        f"WHERE {qn('id')} = %s AND {qn('assigned_to_id')} = %s AND {qn('status')} = %s "
+        f"RETURNING {columns}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [new_status, task_id, user.id, expected_status])
+        # fetchall: bei SQLite ist das UPDATE erst nach dem letzten Schritt abgeschlossen
+        rows = cursor.fetchall()
+    return dict(zip(TRANSITION_FIELDS, rows[0])) if rows else None
+
+
+def transition_task_status(task_id, user, new_status, expected_status):
+    """
+    Setzt den Status mit einem einzigen bedingten UPDATE
+    (WHERE id AND assigned_to AND status), ohne die Zeile vorher zu lesen.
+    `expected_status` ist Pflicht, sonst würden sich gleichzeitige Wechsel überschreiben.
+
+    Gibt (result, task) zurück; result ist 'ok', 'missing', 'forbidden' oder 'conflict'.
+    Bei 'ok' ist task eine ungespeicherte Task-Instanz mit den neuen Werten,
+    sonst der aktuelle Stand aus der DB (oder None).
+    """
+    if _update_returning_supported():
+        values = _transition_returning(task_id, user, new_status, expected_status)
+        if values is not None:
+            return 'ok', Task(id=task_id, status=new_status, **values)
+    elif Task.objects.filter(id=task_id, assigned_to=user, status=expected_status).update(
+        status=new_status, version=F('version') + 1
+    ):
+        # Ohne RETURNING (MySQL) die neue Version nachlesen
+        values = Task.objects.values(*TRANSITION_FIELDS).get(id=task_id)
+        return 'ok', Task(id=task_id, status=new_status, **values)
+
+    current = Task.objects.filter(id=task_id).only('id', 'project_id', 'status', 'version', 'assigned_to_id').first()
+    if current is None:
+        return 'missing', None
+    if current.assigned_to_id != user.id:
+        return 'forbidden', current
+    return 'conflict', current
+
 #view to change status of task
 @login_required
-@login_required
 def update_task_status(request, task_id):
-    task = get_object_or_404(Task, id=task_id)
-
-    if task.assigned_to != request.user:
-        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-            return JsonResponse({'success': False, 'error': "Not allowed"})
-        return HttpResponseForbidden("You are not allowed to change this task's status.")
-
-    if request.method == "POST":
-        # Ajax: JSON Body
-        if request.content_type == 'application/json':
-            import json
-            data = json.loads(request.body)
-            new_status = data.get('status')
-        else:
-            new_status = request.POST.get('status')
+    is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
 
-        if new_status in dict(Task.STATUS_CHOICES):
-            task.status = new_status
-            task.save()
+    if request.method != "POST":
+        task = get_object_or_404(Task.objects.only('project_id'), id=task_id)
+        return redirect('project_dashboard', project_id=task.project_id)
 
-            Update.objects.create(
-                project=task.project,
-                user=request.user,
-                text=f"changed status of '{task.title}' to {task.status}"
-            )
+    # Ajax: JSON Body
+    if request.content_type == 'application/json':
+        data = json.loads(request.body)
+        new_status = data.get('status')
+        expected_status = data.get('from')
+    else:
+        new_status = request.POST.get('status')
+        expected_status = request.POST.get('from')
 
-            # Wenn Ajax: JSON zurückgeben
-            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-                return JsonResponse({'success': True})
+    if new_status not in dict(Task.STATUS_CHOICES):
+        task = get_object_or_404(Task.objects.only('project_id'), id=task_id)
+        return redirect('project_dashboard', project_id=task.project_id)
+    if expected_status not in dict(Task.STATUS_CHOICES):
+        if is_ajax:
+            return JsonResponse({'success': False, 'error': "Current status ('from') is required"}, status=400)
+        task = get_object_or_404(Task.objects.only('project_id'), id=task_id)
+        messages.error(request, "Please reload the task and try again.")
+        return redirect('project_dashboard', project_id=task.project_id)
+
+    result, task = transition_task_status(task_id, request.user, new_status, expected_status)
+
+    if result == 'missing':
+        raise Http404("Task not found")
+    if result == 'forbidden':
+        if is_ajax:
+            return JsonResponse({'success': False, 'error': "Not allowed"})
+        return HttpResponseForbidden("You are not allowed to change this task's status.")
+    if result == 'conflict':
+        if is_ajax:
+            return JsonResponse({
+                'success': False,
+                'conflict': True,
+                'error': "Task was changed by someone else",
+                'current_status': task.status,
+                'version': task.version,
+            }, status=409)
+        messages.error(request, "The task was changed in the meantime, please try again.")
+        return redirect('project_dashboard', project_id=task.project_id)
+
+    send_task_delta(task, ['status'])
+    record_status_change(task, expected_status, new_status)
+    log_task_activity(task, request.user, 'TASK_STATUS', **{'from': expected_status, 'to': new_status})
+
+    # Wenn Ajax: JSON zurückgeben
+    if is_ajax:
+        return JsonResponse({'success': True, 'version': task.version})
 
     # Fallback: redirect
-    return redirect('project_dashboard', project_id=task.project.id)
+    return redirect('project_dashboard', project_id=task.project_id)
 
 @login_required
 def create_project(request):
@@ -91,6 +187,7 @@ def create_project(request):
                 project=project,
                 role='ADMIN'
             )
+            invalidate_project_roles(request.user)
 
             return redirect(
                 'project_dashboard',
@@ -108,19 +205,20 @@ def create_project(request):
 @login_required
 @login_required
 def project_dashboard(request, project_id):
-    project = get_object_or_404(Project, id=project_id, members=request.user)
+    # Rolle aus dem gemeinsamen Resolver, der auch die Rechteprüfungen bedient
+    user_role = get_project_role(request.user, project_id)
+    if user_role is None:
+        raise Http404("No Project matches the given query.")
+    project = get_object_or_404(Project, id=project_id)
 
     tasks = project.tasks.all()
-    updates = project.updates.order_by('-created_at')[:5]
+    updates = recent_activity(project)
     projects = request.user.projects.all()
 
-    memberships = ProjectMembership.objects.filter(project=project, user__isnull=False)
-
-    try:
-        user_membership = memberships.get(user=request.user)
-        user_role = user_membership.role
-    except ProjectMembership.DoesNotExist:
-        user_role = None
+    # Mitglieder inkl. User in einer Query laden
+    memberships = list(
+        ProjectMembership.objects.filter(project=project, user__isnull=False).select_related('user')
+    )
 
     # -------------------------
     # 🔽 FILTER & SORT LOGIK
@@ -149,39 +247,39 @@ def project_dashboard(request, project_id):
 
     # -------------------------
 
-    milestones = project.milestones.all()
+    milestones = project.milestones.with_progress()
 
-    old_messages = project.messages.all().order_by('-created_at')[:50][::-1]
+    # Karten kommen aus dem Fragment-Cache, nach Status gruppiert
+    kanban_columns = render_kanban_columns(tasks)
 
-    # ... dein Code für Filter & Sortierung ...
+    # Chat-Historie wird vom Client über chat_history nachgeladen
 
     context = {
         'project': project,
         'tasks': tasks,
+        'kanban_columns': kanban_columns,
         'updates': updates,
         'projects': projects,
         'memberships': memberships,
         'user_role': user_role,
         'milestones': milestones,
-        'old_messages': old_messages, # <--- WICHTIG: Hier zum Context hinzufügen!
     }
     return render(request, 'projectmanager/project_dashboard.html', context)
 
 
+@login_required
 def project_list(request):
-    # Alle Projekte, in denen der User Mitglied ist
-    projects = request.user.projects.all().prefetch_related('memberships__user')
-
-    # Rollen bestimmen
-    projects_with_roles = []
-    for project in projects:
-        membership = ProjectMembership.objects.filter(project=project, user=request.user).first()
-        user_role = membership.role if membership else None
-
-        projects_with_roles.append({
-            'project': project,
-            'user_role': user_role
-        })
+    # Alle Projekte, in denen der User Mitglied ist, inkl. Rolle und Kennzahlen
+    projects = (
+        request.user.projects
+        .with_list_stats(request.user)
+        .prefetch_related('members')
+    )
+
+    projects_with_roles = [
+        {'project': project, 'user_role': project.user_role}
+        for project in projects
+    ]
 
     context = {
         'projects_with_roles': projects_with_roles
@@ -226,6 +324,7 @@ def add_member(request, project_id):
             email=email,
             invited_by=request.user
         )
+        invalidate_pending_invitations(email)
 
         messages.success(request, f"Invitation sent to {email}.")
         return redirect("project_dashboard", project_id=project.id)
@@ -272,18 +371,12 @@ def handle_invitation(request, invitation_id, action):
     invitation.save()
     return redirect('project_list')
 
-def is_project_admin(user, project):
-    return ProjectMembership.objects.filter(
-        user=user,
-        project=project,
-        role='ADMIN'
-    ).exists()
-
 @login_required
 def decline_invitation(request, invitation_id):
     invitation = get_object_or_404(ProjectInvitation, id=invitation_id, email=request.user.email)
     # Einladung ablehnen = löschen
     invitation.delete()
+    invalidate_pending_invitations(request.user.email)
     messages.success(request, f"Invitation to {invitation.project.title} declined.")
     return redirect("project_list")
 
@@ -298,9 +391,11 @@ def accept_invitation(request, invitation_id):
         project=invitation.project,
         role='MEMBER'
     )
+    invalidate_project_roles(request.user)
     
     # Einladung löschen
     invitation.delete()
+    invalidate_pending_invitations(request.user.email)
     
     messages.success(request, f"You have joined {invitation.project.title}.")
     return redirect("project_list")
@@ -327,13 +422,6 @@ def remove_member(request, project_id, user_id):
 
     return redirect('project_dashboard', project_id=project.id)
 
-def get_project_role(user, project):
-    membership = ProjectMembership.objects.filter(
-        user=user,
-        project=project
-    ).first()
-    return membership.role if membership else None
-
 @login_required
 def change_role(request, project_id, user_id):
     project = get_object_or_404(Project, id=project_id)
@@ -352,6 +440,10 @@ def change_role(request, project_id, user_id):
         if new_role in ["ADMIN", "MEMBER", "VIEWER"]:
             membership.role = new_role
             membership.save()
+            # Der Rollen-Cache hängt am User-Objekt dieses Requests; andere User laden
+            # ihre Rollen im nächsten Request ohnehin neu. Nur die eigene Rolle ist betroffen.
+            if user_id == request.user.id:
+                invalidate_project_roles(request.user)
         return redirect("project_dashboard", project_id=project.id)
 
 @login_required
@@ -363,7 +455,10 @@ def delete_task(request, task_id):
         return HttpResponseForbidden("You are not allowed to delete this task.")
 
     if request.method == "POST":
+        log_task_activity(task, request.user, 'TASK_DELETED')
         task.delete()
+        send_task_deleted(task.project_id, task_id)
+        record_task_changes(task.project_id, [((task.status, task.milestone_id), None)])
         return redirect('project_dashboard', project_id=task.project.id)        
 
 @login_required
@@ -371,7 +466,7 @@ def task_detail(request, task_id):
     task = get_object_or_404(Task, id=task_id)
 
     # Prüfen, ob der User im Projekt ist
-    if not task.project.memberships.filter(user=request.user).exists():
+    if not is_project_member(request.user, task.project_id):
         return HttpResponseForbidden("You cannot view this task.")
 
     # Render nur für AJAX (Modal)
@@ -385,26 +480,46 @@ def task_detail(request, task_id):
 def add_task_comment(request, task_id):
     task = get_object_or_404(Task, id=task_id)
     
-    if not task.project.memberships.filter(user=request.user).exists():
+    if not is_project_member(request.user, task.project_id):
         return HttpResponseForbidden("You cannot comment on this task.")
 
-    Update.objects.create(
-        project=task.project,
-        user=request.user,
-        text=f"commented on '{task.title}'"
-    )
     if request.method == "POST":
         text = request.POST.get('text')
         if text:
             TaskComment.objects.create(task=task,user=request.user, text=text)
+            log_task_activity(task, request.user, 'COMMENT_ADDED')
     return redirect('task_detail', task_id=task.id)
 
+
+def attachment_row_html(attachment):
+    # Eine Zeile der Anhangsliste im Task-Modal (AJAX-Antworten)
+    return f'''
+    <li style="margin-bottom: 0.5rem; display:flex; align-items:center; justify-content:space-between;">
+        <span style="display:flex; align-items:center; max-width: calc(100% - 50px);">
+            📎
+            <a href="{reverse('download_attachment', args=[attachment.id])}" 
+               class="attachment-name" 
+               style="margin-left:0.3rem; word-break: break-word; text-decoration:none; color:#333;">
+                {escape(os.path.splitext(attachment.display_name)[0])}
+            </a>
+        </span>
+        <button type="button" 
+                class="delete-attachment-btn" 
+                data-attachment-id="{attachment.id}" 
+                style="border:none; background:none; cursor:pointer; color:red;" 
+                title="Delete Attachment">
+            🗑️
+        </button>
+    </li>
+    '''
+
+
 @login_required
 def add_task_attachment(request, task_id):
     task = get_object_or_404(Task, id=task_id)
 
     # Nur Projektmitglieder dürfen hochladen
-    if not task.project.memberships.filter(user=request.user).exists():
+    if not is_project_member(request.user, task.project_id):
         return HttpResponseForbidden("You cannot upload files to this task.")
 
     if request.method == "POST":
@@ -414,43 +529,22 @@ def add_task_attachment(request, task_id):
             attachment.task = task
             attachment.uploaded_by = request.user
             attachment.save()
+            schedule_previews(attachment.file, attachment.display_name)
+            log_task_activity(task, request.user, 'ATTACHMENT_ADDED')
 
             # Wenn AJAX, gib direkt die HTML-Zeile zurück
             if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-                html = f'''
-                <li style="margin-bottom: 0.5rem; display:flex; align-items:center; justify-content:space-between;">
-                    <span style="display:flex; align-items:center; max-width: calc(100% - 50px);">
-                        📎
-                        <a href="{attachment.file.url}" download 
-                           class="attachment-name" 
-                           style="margin-left:0.3rem; word-break: break-word; text-decoration:none; color:#333;">
-                            {attachment.file.name.split("/")[-1].rsplit(".",1)[0]}
-                        </a>
-                    </span>
-                    <button type="button" 
-                            class="delete-attachment-btn" 
-                            data-attachment-id="{attachment.id}" 
-                            style="border:none; background:none; cursor:pointer; color:red;" 
-                            title="Delete Attachment">
-                        🗑️
-                    </button>
-                </li>
-                '''
+                html = attachment_row_html(attachment)
                 return JsonResponse({'success': True, 'html': html})
             
             return redirect('task_detail', task_id=task.id)
     else:
         form = TaskAttachmentForm()
 
-    Update.objects.create(
-        project=task.project,
-        user=request.user,
-        text="uploaded attachment to '{task.title}'"
-    )
     return render(request, 'projectmanager/task_detail.html', {
         'task': task,
         'attachment_form': form,
-        'user_in_project': task.project.memberships.filter(user=request.user).exists()
+        'user_in_project': is_project_member(request.user, task.project_id)
     })
 
 
@@ -460,11 +554,11 @@ def delete_task_attachment(request, attachment_id):
     task = attachment.task
 
     # Nur Projektmitglieder dürfen löschen
-    if not task.project.memberships.filter(user=request.user).exists():
+    if not is_project_member(request.user, task.project_id):
         return HttpResponseForbidden("You cannot delete this attachment.")
 
-    attachment.file.delete(save=False)  # Datei löschen
-    attachment.delete()  # Datenbankeintrag löschen
+    # Gibt über post_delete auch die Blob-Referenz frei (storage.py)
+    attachment.delete()
 
     # Wenn AJAX, nur den Erfolg zurückgeben
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -474,15 +568,171 @@ def delete_task_attachment(request, attachment_id):
     return redirect('task_detail', task_id=task.id)
 
 
+@login_required
+@require_http_methods(['GET', 'HEAD'])
+def download_attachment(request, attachment_id):
+    attachment = get_object_or_404(TaskAttachment.objects.select_related('task'), id=attachment_id)
+    # Nicht-Mitglieder sollen nicht erfahren, dass es den Anhang gibt
+    if not is_project_member(request.user, attachment.task.project_id):
+        raise Http404
+    return serve_file(request, attachment.file, attachment.display_name, inline='inline' in request.GET)
+
+
+@login_required
+@require_http_methods(['GET', 'HEAD'])
+def attachment_preview_file(request, attachment_id, kind):
+    attachment = get_object_or_404(TaskAttachment.objects.select_related('task'), id=attachment_id)
+    if not is_project_member(request.user, attachment.task.project_id):
+        raise Http404
+
+    path = preview_path(attachment.file, kind) if kind in ('thumbnail', 'text') else None
+    if path is None:
+        raise Http404
+
+    # Der Anhang ändert seinen Inhalt nie, die Vorschau kann dauerhaft gecacht werden
+    etag = quote_etag(f'{blob_digest(attachment.file.name)}-{kind}')
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    response = FileResponse(
+        open(path, 'rb'),
+        content_type='image/png' if kind == 'thumbnail' else 'text/plain; charset=utf-8',
+    )
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+
+@login_required
+@require_http_methods(['GET', 'HEAD'])
+def download_document(request, document_id):
+    document = get_object_or_404(Document, id=document_id)
+    if not is_project_member(request.user, document.project_id):
+        raise Http404
+    return serve_file(request, document.file, document.display_name, inline='inline' in request.GET)
+
+
+@login_required
+def search_view(request):
+    """Volltextsuche; ?format=json (oder AJAX) liefert nur die Treffer."""
+    query = request.GET.get('q', '').strip()
+    project = request.GET.get('project')
+    project_id = int(project) if project and project.isdigit() else None
+    kinds = [kind for kind in request.GET.getlist('kind') if kind in SEARCH_SOURCES] or None
+
+    results = search(request.user, query, project_id=project_id, kinds=kinds) if query else []
+
+    if request.GET.get('format') == 'json' or request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({'query': query, 'results': [asdict(result) for result in results]})
+
+    project_titles = dict(
+        Project.objects.filter(id__in={result.project_id for result in results}).values_list('id', 'title')
+    )
+    return render(request, 'projectmanager/search.html', {
+        'query': query,
+        'results': [
+            {'result': result, 'project_title': project_titles.get(result.project_id)}
+            for result in results
+        ],
+    })
+
+
+@login_required
+@require_POST
+def start_attachment_upload(request, task_id):
+    """Chunk-Upload starten: JSON {filename, size} -> upload_id."""
+    task = get_object_or_404(Task, id=task_id)
+    if not is_project_member(request.user, task.project_id):
+        return HttpResponseForbidden("You cannot upload files to this task.")
+
+    try:
+        data = json.loads(request.body)
+        filename = str(data['filename']).strip()
+        size = int(data['size'])
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'filename and size are required'}, status=400)
+    if not filename:
+        return JsonResponse({'error': 'filename and size are required'}, status=400)
+
+    try:
+        session = start_upload(task, request.user, filename, size)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=413)
+
+    return JsonResponse({
+        'upload_id': str(session.id),
+        'offset': 0,
+        'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+    }, status=201)
+
+
+@login_required
+def attachment_upload(request, upload_id):
+    """
+    GET: aktuellen Offset abfragen (zum Fortsetzen)
+    PUT ?offset=N: Chunk schreiben, Body = rohe Bytes
+    DELETE: Upload abbrechen
+    """
+    session = get_object_or_404(UploadSession, id=upload_id, user=request.user)
+
+    if request.method == 'GET':
+        return JsonResponse({'offset': session.received, 'size': session.size})
+
+    if request.method == 'DELETE':
+        abort_upload(session)
+        return JsonResponse({'success': True})
+
+    if request.method != 'PUT':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        offset = int(request.GET['offset'])
+        length = int(request.META['CONTENT_LENGTH'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'offset and Content-Length are required'}, status=400)
+    if length > settings.CHUNKED_UPLOAD_CHUNK_SIZE:
+        return JsonResponse({'error': 'Chunk too large'}, status=413)
+
+    try:
+        # request.read streamt den Body, ohne ihn komplett in den Speicher zu laden
+        received = write_chunk(session, offset, request, length)
+    except UploadError as e:
+        session.refresh_from_db()
+        return JsonResponse({'error': str(e), 'offset': session.received}, status=409)
+
+    return JsonResponse({'offset': received, 'size': session.size})
+
+
+@login_required
+@require_POST
+def finalize_attachment_upload(request, upload_id):
+    session = get_object_or_404(UploadSession.objects.select_related('task'), id=upload_id, user=request.user)
+    task = session.task
+    if not is_project_member(request.user, task.project_id):
+        return HttpResponseForbidden("You cannot upload files to this task.")
+
+    try:
+        attachment = finalize_upload(session)
+    except UploadError as e:
+        return JsonResponse({'error': str(e), 'offset': session.received}, status=409)
+
+    schedule_previews(attachment.file, attachment.display_name)
+    log_task_activity(task, request.user, 'ATTACHMENT_ADDED')
+    return JsonResponse({
+        'success': True,
+        'attachment_id': attachment.id,
+        'html': attachment_row_html(attachment),
+    })
+
+
 @login_required
 def clear_updates(request, project_id):
     project = get_object_or_404(Project, id=project_id)
-    membership = ProjectMembership.objects.get(project=project, user=request.user)
 
-    if membership.role != "ADMIN":
+    if not is_project_admin(request.user, project):
         return HttpResponseForbidden()
     
-    project.updates.all().delete()
+    purge_updates(project.updates.all())
     return redirect("project_dashboard", project.id)
 
 @login_required
@@ -495,8 +745,11 @@ def update_task_priority(request, task_id):
     if request.method == "POST":
         new_priority = request.POST.get('priority')
         if new_priority in dict(Task.PRIORITY_CHOICES):
+            old_priority = task.priority
             task.priority = new_priority
             task.save()
+            send_task_delta(task, ['priority'])
+            log_task_activity(task, request.user, 'TASK_PRIORITY', **{'from': old_priority, 'to': task.priority})
             # Wenn AJAX: return JsonResponse({'success': True, 'priority': task.priority})
             return redirect('project_dashboard', project_id=task.project.id)
 
@@ -510,32 +763,133 @@ def update_task_status_ajax(request, task_id):
     if request.method != "POST":
         return JsonResponse({"success": False, "error": "Invalid request method"})
 
-    task = get_object_or_404(Task, id=task_id)
-
-    # Optional: Berechtigung prüfen
-    if task.assigned_to != request.user:
-        return JsonResponse({"success": False, "error": "You are not allowed to change this task's status."})
-
     try:
         data = json.loads(request.body)
         new_status = data.get("status")
+        # Spalte, aus der die Karte gezogen wurde (Pflicht, siehe transition_task_status)
+        expected_status = data.get("from")
     except:
         return JsonResponse({"success": False, "error": "Invalid JSON data"})
 
     if new_status not in dict(Task.STATUS_CHOICES):
         return JsonResponse({"success": False, "error": "Invalid status value"})
+    if expected_status not in dict(Task.STATUS_CHOICES):
+        return JsonResponse({"success": False, "error": "Current status ('from') is required"}, status=400)
 
-    task.status = new_status
-    task.save()
+    result, task = transition_task_status(task_id, request.user, new_status, expected_status)
+
+    if result == 'missing':
+        raise Http404("Task not found")
+    if result == 'forbidden':
+        return JsonResponse({"success": False, "error": "You are not allowed to change this task's status."})
+    if result == 'conflict':
+        return JsonResponse({
+            "success": False,
+            "conflict": True,
+            "error": "Task was changed by someone else",
+            "current_status": task.status,
+            "version": task.version,
+        }, status=409)
+
+    send_task_delta(task, ['status'])
+    record_status_change(task, expected_status, new_status)
 
     # Optional: Update-Log
-    Update.objects.create(
-        project=task.project,
-        user=request.user,
-        text=f"Changed status of '{task.title}' to {task.status}"
-    )
+    log_task_activity(task, request.user, 'TASK_STATUS', **{'from': expected_status, 'to': new_status})
 
-    return JsonResponse({"success": True, "new_status": task.status})
+    return JsonResponse({"success": True, "new_status": new_status, "version": task.version})
+
+# Felder, die per Bulk-Endpoint geändert werden dürfen
+BULK_TASK_FIELDS = ['status', 'priority', 'assigned_to', 'milestone']
+
+@login_required
+@require_POST
+def bulk_update_tasks(request, project_id):
+    """
+    Ändert mehrere Tasks eines Projekts auf einmal.
+    Body: {"task_ids": [...], "changes": {"status": ..., "priority": ..., "assigned_to": id, "milestone": id}}
+    Admins dürfen alle Tasks ändern, Mitglieder nur ihre eigenen.
+    """
+    role = get_project_role(request.user, project_id)
+    if role not in ('ADMIN', 'MEMBER'):
+        return JsonResponse({"success": False, "error": "Not allowed"}, status=403)
+
+    try:
+        data = json.loads(request.body)
+        task_ids = [int(task_id) for task_id in data.get("task_ids", [])]
+        changes = data.get("changes", {})
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({"success": False, "error": "Invalid JSON data"}, status=400)
+
+    if not task_ids or not isinstance(changes, dict) or not changes or set(changes) - set(BULK_TASK_FIELDS):
+        return JsonResponse({"success": False, "error": "Nothing to update"}, status=400)
+
+    # Neue Werte einmalig prüfen und auflösen
+    values = {}
+    if 'status' in changes:
+        if changes['status'] not in dict(Task.STATUS_CHOICES):
+            return JsonResponse({"success": False, "error": "Invalid status value"}, status=400)
+        values['status'] = changes['status']
+    if 'priority' in changes:
+        if changes['priority'] not in dict(Task.PRIORITY_CHOICES):
+            return JsonResponse({"success": False, "error": "Invalid priority value"}, status=400)
+        values['priority'] = changes['priority']
+    for field in ('assigned_to', 'milestone'):
+        if changes.get(field) is not None:
+            try:
+                changes[field] = int(changes[field])
+            except (TypeError, ValueError):
+                return JsonResponse({"success": False, "error": f"Invalid {field} value"}, status=400)
+    if 'assigned_to' in changes:
+        assignee = None
+        if changes['assigned_to'] is not None:
+            assignee = User.objects.filter(
+                id=changes['assigned_to'],
+                projectmembership__project_id=project_id
+            ).first()
+            if assignee is None:
+                return JsonResponse({"success": False, "error": "Assignee is not a project member"}, status=400)
+        values['assigned_to'] = assignee
+    if 'milestone' in changes:
+        milestone = None
+        if changes['milestone'] is not None:
+            milestone = Milestone.objects.filter(id=changes['milestone'], project_id=project_id).first()
+            if milestone is None:
+                return JsonResponse({"success": False, "error": "Invalid milestone"}, status=400)
+        values['milestone'] = milestone
+
+    with transaction.atomic():
+        tasks = Task.objects.select_for_update().filter(project_id=project_id, id__in=task_ids)
+        if role != 'ADMIN':
+            tasks = tasks.filter(assigned_to=request.user)
+        tasks = list(tasks)
+
+        # Für die Tages-Snapshots: (Status, Milestone) vorher und nachher
+        transitions = []
+        previous = []
+        for task in tasks:
+            before = (task.status, task.milestone_id)
+            previous.append([task.id, *before])
+            for field, value in values.items():
+                setattr(task, field, value)
+            task.version += 1
+            transitions.append((before, (task.status, task.milestone_id)))
+        Task.objects.bulk_update(tasks, list(values) + ['version'])
+        if {'status', 'milestone'} & set(values):
+            record_task_changes(project_id, transitions)
+
+        # Task-IDs und alter Stand, damit backfill_project den Bulk-Edit zurückrechnen kann
+        log_activity(project_id, request.user, 'TASK_BULK', count=len(tasks), changes=changes, tasks=previous)
+
+    for task in tasks:
+        send_task_delta(task, list(values))
+
+    updated = [task.id for task in tasks]
+    return JsonResponse({
+        "success": True,
+        "updated": updated,
+        "skipped": sorted(set(task_ids) - set(updated)),
+    })
 
 @login_required
 def create_milestone(request,project_id):
@@ -557,25 +911,21 @@ def create_milestone(request,project_id):
 @login_required
 def milestone_detail(request, milestone_id):
     milestone = get_object_or_404(
-        Milestone, 
+        Milestone.objects.with_progress(),
         id=milestone_id,
         project__members=request.user
     )
 
-    tasks = milestone.tasks.all()
+    tasks = milestone.tasks.values("id", "title", "status", "priority")
 
     data = {
+        "id": milestone.id,
         "title": milestone.title,
         "deadline": milestone.deadline.strftime("%Y-%m-%d") if milestone.deadline else None,
         "progress": milestone.progress,
-        "tasks": [
-            {
-                "id": t.id,               # <-- WICHTIG
-                "title": t.title,
-                "status": t.status,
-                "priority": t.priority
-            } for t in tasks
-        ]
+        "done": milestone.task_done,
+        "total": milestone.task_total,
+        "tasks": list(tasks)
     }
 
     return JsonResponse(data)
@@ -596,8 +946,13 @@ def add_task_to_milestone(request, milestone_id, task_id):
         milestone = get_object_or_404(Milestone, id=milestone_id, project__members=request.user)
         task = get_object_or_404(Task, id=task_id, project=milestone.project)
 
+        before = (task.status, task.milestone_id)
         task.milestone = milestone
         task.save()
+        send_task_delta(task, ['milestone'])
+        record_task_changes(task.project_id, [(before, (task.status, task.milestone_id))])
+        # Vorheriger Milestone für backfill_project, Tasks können auch umgehängt werden
+        log_task_activity(task, request.user, 'TASK_MILESTONE', milestone=milestone.title, from_milestone=before[1])
 
         return JsonResponse({"success": True})
     return JsonResponse({"success": False, "error": "Invalid request"})
@@ -610,13 +965,7 @@ def update_project(request, project_id):
     try:
         project = get_object_or_404(Project, id=project_id)
 
-        membership = ProjectMembership.objects.filter(
-            project=project,
-            user=request.user,
-            role='ADMIN'
-        ).first()
-
-        if not membership:
+        if not is_project_admin(request.user, project):
             return JsonResponse({'success': False, 'error': 'No permission'})
 
         end_date = request.POST.get('end_date')
@@ -639,4 +988,109 @@ def update_project(request, project_id):
     except Exception as e:
         print("SERVER ERROR:", e)
         return JsonResponse({'success': False, 'error': str(e)})
-    
\ No newline at end of file
+
+
+CHAT_HISTORY_PAGE_SIZE = 50
+
+@login_required
+def chat_history(request, project_id):
+    """
+    Chat-Historie eines Projekts, neueste zuerst geblättert (Keyset-Pagination).
+    Cursor ist (before, before_id) der ältesten bereits geladenen Nachricht.
+    """
+    if not is_project_member(request.user, project_id):
+        return JsonResponse({'success': False, 'error': 'Not allowed'}, status=403)
+
+    try:
+        # Auf 1..CHAT_HISTORY_PAGE_SIZE begrenzen, 0 oder negative Werte ergäben keine Seite
+        limit = max(1, min(int(request.GET.get('limit', CHAT_HISTORY_PAGE_SIZE)), CHAT_HISTORY_PAGE_SIZE))
+    except ValueError:
+        limit = CHAT_HISTORY_PAGE_SIZE
+
+    chat_messages = Message.objects.filter(project_id=project_id)
+
+    before = request.GET.get('before')
+    before_id = request.GET.get('before_id')
+    if before and before_id:
+        before = parse_datetime(before)
+        if before is None or not before_id.isdigit():
+            return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+        chat_messages = chat_messages.filter(
+            Q(created_at__lt=before) | Q(created_at=before, id__lt=int(before_id))
+        )
+
+    page = list(
+        chat_messages
+        .order_by('-created_at', '-id')
+        .values('id', 'content', 'created_at', 'sender__username')[:limit + 1]
+    )
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    next_cursor = None
+    if has_more:
+        oldest = page[-1]
+        next_cursor = {'before': oldest['created_at'].isoformat(), 'before_id': oldest['id']}
+
+    return JsonResponse({
+        'success': True,
+        # Älteste zuerst, damit der Client direkt anhängen kann
+        'messages': [
+            {
+                'id': m['id'],
+                'username': m['sender__username'],
+                'message': m['content'],
+                'created_at': m['created_at'].isoformat(),
+            } for m in reversed(page)
+        ],
+        'next_cursor': next_cursor,
+    })
+
+
+AI_SUGGESTION_PAGE_SIZE = 20
+
+@login_required
+@require_POST
+def request_ai_suggestion(request, project_id):
+    """Vorschlag in Auftrag geben: der Job-Worker erzeugt ihn, Antwort sofort mit 202."""
+    if not is_project_member(request.user, project_id):
+        return HttpResponseForbidden("You are not a member of this project.")
+    project = get_object_or_404(Project, id=project_id)
+
+    suggestion_type = request.POST.get('type')
+    if suggestion_type is None and request.body:
+        try:
+            suggestion_type = json.loads(request.body).get('type')
+        except (ValueError, AttributeError):
+            suggestion_type = None
+    if suggestion_type not in SUGGESTION_TYPES:
+        return JsonResponse({'error': f"type must be one of {', '.join(SUGGESTION_TYPES)}"}, status=400)
+
+    job = enqueue_suggestion(project, suggestion_type)
+    return JsonResponse({'job_id': job.id, 'status': job.status}, status=202)
+
+
+@login_required
+def ai_suggestion_list(request, project_id):
+    """Neueste Vorschläge und noch laufende Aufträge eines Projekts (JSON)."""
+    if not is_project_member(request.user, project_id):
+        return HttpResponseForbidden("You are not a member of this project.")
+
+    suggestions = (
+        AISuggestion.objects.filter(project_id=project_id)
+        .order_by('-created_at', '-id')
+        .values('id', 'suggestion_type', 'content', 'created_at', 'accepted')[:AI_SUGGESTION_PAGE_SIZE]
+    )
+    pending = (
+        Job.objects.filter(project_id=project_id, kind='ai_suggestion', status__in=['PENDING', 'RUNNING'])
+        .values('id', 'status', 'payload')
+    )
+    return JsonResponse({
+        'suggestions': [
+            {**s, 'created_at': s['created_at'].isoformat()} for s in suggestions
+        ],
+        'pending': [
+            {'job_id': job['id'], 'status': job['status'], 'type': job['payload'].get('suggestion_type')}
+            for job in pending
+        ],
+    })
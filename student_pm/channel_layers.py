@@ -0,0 +1,42 @@
+"""
+Auswahl des Channel Layers.
+
+Mit REDIS_URL der Redis-Layer aus channels_redis (prozessübergreifend, mehrere
+daphne Worker), sonst der In-Memory-Layer als lokaler Ersatz (ein Prozess).
+"""
+from importlib.util import find_spec
+
+from django.core.exceptions import ImproperlyConfigured
+
+# Pakete für REDIS_URL: channels_redis (Channel Layer) und redis (Cache)
+REDIS_PACKAGES = {'channels_redis': 'channels-redis', 'redis': 'redis'}
+
+
+def require_redis_packages():
+    missing = [package for module, package in REDIS_PACKAGES.items() if find_spec(module) is None]
+    if missing:
+        raise ImproperlyConfigured(
+            f"REDIS_URL is set but required packages are missing (pip install {' '.join(missing)}); "
+            "unset REDIS_URL to use the in-memory channel layer"
+        )
+
+
+def build_channel_layers(redis_url, layer_config):
+    if not redis_url:
+        return {
+            "default": {
+                "BACKEND": "channels.layers.InMemoryChannelLayer",
+                "CONFIG": dict(layer_config),
+            },
+        }
+
+    require_redis_packages()
+    return {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": [redis_url],
+                **layer_config,
+            },
+        },
+    }
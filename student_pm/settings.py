@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from decouple import config
 
+from .channel_layers import build_channel_layers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,12 +47,60 @@ INSTALLED_APPS = [
 
 ASGI_APPLICATION = "student_pm.asgi.application"
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
-    },
+# Channel Layer: mit REDIS_URL prozessübergreifend (mehrere daphne Worker),
+# sonst In-Memory (nur ein Prozess, z.B. lokal / Tests). Redis benötigt die Pakete
+# channels-redis und redis; fehlen sie, bricht der Start mit einer klaren Meldung ab.
+REDIS_URL = config('REDIS_URL', default='')
+
+CHANNEL_LAYER_CONFIG = {
+    # Maximale Anzahl wartender Nachrichten pro Channel
+    "capacity": config('CHANNEL_CAPACITY', default=100, cast=int),
+    # Sekunden, bis eine nicht abgeholte Nachricht verfällt
+    "expiry": config('CHANNEL_EXPIRY', default=60, cast=int),
+    # Sekunden, bis eine Gruppenmitgliedschaft ohne Erneuerung verfällt
+    "group_expiry": config('CHANNEL_GROUP_EXPIRY', default=86400, cast=int),
 }
 
+CHANNEL_LAYERS = build_channel_layers(REDIS_URL, CHANNEL_LAYER_CONFIG)
+
+# Cache (u.a. offene Einladungen); mit REDIS_URL von allen Workern geteilt
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    }
+
+# Sekunden, die die offenen Einladungen eines Users gecacht werden
+INVITATIONS_CACHE_TIMEOUT = config('INVITATIONS_CACHE_TIMEOUT', default=300, cast=int)
+
+# Gerenderte Kanban-Karten (Key enthält die Task-Version, Änderungen invalidieren sofort)
+TASK_CARD_CACHE_TIMEOUT = config('TASK_CARD_CACHE_TIMEOUT', default=86400, cast=int)
+
+# Chat-Nachrichten werden gepuffert und gesammelt gespeichert (projectmanager.chat_buffer)
+CHAT_BUFFER_MAX_SIZE = config('CHAT_BUFFER_MAX_SIZE', default=50, cast=int)
+CHAT_BUFFER_FLUSH_INTERVAL = config('CHAT_BUFFER_FLUSH_INTERVAL', default=1.0, cast=float)
+# Obergrenze, falls die DB länger nicht erreichbar ist (darüber werden Nachrichten verworfen)
+CHAT_BUFFER_MAX_PENDING = config('CHAT_BUFFER_MAX_PENDING', default=5000, cast=int)
+
+# Chunk-Uploads für Anhänge (projectmanager.uploads)
+# Leer = MEDIA_ROOT/uploads, sollte auf demselben Dateisystem wie MEDIA_ROOT liegen
+CHUNKED_UPLOAD_DIR = config('CHUNKED_UPLOAD_DIR', default='')
+CHUNKED_UPLOAD_CHUNK_SIZE = config('CHUNKED_UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024, cast=int)
+CHUNKED_UPLOAD_MAX_SIZE = config('CHUNKED_UPLOAD_MAX_SIZE', default=2 * 1024 ** 3, cast=int)
+# Unvollständige Uploads werden danach von `manage.py gc_blobs` entfernt
+CHUNKED_UPLOAD_EXPIRY_HOURS = config('CHUNKED_UPLOAD_EXPIRY_HOURS', default=24, cast=int)
+
+# Activity-Log: Einträge älter als X Tage löscht `manage.py purge_updates`
+ACTIVITY_RETENTION_DAYS = config('ACTIVITY_RETENTION_DAYS', default=90, cast=int)
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -146,5 +196,35 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'  # nach erfolgreichem Login hierhin
 LOGOUT_REDIRECT_URL = '/login/'  # nach Logout
 
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # u.a. Fan-out-Latenz des Chats (projectmanager.consumers)
+        'projectmanager': {
+            'handlers': ['console'],
+            'level': config('PROJECTMANAGER_LOG_LEVEL', default='INFO'),
+        },
+    },
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR
+
+# Anhänge/Dokumente werden nur über die Download-Views (mit Rechteprüfung) ausgeliefert.
+# 'django' streamt selbst (Range-fähig), 'x-accel' für nginx, 'x-sendfile' für Apache/lighttpd.
+# nginx: location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+FILE_DOWNLOAD_MODE = config('FILE_DOWNLOAD_MODE', default='django')
+FILE_DOWNLOAD_ACCEL_PREFIX = config('FILE_DOWNLOAD_ACCEL_PREFIX', default='/protected-media/')
+
+# Job-Queue (projectmanager.jobs, `manage.py run_jobs`)
+JOB_WORKERS = config('JOB_WORKERS', default=2, cast=int)
+JOB_POLL_INTERVAL = config('JOB_POLL_INTERVAL', default=1.0, cast=float)
+# Läuft ein Job länger, gilt sein Worker als abgestürzt und der Job wird neu eingeplant
+JOB_TIMEOUT = config('JOB_TIMEOUT', default=600, cast=int)
+
+# Threads für Vorschaubilder/Textvorschauen von Anhängen (projectmanager.previews)
+PREVIEW_WORKERS = config('PREVIEW_WORKERS', default=2, cast=int)